@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from Time_Parse import parse_times
+
+"""
+数据可用率（非空率）统计引擎：
+1、各指标先转为有效值掩码，按月 / 日 / 小时分桶计数；固定 5 分钟网格上的数据按桶边界用 np.add.reduceat 一次求和，
+   时间不规则的数据用 np.bincount，不再逐行 strftime 和 groupby.apply；
+2、BucketCounts 保存每个桶的有效个数和总个数，可跨分块、跨运行累加；
+3、AvailabilityReport 汇总所有场站后，每个指标一次性分配 场站 × 时间桶 矩阵，替代逐场站 pivot + concat。
+"""
+
+# 统计粒度：numpy 时间单位和表头格式
+GRANULARITIES = {
+    "month": ("M", "%Y-%m"),
+    "day": ("D", "%Y-%m-%d"),
+    "hour": ("h", "%Y-%m-%d %H:00"),
+}
+
+
+def _unit(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"未知的统计粒度: {granularity}，可选 {list(GRANULARITIES)}")
+    return GRANULARITIES[granularity][0]
+
+
+def bucket_dtype(granularity):
+    return np.dtype(f"datetime64[{_unit(granularity)}]")
+
+
+def valid_mask(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        return ~np.isnan(values)
+    return ~pd.isna(values)
+
+
+class BucketCounts:
+    def __init__(self, buckets, valid, total):
+        # buckets 为升序的 datetime64 桶起点，valid 为 {指标: 每桶有效个数}，total 为每桶总个数
+        self.buckets = buckets
+        self.valid = valid
+        self.total = total
+
+    @classmethod
+    def empty(cls, metrics, granularity="month"):
+        buckets = np.empty(0, dtype=bucket_dtype(granularity))
+        return cls(buckets, {metric: np.zeros(0, dtype=np.int64) for metric in metrics}, np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def add(self, other):
+        # 按桶合并计数（分块统计时逐块累加）
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        buckets = np.union1d(self.buckets, other.buckets)
+        left = np.searchsorted(buckets, self.buckets)
+        right = np.searchsorted(buckets, other.buckets)
+
+        def merged(a, b):
+            result = np.zeros(len(buckets), dtype=np.int64)
+            np.add.at(result, left, a)
+            np.add.at(result, right, b)
+            return result
+
+        valid = {metric: merged(self.valid[metric], other.valid[metric]) for metric in self.valid}
+        return BucketCounts(buckets, valid, merged(self.total, other.total))
+
+    def head(self, n):
+        # 前 n 个桶的计数（增量统计时沿用未变化的部分）
+        return BucketCounts(self.buckets[:n], {metric: valid[:n] for metric, valid in self.valid.items()}, self.total[:n])
+
+    def rates(self, decimals=3):
+        return {metric: np.round(valid / self.total, decimals) for metric, valid in self.valid.items()}
+
+    def labels(self, granularity="month"):
+        return pd.DatetimeIndex(self.buckets.astype("datetime64[ns]")).strftime(GRANULARITIES[granularity][1])
+
+
+def grid_buckets(start, freq, length, granularity="month"):
+    # 固定网格上各时间桶的起点和首个点的下标；桶边界直接由时间推算（向上取整），不生成逐点时间
+    unit = _unit(granularity)
+    step = pd.Timedelta(freq).value
+    first = np.datetime64(pd.Timestamp(start), "ns")
+    last = first + np.timedelta64((length - 1) * step, "ns")
+    buckets = np.arange(first.astype(f"datetime64[{unit}]"), last.astype(f"datetime64[{unit}]") + 1)
+    offsets = np.maximum(-((first - buckets.astype("datetime64[ns]")).astype(np.int64) // step), 0)
+    # 比网格间隔还短的桶没有数据点，与下一个桶的边界相同，只保留后者
+    keep = np.r_[offsets[1:] != offsets[:-1], True]
+    return buckets[keep], offsets[keep]
+
+
+def grid_counts(start, freq, columns, granularity="month"):
+    """
+    固定网格上的计数：第 i 个值的时间为 start + i × freq，columns 为 {指标: 数组}。
+    时间单调递增，同一桶的点连续，桶边界处用 np.add.reduceat 一次求出每桶的有效个数。
+    """
+    length = len(next(iter(columns.values()))) if columns else 0
+    if not length:
+        return BucketCounts.empty(columns, granularity)
+
+    buckets, starts = grid_buckets(start, freq, length, granularity)
+    valid = {metric: np.add.reduceat(valid_mask(values), starts, dtype=np.int64) for metric, values in columns.items()}
+    total = np.diff(np.r_[starts, length]).astype(np.int64)
+    return BucketCounts(buckets, valid, total)
+
+
+def time_counts(times, columns, granularity="month"):
+    # 时间不规则（可能无序、含无效时间）时按桶编号计数，无效时间的行不计入
+    unit = _unit(granularity)
+    times = parse_times(times)
+    keep = ~np.isnat(times)
+    if not keep.any():
+        return BucketCounts.empty(columns, granularity)
+
+    buckets, inverse = np.unique(times[keep].astype(f"datetime64[{unit}]"), return_inverse=True)
+    valid = {metric: np.bincount(inverse, weights=valid_mask(values)[keep], minlength=len(buckets)).astype(np.int64)
+             for metric, values in columns.items()}
+    total = np.bincount(inverse, minlength=len(buckets)).astype(np.int64)
+    return BucketCounts(buckets, valid, total)
+
+
+def series_counts(series, metrics, granularity="month"):
+    # StationSeries 本身就在固定网格上
+    return grid_counts(series.start, series.freq, {metric: series.columns[metric] for metric in metrics}, granularity)
+
+
+class AvailabilityReport:
+    def __init__(self, metrics, granularity="month"):
+        self.metrics = list(metrics)
+        self.granularity = granularity
+        self.station_ids = []
+        self.counts = []
+
+    def add(self, station_id, counts):
+        self.station_ids.append(station_id)
+        self.counts.append(counts)
+
+    def matrices(self):
+        # 每个指标一个 场站 × 时间桶 的非空率矩阵，没有数据的桶为 NaN
+        buckets = np.empty(0, dtype=bucket_dtype(self.granularity))
+        for counts in self.counts:
+            buckets = np.union1d(buckets, counts.buckets)
+
+        matrices = {metric: np.full((len(self.counts), len(buckets)), np.nan) for metric in self.metrics}
+        for row, counts in enumerate(self.counts):
+            columns = np.searchsorted(buckets, counts.buckets)
+            for metric, rates in counts.rates().items():
+                matrices[metric][row, columns] = rates
+        return buckets, matrices
+
+    def sheets(self):
+        # 与原 results_sheets 结构一致：{指标: DataFrame(index=ID, columns=时间)}
+        buckets, matrices = self.matrices()
+        index = pd.Index(self.station_ids, name="ID")
+        columns = pd.Index(BucketCounts(buckets, {}, None).labels(self.granularity), name="Time")
+        return {metric: pd.DataFrame(matrix, index=index, columns=columns) for metric, matrix in matrices.items()}
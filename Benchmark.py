@@ -0,0 +1,759 @@
+import os
+import sys
+import json
+import uuid
+import argparse
+import datetime
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from Fusion_Engine import FUSION_RULES, fuse_columns
+from DB_Data import MongoDBFetcher, POINT_COLUMNS
+from Excel_Reader import ExcelReader, HAS_CALAMINE
+from Nas_Ingest import NasFetcher
+from Column_Alias import header_filter, cache_tag
+from Station_Series import StationSeries, GRID_START
+from Data_merge import merge_frames
+from Availability import AvailabilityReport, grid_counts
+from Report_Writer import HAS_XLSXWRITER, RED_GREEN_RULES, write_report
+from Threshold_Color import color_workbook, color_workbooks
+from Fleet_Analytics import FleetMask
+from Gap_Index import GapIndex, gap_index_path, read_gap_index, write_gap_index
+from Time_Parse import infer_format, parse_times
+from Station_Executor import run_stations
+from Storage import get_storage
+import Synthetic_Data
+import Nas_Data
+import DB_Data
+import Data_merge
+import Data_Fusion
+import Calculate_Rate
+
+"""
+性能基准测试：
+python Benchmark.py fusion --years 5    对比逐行 apply 与向量化融合引擎
+python Benchmark.py format --days 2000  对比原 _format_dataframe 与矩阵时间戳计算
+python Benchmark.py excel --months 24   对比 Nas 月度工作簿的读取引擎与缓存
+python Benchmark.py series --years 5    对比 DataFrame 与固定网格 StationSeries 的合并、融合耗时和内存
+python Benchmark.py availability --stations 1000  对比 strftime + groupby + pivot 与分桶计数引擎
+python Benchmark.py report --stations 1000   对比重新加载逐格着色与单次写出报表
+python Benchmark.py color --workbooks 4      对比整本加载与流式阈值着色
+python Benchmark.py ingest --latency 0.05    Nas 工作簿逐个读取与 I/O 线程预读对比（注入每次读取的延迟模拟共享目录）
+python Benchmark.py fleet --stations 1000 --years 5  全场站 × 5 分钟掩码上的各项分析耗时
+python Benchmark.py suite --stations 5 --years 1 [--label 说明]
+    用 Synthetic_Data 生成（或复用 --data 中的）合成数据，依次计时 format / clean_db / ingest / nas_merge / nas_clean /
+    merge / fusion / rate / report 各阶段，每个阶段一行追加到 --results（默认 benchmark_results.jsonl），记录 git 版本
+python Benchmark.py compare [基准] [对比]   按阶段比较两次 suite 的耗时（suite_id、版本号或 label，缺省为最后两次）
+"""
+
+
+def make_fusion_frame(years=5, nan_rate=0.2, seed=0):
+    # 合成 5 分钟间隔的 DB+Nas 数据，各列随机缺失
+    rng = np.random.default_rng(seed)
+    time_index = pd.date_range(start="2021-01-01 00:00", periods=int(years * 365 * 288), freq="5min")
+    n = len(time_index)
+    data = pd.DataFrame({"Time": time_index})
+    for column in ["Power_DB", "Radiation_DB", "Power_Nas", "Radiation_Nas"]:
+        values = rng.random(n) * 100
+        values[rng.random(n) < nan_rate] = np.nan
+        data[column] = values
+    return data
+
+
+def apply_fusion(data):
+    # 原 Data_Fusion.py 的逐行实现，作为对照
+    data['Power_fusion'] = data.apply(
+        lambda row: row['Power_Nas'] if pd.notna(row['Power_Nas']) else row['Power_DB'], axis=1
+    )
+    data['Radiation_fusion'] = data.apply(
+        lambda row: row['Radiation_Nas'] if pd.notna(row['Radiation_Nas']) else row['Radiation_DB'], axis=1
+    )
+    return data
+
+
+def make_point_documents(days=2000, nan_rate=0.05, seed=0):
+    # 合成 MongoDB 查询结果：每天一条文档，包含 ybDate 和 point1..point288
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.random((days, 288)) * 100, 4)
+    values[rng.random((days, 288)) < nan_rate] = np.nan
+    df = pd.DataFrame(values, columns=POINT_COLUMNS)
+    df.insert(0, "ybDate", pd.date_range(end="2026-01-01", periods=days, freq="D"))
+    df.insert(0, "stationId", "BENCH")
+    return df
+
+
+def legacy_format_dataframe(df, col_name, source, add_source_suffix):
+    # 原 MongoDBFetcher._format_dataframe 的逐元素实现，作为对照
+    def point_to_time(point):
+        point_index = int(point.replace('point', '')) - 1
+        hours = (point_index * 5) // 60
+        minutes = (point_index * 5) % 60
+        return f'{hours:02d}:{minutes:02d}' 
+
+    df = df.drop(columns=["_id", "_class", "stationId"], errors="ignore")
+    df["TIME"] = pd.to_datetime(df["ybDate"]) + pd.DateOffset(days=1)
+    df = df.drop(columns=["ybDate"]).set_index("TIME")
+    df = df[[f"point{i}" for i in range(1, 289)]].stack().reset_index()
+    df["level_1"] = df['level_1'].apply(point_to_time)
+    df["TIME"] = df["TIME"].dt.date.astype(str) + " " + df["level_1"]
+    df["TIME"] = pd.to_datetime(df["TIME"])
+    df = df.drop(columns=["level_1"]).set_index("TIME")
+    if add_source_suffix:
+        col_name = f"{col_name}_{source}"
+    df = df.rename(columns={0: col_name})
+    return df.shift(1).dropna()
+
+
+def make_power_workbooks(folder, months=24, seed=0):
+    # 合成 Nas 月度功率工作簿：表头写法各异，并带有无关列
+    rng = np.random.default_rng(seed)
+    headers = ["Power(MW)", "Power（MW）", "POWER(mv)", "总有功"]
+    paths = []
+    for month in range(months):
+        start = pd.Timestamp("2021-01-01") + pd.DateOffset(months=month)
+        time_index = pd.date_range(start, start + pd.DateOffset(months=1), freq="5min", inclusive="left")
+        df = pd.DataFrame({
+            "TIME" if month % 2 else "Time": time_index.strftime("%Y-%m-%d %H:%M:%S"),
+            headers[month % len(headers)]: np.round(rng.random(len(time_index)) * 50, 3),
+            "备注": "",
+            "状态": rng.integers(0, 2, len(time_index)),
+        })
+        path = os.path.join(folder, f"NARI-100-Bench_Power_{start:%Y%m}.xlsx")
+        df.to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def bench_fusion(args):
+    data = make_fusion_frame(years=args.years)
+    print(f"合成数据：{len(data)} 行（{args.years} 年，5 分钟间隔）")
+
+    expected, t_apply = timed(apply_fusion, data.copy())
+    result, t_vector = timed(fuse_columns, data.copy(), FUSION_RULES)
+
+    for column in FUSION_RULES:
+        pd.testing.assert_series_equal(result[column], expected[column], check_names=False)
+
+    print(f"逐行 apply：{t_apply:.3f} s")
+    print(f"向量化融合：{t_vector:.3f} s")
+    print(f"加速比：{t_apply / t_vector:.1f}x（结果一致）")
+
+
+def bench_format(args):
+    df = make_point_documents(days=args.days)
+    print(f"合成文档：{len(df)} 天 × 288 点")
+
+    # 不建立数据库连接，只调用格式化方法
+    fetcher = MongoDBFetcher.__new__(MongoDBFetcher)
+    expected, t_legacy = timed(legacy_format_dataframe, df.copy(), "实测功率", "FINAL", False)
+    result, t_matrix = timed(fetcher._format_dataframe, df.copy(), "实测功率", "FINAL", False)
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"原逐元素实现：{t_legacy:.3f} s")
+    print(f"矩阵时间戳计算：{t_matrix:.3f} s")
+    print(f"加速比：{t_legacy / t_matrix:.1f}x（结果一致）")
+
+
+def bench_excel(args):
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_power_workbooks(folder, months=args.months)
+        columns, tag = header_filter("Power"), cache_tag("Power")
+        print(f"合成工作簿：{len(paths)} 个月度文件")
+
+        def read_all(read):
+            return [read(path) for path in paths]
+
+        _, t_default = timed(read_all, pd.read_excel)
+        print(f"pd.read_excel 默认引擎（全部列）：{t_default:.3f} s")
+
+        reader = ExcelReader(engine="openpyxl")
+        _, t_openpyxl = timed(read_all, lambda path: reader.read(path, columns, tag))
+        print(f"openpyxl 只读 + 仅识别列：{t_openpyxl:.3f} s")
+
+        if HAS_CALAMINE:
+            reader = ExcelReader(engine="calamine")
+            _, t_calamine = timed(read_all, lambda path: reader.read(path, columns, tag))
+            print(f"calamine + 仅识别列：{t_calamine:.3f} s（{t_default / t_calamine:.1f}x）")
+        else:
+            print("未安装 python-calamine，跳过 calamine 引擎")
+
+        reader = ExcelReader(cache_folder=os.path.join(folder, "cache"))
+        _, t_cold = timed(read_all, lambda path: reader.read(path, columns, tag))
+        _, t_warm = timed(read_all, lambda path: reader.read(path, columns, tag))
+        print(f"缓存首次读取：{t_cold:.3f} s，缓存命中：{t_warm:.3f} s（{t_default / t_warm:.1f}x）")
+
+
+def bench_series(args):
+    # DB 与 Nas 文件按 CSV 读取后的样子：float64 数值列，无 Time 列，Nas 比 DB 短
+    frame = make_fusion_frame(years=args.years).drop(columns=["Time"]).round(3)
+    db_df = frame[["Power_DB", "Radiation_DB"]]
+    nas_df = frame[["Power_Nas", "Radiation_Nas"]].iloc[:len(frame) - 288 * 30]
+    print(f"合成数据：{len(db_df)} 行 DB，{len(nas_df)} 行 Nas")
+
+    def legacy():
+        # 原流程：补 Time 列 → 基于 Time 的外连接 → reindex 到完整时间序列 → 融合
+        db, nas = db_df.copy(), nas_df.copy()
+        db["Time"] = pd.date_range(start=GRID_START, periods=len(db), freq="5min")
+        nas["Time"] = pd.date_range(start=GRID_START, periods=len(nas), freq="5min")
+        data = merge_frames(db, nas)
+        full_time_index = pd.date_range(start=GRID_START, periods=len(data), freq="5min")
+        data = data.set_index("Time").reindex(full_time_index).reset_index().rename(columns={"index": "Time"})
+        return fuse_columns(data, FUSION_RULES)
+
+    def series():
+        db = StationSeries.from_frame(db_df, start=GRID_START, positional=True)
+        nas = StationSeries.from_frame(nas_df, start=GRID_START, positional=True)
+        return db.merge(nas).fuse(FUSION_RULES)
+
+    expected, t_legacy = timed(legacy)
+    result, t_series = timed(series)
+    pd.testing.assert_frame_equal(result.to_frame().astype({name: "float64" for name in result.columns}),
+                                  expected.astype({name: "float32" for name in result.columns}).astype(
+                                      {name: "float64" for name in result.columns}))
+
+    legacy_bytes = expected.memory_usage(deep=True).sum()
+    print(f"DataFrame 合并 + reindex + 融合：{t_legacy:.3f} s，内存 {legacy_bytes / 2 ** 20:.1f} MB")
+    print(f"StationSeries 偏移对齐 + 融合：{t_series:.3f} s，内存 {result.nbytes / 2 ** 20:.1f} MB"
+          f"（{result.nbytes / legacy_bytes:.0%}，结果一致）")
+
+
+def legacy_valid_rate(data, station_id, metrics):
+    # 原 Calculate_Rate.station_valid_rate + add_station_rate 的逐行实现，作为对照
+    start_time, time_interval = pd.Timestamp("2021-01-01 00:00"), pd.Timedelta(minutes=5)
+    data['时间'] = [start_time + i * time_interval for i in range(len(data))]
+    data['Time'] = data['时间'].dt.strftime('%Y-%m')
+    monthly_valid_rate = data.groupby(['Time'])[metrics].apply(lambda x: x.notna().mean().round(3)).reset_index()
+    monthly_valid_rate['ID'] = station_id
+    return monthly_valid_rate
+
+
+def bench_availability(args):
+    metrics = ["Power_fusion", "Radiation_fusion"]
+    frame = make_fusion_frame(years=args.years).rename(columns={"Power_Nas": metrics[0], "Radiation_Nas": metrics[1]})
+    data = frame[metrics]
+    station_ids = [f"S{i:04d}" for i in range(args.stations)]
+    print(f"合成数据：{args.stations} 个场站 × {len(data)} 行")
+
+    # 逐行实现太慢，只测前 legacy_stations 个场站后按比例估算
+    legacy_stations = min(args.stations, args.legacy_stations)
+
+    def legacy():
+        sheets = {metric: pd.DataFrame() for metric in metrics}
+        for station_id in station_ids[:legacy_stations]:
+            monthly_valid_rate = legacy_valid_rate(data.copy(), station_id, metrics)
+            for metric in metrics:
+                temp_data = monthly_valid_rate.pivot(index='ID', columns='Time', values=metric)
+                sheets[metric] = pd.concat([sheets[metric], temp_data], axis=0)
+        return sheets
+
+    def engine():
+        report = AvailabilityReport(metrics)
+        columns = {metric: data[metric].to_numpy() for metric in metrics}
+        for station_id in station_ids:
+            report.add(station_id, grid_counts("2021-01-01 00:00", "5min", columns))
+        return report.sheets()
+
+    expected, t_legacy = timed(legacy)
+    result, t_engine = timed(engine)
+    for metric in metrics:
+        pd.testing.assert_frame_equal(result[metric].iloc[:legacy_stations], expected[metric], check_names=False)
+
+    t_legacy_all = t_legacy / legacy_stations * args.stations
+    print(f"strftime + groupby.apply + pivot/concat：{t_legacy:.3f} s（{legacy_stations} 个场站），"
+          f"{args.stations} 个场站估算 {t_legacy_all:.1f} s")
+    print(f"分桶计数 + 场站 × 月矩阵：{t_engine:.3f} s（{t_legacy_all / t_engine:.0f}x，结果一致）")
+
+
+def legacy_write_report(sheets, output_file):
+    # 原 Calculate_Rate.write_rate_report：写出 "95.3%" 文本后重新加载逐格着色，作为对照
+    from openpyxl import load_workbook
+    from openpyxl.styles import PatternFill
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for sheet_name, sheet_data in sheets.items():
+            sheet_data.map(lambda x: f"{x * 100:.1f}%" if pd.notna(x) else "").to_excel(writer, sheet_name=sheet_name)
+    workbook = load_workbook(output_file)
+    for sheet_name in sheets:
+        sheet = workbook[sheet_name]
+        for row in range(2, sheet.max_row + 1):
+            for col in range(2, sheet.max_column + 1):
+                cell = sheet.cell(row=row, column=col)
+                if cell.value:
+                    value = float(cell.value.strip('%'))
+                    if value < 80.0:
+                        cell.fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+                    elif value == 100.0:
+                        cell.fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+    workbook.save(output_file)
+
+
+def make_rate_sheets(stations=1000, months=70, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.Index([f"S{i:04d}" for i in range(stations)], name="ID")
+    columns = pd.Index(pd.period_range("2021-01", periods=months, freq="M").strftime("%Y-%m"), name="Time")
+    sheets = {}
+    for metric in ["Power_fusion", "Radiation_fusion"]:
+        rates = np.round(rng.uniform(0.5, 1.0, size=(len(index), len(columns))), 3)
+        rates[rng.random(rates.shape) < 0.1] = np.nan
+        sheets[metric] = pd.DataFrame(rates, index=index, columns=columns)
+    return sheets
+
+
+def bench_report(args):
+    sheets = make_rate_sheets(args.stations, args.months)
+    print(f"合成报表：2 个指标 × {args.stations} 个场站 × {args.months} 个月")
+
+    with tempfile.TemporaryDirectory() as folder:
+        _, t_legacy = timed(legacy_write_report, sheets, os.path.join(folder, "legacy.xlsx"))
+        print(f"文本写出 + 重新加载逐格着色：{t_legacy:.3f} s")
+        engines = ["xlsxwriter", "openpyxl"] if HAS_XLSXWRITER else ["openpyxl"]
+        for engine in engines:
+            _, t_engine = timed(write_report, sheets, os.path.join(folder, f"{engine}.xlsx"), engine=engine)
+            print(f"{engine} 单次写出 + 条件格式：{t_engine:.3f} s（{t_legacy / t_engine:.1f}x）")
+
+
+def legacy_red_green(input_file, output_file):
+    # 原 Red_Green.py：整本加载后逐格解析 "x%" 文本着色，作为对照
+    import openpyxl
+    from openpyxl.styles import PatternFill
+    red_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+    green_fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+    workbook = openpyxl.load_workbook(input_file)
+    for sheet_name in workbook.sheetnames:
+        for row in workbook[sheet_name].iter_rows(min_row=2, min_col=2):
+            for cell in row:
+                if cell.value is None:
+                    cell.value = "0.0%"
+                    cell.fill = red_fill
+                else:
+                    value = float(cell.value.strip('%')) if isinstance(cell.value, str) else cell.value
+                    if value < 60.0:
+                        cell.fill = red_fill
+                    elif value >= 90.0:
+                        cell.fill = green_fill
+    workbook.save(output_file)
+
+
+def traced(func, *args, **kwargs):
+    # 返回 (结果, 耗时, Python 分配的内存峰值)
+    tracemalloc.start()
+    try:
+        result, elapsed = timed(func, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_color(args):
+    with tempfile.TemporaryDirectory() as folder:
+        inputs = []
+        for i in range(args.workbooks):
+            input_file = os.path.join(folder, f"rate_{i}.xlsx")
+            legacy_write_report(make_rate_sheets(args.stations, args.months, seed=i), input_file)
+            inputs.append(input_file)
+        print(f"合成工作簿：{args.workbooks} 个 × 2 个指标 × {args.stations} 个场站 × {args.months} 个月（原 Calculate_Rate 格式）")
+
+        _, t_legacy = timed(legacy_red_green, inputs[0], os.path.join(folder, "legacy.xlsx"))
+        print(f"整本加载逐格着色：{t_legacy:.3f} s / 工作簿")
+        _, t_stream = timed(color_workbook, inputs[0], os.path.join(folder, "stream.xlsx"), RED_GREEN_RULES)
+        print(f"只读 + 只写流式着色：{t_stream:.3f} s / 工作簿（{t_legacy / t_stream:.1f}x）")
+
+        if args.memory:
+            # tracemalloc 本身开销较大，内存峰值单独测量
+            m_legacy = traced(legacy_red_green, inputs[0], os.path.join(folder, "legacy.xlsx"))[2]
+            m_stream = traced(color_workbook, inputs[0], os.path.join(folder, "stream.xlsx"), RED_GREEN_RULES)[2]
+            print(f"内存峰值：整本加载 {m_legacy / 2 ** 20:.0f} MB，流式 {m_stream / 2 ** 20:.1f} MB")
+
+        pairs = [(input_file, os.path.join(folder, f"colored_{i}.xlsx")) for i, input_file in enumerate(inputs)]
+        _, t_parallel = timed(color_workbooks, pairs, RED_GREEN_RULES, args.workers)
+        print(f"{args.workbooks} 个工作簿并行着色：{t_parallel:.3f} s")
+
+
+def bench_ingest(args):
+    with tempfile.TemporaryDirectory() as folder:
+        data_folder = os.path.join(folder, "data")
+        Synthetic_Data.generate(data_folder, args.stations, args.years, seed=args.seed)
+        path_list = Nas_Data.get_all_files(os.path.join(data_folder, "nasroot"))
+        prefixes = [Synthetic_Data.nas_prefix(station_id) for station_id in Synthetic_Data.station_ids(args.stations)]
+        print(f"合成工作簿：{len(path_list)} 个（{args.stations} 个场站），每次读取注入 {args.latency * 1000:.0f} ms 延迟")
+
+        def ingest(name, fetcher):
+            power, radiation = os.path.join(folder, name, "Power"), os.path.join(folder, name, "Radiation")
+            for prefix in prefixes:
+                Nas_Data.process_station(path_list, prefix, power, radiation, ExcelReader(), fetcher)
+            return power, radiation
+
+        sequential, t_sequential = timed(ingest, "sequential", NasFetcher(io_workers=1, max_pending=1, latency=args.latency))
+        prefetched, t_prefetch = timed(ingest, "prefetch", NasFetcher(args.io_workers, args.prefetch, args.latency))
+        for expected_folder, result_folder in zip(sequential, prefetched):
+            for name in sorted(os.listdir(expected_folder)):
+                pd.testing.assert_frame_equal(pd.read_csv(os.path.join(result_folder, name)),
+                                              pd.read_csv(os.path.join(expected_folder, name)))
+
+    print(f"逐个读取：{t_sequential:.3f} s")
+    print(f"{args.io_workers} 个 I/O 线程预读：{t_prefetch:.3f} s（{t_sequential / t_prefetch:.1f}x，结果一致）")
+
+
+def bench_gaps(args):
+    # 基本完整的场站：写出融合文件和缺口索引后，分别从数据文件和缺口索引统计可用率
+    metrics = ["Power_fusion", "Radiation_fusion"]
+    rng = np.random.default_rng(args.seed)
+    slots = int(args.years * 365 * 288)
+    data = pd.DataFrame({"Time": pd.date_range(GRID_START, periods=slots, freq="5min")})
+    for metric in metrics:
+        data[metric] = np.where(Synthetic_Data.gap_mask(slots, args.gap_rate, rng=rng), np.nan, rng.random(slots))
+
+    storage = get_storage()
+    with tempfile.TemporaryDirectory() as folder:
+        data_path = storage.write(data, folder, "S0000")
+        index, t_build = timed(GapIndex.from_frame, data, GRID_START)
+        write_gap_index(index, data_path)
+        gaps = sum(len(index.gaps[metric][0]) for metric in metrics)
+        print(f"合成数据：{slots} 个时间点，缺失率 {args.gap_rate:.1%}，{gaps} 个缺口；建立索引 {t_build:.3f} s")
+        print(f"数据文件 {os.path.getsize(data_path) / 2 ** 20:.1f} MB，内存中 NaN 数组 {slots * 8 * len(metrics) / 2 ** 20:.1f} MB，"
+              f"缺口索引 {os.path.getsize(gap_index_path(data_path)) / 2 ** 10:.1f} KB")
+
+        def dense():
+            frame = storage.read(data_path)
+            return grid_counts(GRID_START, "5min", {metric: frame[metric].to_numpy() for metric in metrics}, args.granularity)
+
+        def indexed():
+            return read_gap_index(data_path, metrics).counts(metrics, args.granularity)
+
+        expected, t_dense = timed(dense)
+        result, t_indexed = timed(indexed)
+        for metric in metrics:
+            assert np.array_equal(expected.valid[metric], result.valid[metric])
+        print(f"读取数据文件 + 分桶计数：{t_dense:.3f} s")
+        print(f"读取缺口索引 + 按缺口计数：{t_indexed:.4f} s（{t_dense / t_indexed:.0f}x，结果一致）")
+
+        columns = {metric: data[metric].to_numpy() for metric in metrics}
+        _, t_grid = timed(grid_counts, GRID_START, "5min", columns, args.granularity)
+        _, t_counts = timed(index.counts, metrics, args.granularity)
+        print(f"内存中：NaN 数组分桶计数 {t_grid:.4f} s，缺口索引计数 {t_counts:.4f} s")
+        _, t_queries = timed(lambda: [(index.histogram(metric), index.holes(metric)) for metric in metrics])
+        print(f"缺口长度分布 + 有缺口的月份：{t_queries:.4f} s")
+
+
+def legacy_db_times(values):
+    # 原 DB_Data.clean_db_file：先按带毫秒的格式解析，失败后整列按 mixed 解析
+    try:
+        return pd.to_datetime(values, format="%Y-%m-%d %H:%M:%S.%f")
+    except ValueError:
+        return pd.to_datetime(values, format='mixed', errors='coerce')
+
+
+def bench_times(args):
+    # 按 CSV 中的写法生成时间文本列，比较原有解析方式、推断格式解析和缓存命中
+    times = pd.date_range(GRID_START, periods=int(args.years * 365 * 288), freq="5min")
+    values = pd.Series(times.strftime(args.format), dtype=object)
+    print(f"时间列：{len(values)} 行，推断格式 {infer_format(values.to_numpy())}")
+
+    expected = times.to_numpy()
+    for name, func in [
+        ("DB_Data：%f 格式失败后 mixed", legacy_db_times),
+        ("Nas_Data / Data_Fusion：无格式 coerce", lambda v: pd.to_datetime(v, errors='coerce')),
+        ("推断格式后显式解析", parse_times),
+    ]:
+        result, seconds = timed(func, values)
+        assert np.array_equal(np.asarray(result, dtype="datetime64[ns]"), expected)
+        print(f"{name}：{seconds:.3f} s")
+
+    # 缺一行的时间列
+    gapped = values.drop(index=len(values) // 2).reset_index(drop=True)
+    result, seconds = timed(parse_times, gapped)
+    assert np.array_equal(result, np.delete(expected, len(values) // 2))
+    print(f"推断格式（缺一行）：{seconds:.3f} s")
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "S0000.csv")
+        pd.DataFrame({"Time": values}).to_csv(source, index=False)
+        os.environ["TIME_PARSE_CACHE"] = os.path.join(folder, "time_cache.sqlite")
+        try:
+            _, t_miss = timed(parse_times, values, source)
+            result, t_hit = timed(parse_times, values, source)
+        finally:
+            del os.environ["TIME_PARSE_CACHE"]
+        assert np.array_equal(result, expected)
+        print(f"启用缓存：首次 {t_miss:.3f} s，文件未变化时 {t_hit:.4f} s（等间隔，按算术重新生成）")
+
+
+def bench_fleet(args):
+    # 直接合成掩码（不读文件）：各场站随机缺口，另外注入一段全场站停运，长度各不相同
+    rng = np.random.default_rng(args.seed)
+    slots = int(args.years * 365 * 288)
+    lengths = rng.integers(slots * 9 // 10, slots + 1, args.stations)
+    mask = np.zeros((args.stations, slots), dtype=bool)
+    for row, length in enumerate(lengths):
+        mask[row, :length] = ~Synthetic_Data.gap_mask(length, 0.05, rng=rng)
+    outage = slice(slots // 3, slots // 3 + 24)
+    mask[rng.random(args.stations) < 0.9, outage] = False
+    fleet = FleetMask([f"S{i:04d}" for i in range(args.stations)], {"Power_fusion": mask}, lengths)
+    print(f"合成掩码：{args.stations} 个场站 × {slots} 个时间点（{mask.nbytes / 2 ** 20:.0f} MB）")
+
+    for name, func, *func_args in [
+        ("按月可用率", fleet.period_rates, "Power_fusion", "month"),
+        ("按日可用率", fleet.period_rates, "Power_fusion", "day"),
+        ("按时段可用率", fleet.time_of_day_rates, "Power_fusion"),
+        ("停运窗口", fleet.outage_windows, "Power_fusion", 0.5),
+        ("缺口统计", fleet.gap_stats, "Power_fusion"),
+    ]:
+        result, seconds = timed(func, *func_args)
+        print(f"{name}：{seconds:.3f} s（{result.shape[0]} 行 × {result.shape[1]} 列）")
+    windows = fleet.outage_windows("Power_fusion", 0.5)
+    print(f"注入的停运窗口：{fleet.times([outage.start])[0]}，检测到 {windows['start'].isin(fleet.times([outage.start])).sum()} 个")
+
+
+SUITE_STAGES = ["format", "clean_db", "ingest", "nas_merge", "nas_clean", "merge", "fusion", "rate", "report"]
+
+
+def git_version():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _errors(names, results):
+    failed = [(name, error) for name, (_, error) in zip(names, results) if error is not None]
+    for name, error in failed:
+        print(f"{name} 处理失败: {error}")
+    return len(failed)
+
+
+def run_suite(data_folder, work_folder, granularity="month"):
+    """
+    在合成数据上依次运行各阶段，返回 [{stage, seconds, stations, errors}, ...]；
+    并行进程数取 STATION_WORKERS（suite 命令按 --workers 设置）。
+    """
+    storage = get_storage()
+    start_time = GRID_START
+    folders = {name: os.path.join(work_folder, name)
+               for name in ["DB", "nas_power", "nas_radiation", "nas_merged", "Nas", "DB+Nas", "Fusion"]}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+    records = []
+
+    def record(stage, seconds, stations, errors=0):
+        records.append({"stage": stage, "seconds": round(seconds, 4), "stations": stations, "errors": errors})
+        print(f"{stage:<10} {seconds:8.3f} s  {stations} 个场站" + (f"，{errors} 个失败" if errors else ""))
+
+    # DB_Data：point1..point288 文档转时间序列（只计格式化，不含读取文档）
+    mongo_folder = os.path.join(data_folder, "mongo")
+    documents = [pd.read_pickle(os.path.join(mongo_folder, f)) for f in sorted(os.listdir(mongo_folder))]
+    fetcher = MongoDBFetcher.__new__(MongoDBFetcher)
+    _, seconds = timed(lambda: [fetcher._format_dataframe(df, "实测功率", "FINAL", False) for df in documents])
+    record("format", seconds, len(documents))
+
+    db_source = os.path.join(data_folder, "DB_Download")
+    file_names = [os.path.basename(f) for f in storage.list_stations(db_source).values()]
+    tasks = [(file_name, db_source, folders["DB"], start_time) for file_name in file_names]
+    results, seconds = timed(run_stations, DB_Data.clean_db_file, tasks)
+    record("clean_db", seconds, len(tasks), _errors(file_names, results))
+
+    # Nas_Data：月度工作簿读取（不使用读取缓存）、合并功率 / 辐照度、补全时间序列
+    info = pd.read_excel(os.path.join(data_folder, "station_info.xlsx"))
+    path_list = Nas_Data.get_all_files(os.path.join(data_folder, "nasroot"))
+    prefixes = list(info["天气预报前缀"])
+    reader = ExcelReader()
+    tasks = [(path_list, prefix, folders["nas_power"], folders["nas_radiation"], reader) for prefix in prefixes]
+    results, seconds = timed(run_stations, Nas_Data.process_station, tasks)
+    errors = _errors(prefixes, results) + sum(bool(result[0]) for result, error in results if error is None)
+    record("ingest", seconds, len(tasks), errors)
+
+    error_log = []
+    _, seconds = timed(Nas_Data.merge_station_files, folders["nas_power"], folders["nas_radiation"],
+                       folders["nas_merged"], error_log)
+    record("nas_merge", seconds, len(prefixes), len(error_log))
+
+    _, seconds = timed(Nas_Data.clean_and_save_final, folders["nas_merged"], folders["Nas"], start_time)
+    record("nas_clean", seconds, len(prefixes))
+
+    # Data_merge / Data_Fusion / Calculate_Rate（不使用计数缓存）
+    db_files = storage.list_stations(folders["DB"])
+    nas_files = storage.list_stations(folders["Nas"])
+    all_ids = sorted(set(db_files) | set(nas_files))
+    tasks = [(station_id, db_files.get(station_id), nas_files.get(station_id), folders["DB+Nas"]) for station_id in all_ids]
+    results, seconds = timed(run_stations, Data_merge.merge_and_save, tasks)
+    record("merge", seconds, len(tasks), _errors(all_ids, results))
+
+    file_names = [os.path.basename(f) for f in storage.list_stations(folders["DB+Nas"]).values()]
+    tasks = [(file_name, folders["DB+Nas"], folders["Fusion"]) for file_name in file_names]
+    results, seconds = timed(run_stations, Data_Fusion.fusion_file, tasks)
+    record("fusion", seconds, len(tasks), _errors(file_names, results))
+
+    file_names = [os.path.basename(f) for f in storage.list_stations(folders["Fusion"]).values()]
+    report, seconds = timed(Calculate_Rate.cached_rate_report, file_names, folders["Fusion"], granularity)
+    record("rate", seconds, len(file_names))
+
+    sheets = report.sheets()
+    _, seconds = timed(Calculate_Rate.write_rate_report, sheets, os.path.join(work_folder, "report.xlsx"))
+    record("report", seconds, len(file_names))
+    return records
+
+
+def bench_suite(args):
+    if args.workers is not None:
+        # 子阶段通过 run_stations 的默认进程数读取
+        os.environ["STATION_WORKERS"] = str(args.workers)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        data_folder = args.data or os.path.join(temp_folder, "data")
+        params = Synthetic_Data.generate(data_folder, args.stations, args.years, args.gap_rate, args.dup_rate, args.seed)
+        print(f"合成数据：{data_folder}（{params}）")
+        records = run_suite(data_folder, os.path.join(temp_folder, "work"), args.granularity)
+
+    suite = {
+        "suite_id": f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}",
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "version": git_version(),
+        "label": args.label,
+        "params": {**params, "granularity": args.granularity},
+        "workers": int(os.getenv("STATION_WORKERS", os.cpu_count() or 1)),
+        "storage": get_storage().name,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+    with open(args.results, "a", encoding="utf-8") as f:
+        for record in records + [{"stage": "total", "seconds": round(sum(r["seconds"] for r in records), 4),
+                                  "stations": args.stations, "errors": sum(r["errors"] for r in records)}]:
+            f.write(json.dumps({**suite, **record}, ensure_ascii=False) + "\n")
+    print(f"结果已追加到 {args.results}（suite_id {suite['suite_id']}，版本 {suite['version']}）")
+
+
+def find_suite(results, key):
+    # 按 suite_id、版本号或 label 查找，多次匹配时取最后一次
+    matched = results[(results["suite_id"] == key) | (results["version"] == key) | (results["label"] == key)]
+    if matched.empty:
+        raise ValueError(f"找不到 suite：{key}")
+    return matched["suite_id"].iloc[-1]
+
+
+def bench_compare(args):
+    results = pd.read_json(args.results, lines=True, dtype={"version": str, "label": str})
+    suite_ids = list(dict.fromkeys(results["suite_id"]))
+    if args.base is None and len(suite_ids) < 2:
+        sys.exit(f"{args.results} 中少于两次 suite 结果")
+    base = find_suite(results, args.base) if args.base else suite_ids[-2]
+    head = find_suite(results, args.head) if args.head else suite_ids[-1]
+
+    def stage_seconds(suite_id):
+        return results[results["suite_id"] == suite_id].set_index("stage")["seconds"]
+
+    rows = []
+    for name, suite_id in [("基准", base), ("对比", head)]:
+        row = results[results["suite_id"] == suite_id].iloc[0]
+        rows.append(row)
+        print(f"{name}：{suite_id}  版本 {row['version']}  {row['label'] or ''}  参数 {row['params']}  进程数 {row['workers']}")
+    if any(rows[0][key] != rows[1][key] for key in ["params", "workers", "storage"]):
+        print("注意：两次运行的参数、进程数或存储格式不同，耗时不能直接比较")
+
+    table = pd.DataFrame({"base_s": stage_seconds(base), "head_s": stage_seconds(head)})
+    table = table.reindex([stage for stage in SUITE_STAGES + ["total"] if stage in table.index])
+    table["ratio"] = (table["head_s"] / table["base_s"]).round(3)
+    table["change"] = np.where(table["ratio"] > 1 + args.threshold, "变慢",
+                               np.where(table["ratio"] < 1 - args.threshold, "变快", ""))
+    print(table.to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate_Rate 性能基准测试")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    fusion_parser = subparsers.add_parser("fusion", help="融合：逐行 apply 与向量化引擎对比")
+    fusion_parser.add_argument("--years", type=float, default=5)
+    fusion_parser.set_defaults(func=bench_fusion)
+
+    format_parser = subparsers.add_parser("format", help="DB 下载：point1..point288 转时间序列")
+    format_parser.add_argument("--days", type=int, default=2000)
+    format_parser.set_defaults(func=bench_format)
+
+    excel_parser = subparsers.add_parser("excel", help="Nas：月度工作簿读取引擎与缓存")
+    excel_parser.add_argument("--months", type=int, default=24)
+    excel_parser.set_defaults(func=bench_excel)
+
+    series_parser = subparsers.add_parser("series", help="固定网格 StationSeries 与 DataFrame 对比")
+    series_parser.add_argument("--years", type=float, default=5)
+    series_parser.set_defaults(func=bench_series)
+
+    availability_parser = subparsers.add_parser("availability", help="非空率：groupby 与分桶计数引擎对比")
+    availability_parser.add_argument("--stations", type=int, default=1000)
+    availability_parser.add_argument("--years", type=float, default=5)
+    availability_parser.add_argument("--legacy-stations", type=int, default=5, help="原实现实际运行的场站数")
+    availability_parser.set_defaults(func=bench_availability)
+
+    report_parser = subparsers.add_parser("report", help="非空率报表：重新加载着色与单次写出对比")
+    report_parser.add_argument("--stations", type=int, default=1000)
+    report_parser.add_argument("--months", type=int, default=70)
+    report_parser.set_defaults(func=bench_report)
+
+    color_parser = subparsers.add_parser("color", help="阈值着色：整本加载与流式引擎对比")
+    color_parser.add_argument("--stations", type=int, default=1000)
+    color_parser.add_argument("--months", type=int, default=70)
+    color_parser.add_argument("--workbooks", type=int, default=4)
+    color_parser.add_argument("--workers", type=int, default=None)
+    color_parser.add_argument("--memory", action="store_true", help="另外测量内存峰值（tracemalloc）")
+    color_parser.set_defaults(func=bench_color)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Nas 工作簿：逐个读取与 I/O 线程预读对比")
+    ingest_parser.add_argument("--stations", type=int, default=3)
+    ingest_parser.add_argument("--years", type=float, default=1.0)
+    ingest_parser.add_argument("--seed", type=int, default=0)
+    ingest_parser.add_argument("--latency", type=float, default=0.05, help="每次读取注入的延迟（秒）")
+    ingest_parser.add_argument("--io-workers", type=int, default=4)
+    ingest_parser.add_argument("--prefetch", type=int, default=None)
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    gaps_parser = subparsers.add_parser("gaps", help="缺口索引：读取数据文件与按缺口统计可用率对比")
+    gaps_parser.add_argument("--years", type=float, default=5)
+    gaps_parser.add_argument("--gap-rate", type=float, default=0.01)
+    gaps_parser.add_argument("--granularity", default="month")
+    gaps_parser.add_argument("--seed", type=int, default=0)
+    gaps_parser.set_defaults(func=bench_gaps)
+
+    times_parser = subparsers.add_parser("times", help="时间列：原有解析方式与推断格式、缓存对比")
+    times_parser.add_argument("--years", type=float, default=5)
+    times_parser.add_argument("--format", default="%Y-%m-%d %H:%M:%S", help="时间文本的写法")
+    times_parser.set_defaults(func=bench_times)
+
+    fleet_parser = subparsers.add_parser("fleet", help="全场站可用率分析：月 / 日 / 时段可用率、停运窗口、缺口统计")
+    fleet_parser.add_argument("--stations", type=int, default=1000)
+    fleet_parser.add_argument("--years", type=float, default=5)
+    fleet_parser.add_argument("--seed", type=int, default=0)
+    fleet_parser.set_defaults(func=bench_fleet)
+
+    suite_parser = subparsers.add_parser("suite", help="合成数据上的全流程分阶段计时，结果追加到 JSONL")
+    suite_parser.add_argument("--stations", type=int, default=5)
+    suite_parser.add_argument("--years", type=float, default=1.0)
+    suite_parser.add_argument("--gap-rate", type=float, default=0.05)
+    suite_parser.add_argument("--dup-rate", type=float, default=0.01)
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--granularity", default="month")
+    suite_parser.add_argument("--data", default=None, help="合成数据文件夹，参数相同时复用，缺省时使用临时文件夹")
+    suite_parser.add_argument("--workers", type=int, default=1, help="场站并行进程数，默认 1（串行，结果更稳定）")
+    suite_parser.add_argument("--label", default="", help="本次运行的说明")
+    suite_parser.add_argument("--results", default="benchmark_results.jsonl")
+    suite_parser.set_defaults(func=bench_suite)
+
+    compare_parser = subparsers.add_parser("compare", help="按阶段比较两次 suite 的耗时")
+    compare_parser.add_argument("base", nargs="?", default=None, help="suite_id / 版本号 / label，缺省为倒数第二次")
+    compare_parser.add_argument("head", nargs="?", default=None, help="缺省为最后一次")
+    compare_parser.add_argument("--results", default="benchmark_results.jsonl")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="耗时比超出 1 ± threshold 时标记")
+    compare_parser.set_defaults(func=bench_compare)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import hashlib
+import datetime
+from Station_Executor import run_stations
+from Rate_Cache import file_fingerprint
+
+"""
+构建清单（SQLite，类似 make）：
+1、按 阶段 + 输出文件 记录上次成功生成时输入文件的指纹（路径、大小、修改时间）、参数和输出文件自身的指纹；
+2、输入、参数均未变化且输出文件未被改动或删除时跳过该场站，上游跳过时输出文件不变，下游阶段随之跳过；
+3、环境变量 BUILD_CONTENT_HASH=1 时输入按文件内容计算摘要（文件被原样复制、修改时间不可靠时使用）；
+4、force=True（各脚本的 --force）时全部重新生成，并照常记录清单。
+"""
+
+CONTENT_HASH = os.getenv("BUILD_CONTENT_HASH", "") not in ("", "0")
+
+
+def content_fingerprint(paths, extra=""):
+    # 按文件内容计算摘要，不存在的文件以 "-" 记录
+    digest = hashlib.sha1(extra.encode("utf-8"))
+    for path in paths:
+        digest.update(b"\n")
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            digest.update(b"-")
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, db_path, force=False, content_hash=None):
+        self.db_path = db_path
+        self.force = force
+        self.content_hash = CONTENT_HASH if content_hash is None else content_hash
+        # outdated() 时计算的输入指纹，record() 时写入；生成期间输入被修改时下次仍会重新生成
+        self.pending = {}
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outputs (
+                stage TEXT NOT NULL,
+                target TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                output TEXT NOT NULL,
+                built_at TEXT NOT NULL,
+                PRIMARY KEY (stage, target)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _inputs(self, inputs, params):
+        fingerprint = content_fingerprint if self.content_hash else file_fingerprint
+        return fingerprint(inputs, str(params))
+
+    def outdated(self, stage, target, inputs, params=""):
+        target = os.path.abspath(target)
+        current = self._inputs(inputs, params)
+        self.pending[(stage, target)] = current
+        if self.force:
+            return True
+        row = self.conn.execute(
+            "SELECT inputs, output FROM outputs WHERE stage = ? AND target = ?", (stage, target)).fetchone()
+        return row is None or row != (current, file_fingerprint([target]))
+
+    def record(self, stage, target, inputs=None, params=""):
+        # 生成成功后调用；没有输出文件（如输入为空时跳过写出）同样记录，输入不变时不再重试
+        target = os.path.abspath(target)
+        current = self.pending.pop((stage, target), None) or self._inputs(inputs or [], params)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO outputs VALUES (?, ?, ?, ?, ?) ON CONFLICT(stage, target) DO UPDATE SET "
+                "inputs = excluded.inputs, output = excluded.output, built_at = excluded.built_at",
+                (stage, target, current, file_fingerprint([target]), datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+
+
+def run_outdated(func, tasks, builds, manifest=None, workers=None):
+    """
+    builds 与 tasks 一一对应，为 (阶段, 输出文件, [输入文件], 参数)。只运行清单判定需要重新生成的任务，
+    成功后记录清单；结果按任务顺序返回 [(result, error), ...]，跳过的任务为 (None, None)。manifest 为 None 时全部运行。
+    """
+    tasks, builds = list(tasks), list(builds)
+    if manifest is None:
+        return run_stations(func, tasks, workers)
+
+    todo = [i for i, build in enumerate(builds) if manifest.outdated(*build)]
+    results = [(None, None)] * len(tasks)
+    for i, result in zip(todo, run_stations(func, [tasks[i] for i in todo], workers)):
+        results[i] = result
+        if result[1] is None:
+            stage, target, _, _ = builds[i]
+            manifest.record(stage, target)
+    stages = sorted({build[0] for build in builds})
+    print(f"构建清单（{', '.join(stages)}）：{len(tasks) - len(todo)} 个场站未变化已跳过，{len(todo)} 个场站重新生成")
+    return results
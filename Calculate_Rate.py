@@ -1,109 +1,252 @@
 import os
+import argparse
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+from Station_Executor import run_stations
+from Station_Chunks import resolve_chunk_rows, with_positions
+from Availability import GRANULARITIES, AvailabilityReport, BucketCounts, grid_counts, time_counts
+from Storage import get_storage
+from Report_Writer import RATE_RULES, RULE_SETS, write_report
+from Rate_Cache import RateCache, file_fingerprint
+from Gap_Index import read_gap_index
+from Run_Metrics import current_span, stage, start_run
 
 # 文件夹路径
 # input_folder = r"D:\新能源预测小组\Project\concat\data\DB+Nas"
 input_folder = r"D:\新能源预测小组\Project\concat\data\Fusion"
 # output_file = r"D:\新能源预测小组\Project\concat\data\DB和Nas非空数据统计（2021.01.01-今）.xlsx"
 output_file = r"D:\新能源预测小组\Project\concat\data\合并数据非空数据统计（2021.01.01-今）.xlsx"
-
-# 创建空的结果字典，用于存储不同Sheet数据
-results_sheets = {
-                # "Power_DB": pd.DataFrame(), 
-                # "Radiation_DB": pd.DataFrame(), 
-                # "Power_Nas": pd.DataFrame(), 
-                # "Radiation_Nas": pd.DataFrame(),
-                "Power_fusion": pd.DataFrame(),
-                "Radiation_fusion": pd.DataFrame()
-                }
+# 非空率计数缓存，融合文件未变化的场站不再重新读取
+cache_file = r"D:\新能源预测小组\Project\concat\data\rate_cache.sqlite"
+
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
+
+# 需要统计的指标列，忽略缺少这些列的文件
+required_columns = [
+    # 'Power_DB', 
+    # 'Radiation_DB', 
+    # 'Power_Nas', 
+    # 'Radiation_Nas',
+    'Power_fusion',
+    'Radiation_fusion'
+    ]
 
 # 定义时间序列的起始时间和间隔
 start_time = pd.Timestamp("2021-01-01 00:00")
 time_interval = pd.Timedelta(minutes=5)
 
-for file_name in os.listdir(input_folder):
-    if file_name.endswith(".csv"):
-        file_path = os.path.join(input_folder, file_name)
-        
-        # 读取文件并解决混合类型警告
+
+def station_availability(data, file_name, granularity="month"):
+    # 检查是否包含所需列，忽略缺少的文件
+    if not set(required_columns).issubset(data.columns):
+        print(f"文件 {file_name} 缺少必要列，跳过处理")
+        return None
+
+    columns = {metric: data[metric].to_numpy() for metric in required_columns}
+    if '时间' not in data.columns:
+        # 没有时间列时按行号对应 5 分钟网格，按桶边界直接求和
+        counts = grid_counts(start_time, time_interval, columns, granularity)
+    else:
+        counts = time_counts(data['时间'], columns, granularity)
+
+    # 检查时间列是否成功转换
+    if not len(counts):
+        print(f"文件 {file_name} 的 '时间' 列无法解析为有效的日期时间格式，跳过处理")
+        return None
+    return counts
+
+
+def chunk_availability(data, position, granularity="month"):
+    # 单块计数，position 为块首行在文件中的行号
+    columns = {metric: data[metric].to_numpy() for metric in required_columns}
+    if '时间' not in data.columns:
+        return grid_counts(start_time + position * time_interval, time_interval, columns, granularity)
+    return time_counts(data['时间'], columns, granularity)
+
+
+def station_availability_chunks(chunks, columns, file_name, granularity="month"):
+    # 分块统计：各块的计数按桶累加，结果与 station_availability 一致
+    if not set(required_columns).issubset(columns):
+        print(f"文件 {file_name} 缺少必要列，跳过处理")
+        return None
+
+    counts = BucketCounts.empty(required_columns, granularity)
+    for position, data in with_positions(chunks):
+        counts = counts.add(chunk_availability(data, position, granularity))
+
+    if not len(counts):
+        print(f"文件 {file_name} 的 '时间' 列无法解析为有效的日期时间格式，跳过处理")
+        return None
+    return counts
+
+
+def indexed_counts(file_path, granularity="month"):
+    # 数据文件旁有可用的缺口索引时直接按缺口计数，不读取数据文件
+    index = read_gap_index(file_path, required_columns)
+    if index is None or index.start != start_time or index.freq != time_interval or not index.length:
+        return None
+    return index.counts(required_columns, granularity)
+
+
+@stage("rate", station="file_name")
+def rate_file(file_name, input_folder, chunk_rows=None, granularity="month"):
+    file_path = os.path.join(input_folder, file_name)
+    counts = indexed_counts(file_path, granularity)
+    if counts is not None:
+        return counts
+    current_span().add_file(file_path)
+
+    # 分块模式：逐块计数，不读取整表
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    if chunk_rows:
         try:
-            data = pd.read_csv(file_path, low_memory=False)
+            columns = storage.read_columns(file_path)
+            return station_availability_chunks(storage.read_chunks(file_path, chunk_rows), columns, file_name, granularity)
         except Exception as e:
             print(f"文件 {file_name} 读取失败: {e}")
-            continue
-
-        # 检查是否包含所需列，忽略缺少的文件
-        required_columns = [
-            # 'Power_DB', 
-            # 'Radiation_DB', 
-            # 'Power_Nas', 
-            # 'Radiation_Nas',
-            'Power_fusion',
-            'Radiation_fusion'
-            ]
-        if not set(required_columns).issubset(data.columns):
-            print(f"文件 {file_name} 缺少必要列，跳过处理")
-            continue
-
-        # 确保时间列为 datetime 格式
-        if '时间' not in data.columns:
-            data['时间'] = [start_time + i * time_interval for i in range(len(data))]
+            return None
+
+    # 读取文件并解决混合类型警告
+    try:
+        data = storage.read(file_path)
+    except Exception as e:
+        print(f"文件 {file_name} 读取失败: {e}")
+        return None
+
+    current_span().add(rows=len(data))
+    return station_availability(data, file_name, granularity)
+
+
+def count_blocks(file_path, counts, salt=""):
+    # 固定网格上每个时间桶是文件中连续的一段行，按桶切分字节块供下次增量统计
+    return storage.row_blocks(file_path, np.r_[0, np.cumsum(counts.total)[:-1]], salt)
+
+
+def resumed_counts(file_path, columns, resume, chunk_rows=None, granularity="month", salt=""):
+    """
+    增量统计：resume 为上次的 (计数, 字节块)，找到第一个内容变化的时间桶，之前的桶沿用缓存，从该桶开始重新计数。
+    最后一个桶可能未满，总是重新计数；第一个桶就已变化时返回 None，由调用方整个文件重新计数。
+    """
+    cached, blocks = resume
+    matched = min(storage.matching_blocks(file_path, blocks, salt), len(blocks) - 1)
+    if not matched:
+        return None
+
+    row = int(cached.total[:matched].sum())
+    counts = cached.head(matched)
+    chunks = storage.read_from(file_path, blocks[matched][0], columns, chunk_rows, usecols=required_columns)
+    for position, data in with_positions(chunks):
+        current_span().add(rows=len(data))
+        counts = counts.add(chunk_availability(data, row + position, granularity))
+    return counts
+
+
+@stage("rate_cached", station="file_name")
+def rate_file_cached(file_name, input_folder, chunk_rows=None, granularity="month", salt="", resume=None):
+    """
+    带缓存统计时使用：返回 (计数, 是否写入缓存, 字节块, 是否增量统计)，统计方式与 rate_file 相同（含分块模式）。
+    resume 为缓存中上次的 (计数, 字节块)，没有时间列的 CSV 只重新读取第一个变化的时间桶及之后的行；
+    读取失败时不写入缓存，下次重试；缺少必要列等由文件内容决定的 None 结果照常写入。
+    """
+    file_path = os.path.join(input_folder, file_name)
+    counts = indexed_counts(file_path, granularity)
+    if counts is not None:
+        return counts, True, None, False
+    current_span().add_file(file_path)
+
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    try:
+        columns = storage.read_columns(file_path)
+        # 没有时间列时按行号对应 5 分钟网格，可以按时间桶切分文件
+        grid = set(required_columns).issubset(columns) and '时间' not in columns
+        if grid and resume is not None:
+            counts = resumed_counts(file_path, columns, resume, chunk_rows, granularity, salt)
+            if counts is not None:
+                return counts, True, count_blocks(file_path, counts, salt), True
+        if chunk_rows:
+            # 分块模式：逐块计数，不读取整表（分块读取在计数过程中进行，一并捕获读取失败）
+            counts = station_availability_chunks(storage.read_chunks(file_path, chunk_rows), columns, file_name, granularity)
         else:
-            data['时间'] = pd.to_datetime(data['时间'], errors='coerce')  # 转换为 datetime 格式
-        
-        # 检查时间列是否成功转换
-        if data['时间'].isna().all():
-            print(f"文件 {file_name} 的 '时间' 列无法解析为有效的日期时间格式，跳过处理")
-            continue
-
-        # 提取年月作为分组依据
-        data['Time'] = data['时间'].dt.strftime('%Y-%m')
-
-        # 计算每月的非空值率
-        monthly_valid_rate = (
-            data.groupby(['Time'])[required_columns]
-            .apply(lambda x: x.notna().mean().round(3))  # 计算非空值率并保留3位小数
-            .reset_index()
-        )
-
-        # 添加场站ID列
-        station_id = file_name.replace(".csv", "")
-        monthly_valid_rate['ID'] = station_id
-
-        # 将数据分别存储到对应的Sheet结构中
-        for metric in results_sheets.keys():
-            # 提取当前指标数据
-            temp_data = monthly_valid_rate.pivot(index='ID', columns='Time', values=metric)
-            # 合并到对应的Sheet
-            results_sheets[metric] = pd.concat([results_sheets[metric], temp_data], axis=0)
-
-# 将结果写入Excel文件，每个Sheet存储一个指标
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    for sheet_name, sheet_data in results_sheets.items():
-        # 转换为百分比格式并保存
-        sheet_data = sheet_data.map(lambda x: f"{x * 100:.1f}%" if pd.notna(x) else "")
-        sheet_data.to_excel(writer, sheet_name=sheet_name)
-
-# 添加条件格式化（标红 < 80%，标绿 100%）
-workbook = load_workbook(output_file)
-
-for sheet_name in results_sheets.keys():
-    sheet = workbook[sheet_name]
-
-    # 遍历所有数据单元格，应用条件格式
-    for row in range(2, sheet.max_row + 1):  # 从第2行开始（忽略标题）
-        for col in range(2, sheet.max_column + 1):  # 从第2列开始（忽略索引）
-            cell = sheet.cell(row=row, column=col)
-            if cell.value:  # 忽略空值
-                value = float(cell.value.strip('%'))  # 去掉百分号并转为浮点数
-                if value < 80.0:  # 如果小于80%
-                    cell.fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")  # 淡红色
-                elif value == 100.0:  # 如果等于100%
-                    cell.fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")  # 淡绿色
-
-# 保存文件
-workbook.save(output_file)
-
-print(f"统计完成，结果已保存至 {output_file}，并对80%以下和100%的数据进行了颜色标记")
+            data = storage.read(file_path)
+    except Exception as e:
+        print(f"文件 {file_name} 读取失败: {e}")
+        return None, False, None, False
+
+    if not chunk_rows:
+        current_span().add(rows=len(data))
+        counts = station_availability(data, file_name, granularity)
+    blocks = count_blocks(file_path, counts, salt) if grid and counts is not None else None
+    return counts, True, blocks, False
+
+
+def cached_rate_report(file_names, input_folder, granularity="month", cache_file=None):
+    # 指纹未变化的场站直接取缓存，其余场站并行统计后写回缓存；结果按文件顺序汇总
+    report = AvailabilityReport(required_columns, granularity)
+    if cache_file is None:
+        tasks = [(file_name, input_folder, None, granularity) for file_name in file_names]
+        for file_name, (counts, error) in zip(file_names, run_stations(rate_file, tasks)):
+            if error is not None:
+                print(f"文件 {file_name} 统计失败: {error}")
+            elif counts is not None:
+                report.add(os.path.splitext(file_name)[0], counts)
+        return report
+
+    cache = RateCache(cache_file)
+    try:
+        station_ids = [os.path.splitext(file_name)[0] for file_name in file_names]
+        extra = f"{granularity}|{','.join(required_columns)}|{start_time}|{time_interval}"
+        fingerprints = [file_fingerprint([os.path.join(input_folder, file_name)], extra) for file_name in file_names]
+        results = [cache.get(station_id, granularity, fingerprint, required_columns)
+                   for station_id, fingerprint in zip(station_ids, fingerprints)]
+
+        pending = [i for i, counts in enumerate(results)
+                   if counts is None and not cache.skipped(station_ids[i], granularity, fingerprints[i])]
+        tasks = [(file_names[i], input_folder, None, granularity, extra, cache.resume(station_ids[i], granularity, required_columns))
+                 for i in pending]
+        resumed = 0
+        for i, (result, error) in zip(pending, run_stations(rate_file_cached, tasks)):
+            if error is not None:
+                print(f"文件 {file_names[i]} 统计失败: {error}")
+                continue
+            counts, cacheable, blocks, partial = result
+            if cacheable:
+                cache.put(station_ids[i], granularity, fingerprints[i], counts, blocks)
+            results[i] = counts
+            resumed += partial
+        cache.prune(station_ids, granularity)
+        print(f"缓存命中 {len(file_names) - len(pending)} 个场站，增量统计 {resumed} 个场站，"
+              f"重新统计 {len(pending) - resumed} 个场站")
+    finally:
+        cache.close()
+
+    for station_id, counts in zip(station_ids, results):
+        if counts is not None:
+            report.add(station_id, counts)
+    return report
+
+
+@stage("report")
+def write_rate_report(results_sheets, output_file, rules=RATE_RULES):
+    # 单次写出数值单元格 + 百分比格式 + 条件格式（默认标红 < 80%，标绿 100%）
+    write_report(results_sheets, output_file, rules)
+    current_span().add(rows=sum(len(sheet) for sheet in results_sheets.values()))
+    current_span().add_file(output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="融合数据非空率统计")
+    parser.add_argument("--granularity", default="month", choices=list(GRANULARITIES), help="统计粒度，默认按月")
+    parser.add_argument("--colors", default="rate", choices=list(RULE_SETS),
+                        help="着色规则：rate 标红 < 80%% 标绿 100%%；red_green / full_nan 相当于写出后再运行 Red_Green.py / Full_Nan.py")
+    parser.add_argument("--no-cache", action="store_true", help="不使用计数缓存，全部重新统计")
+    args = parser.parse_args()
+    start_run("Calculate_Rate")
+
+    # 按场站并行统计，结果按文件顺序汇总
+    file_names = [os.path.basename(f) for f in storage.list_stations(input_folder).values()]
+    report = cached_rate_report(file_names, input_folder, args.granularity, None if args.no_cache else cache_file)
+
+    write_rate_report(report.sheets(), output_file, RULE_SETS[args.colors])
+
+    print(f"统计完成，结果已保存至 {output_file}，并按 {args.colors} 规则进行了颜色标记")
@@ -0,0 +1,110 @@
+import re
+import hashlib
+import unicodedata
+from functools import lru_cache
+
+"""
+Nas 表头别名解析：
+1、表头先规范化：全角转半角、上标单位转普通字符（NFKC，如 （MW） → (mw)、w/m² → w/m2）、转小写、去除所有空白；
+2、规范化后的表头与按数据类型编译好的规则匹配，得到 Time、Power_Nas、Radiation_Nas 等目标列；
+   含 预测、短期、限电、理论、可用、DQ_ 的表头（预测功率、限电功率等）一律不匹配；
+3、同一组表头只解析一次，表头相同的文件之间复用解析结果；
+4、找不到目标列、或有多个表头匹配同一目标列时，该目标列记为无法识别，由调用方输出结构化记录，不再生成空列或任取其一。
+"""
+
+# 别名规则：数据类型 → 目标列 → 正则列表（整体匹配规范化后的表头，任一正则匹配即可）
+ALIAS_RULES = {
+    "Power": {
+        "Time": [r"time", r"时间\.1"],
+        "Power_Nas": [
+            r"power_nas", r"rtpower\(mw\)",
+            r"power\((mw|mv|wm)\)",                          # Power(MW)、POWER(mv)、Power(WM)、Power（MW） 等
+            r"焦作\.[^.]+电站[^.]*有功总加值(power\(mw\))?",  # 焦作.亮马光伏电站亮马光伏有功总加值、焦作.庞冯营光伏电站庞冯营有功总加值Power(MW)
+            r"总有功", r"亮马光伏电站", r"qx2",
+        ],
+    },
+    "Radiation": {
+        "Time": [r"time", r"时间\.1"],
+        "Radiation_Nas": [
+            r"radiation_nas",
+            r"(gerneral_|general_)?radiation(\(w/m2\))?",  # Radiation(w/m²)、GERNERAL_RADIATION 等
+            r"power\(mw\)", r"xq2",                         # 部分场站辐照度文件沿用的表头
+        ],
+    },
+}
+
+# 规范化后含这些字样的表头是预测、限电等其他口径的列，不作为实测列
+EXCLUDED_HEADERS = r".*(预测|短期|限电|理论|可用|dq_).*"
+
+# 规则指纹：规则变化后 Excel 缓存自动失效
+RULES_SIGNATURE = hashlib.sha1(repr((ALIAS_RULES, EXCLUDED_HEADERS)).encode("utf-8")).hexdigest()[:12]
+
+COMPILED_RULES = {
+    data_type: [(target, re.compile("|".join(f"(?:{pattern})" for pattern in patterns)))
+                for target, patterns in targets.items()]
+    for data_type, targets in ALIAS_RULES.items()
+}
+COMPILED_EXCLUDED = re.compile(EXCLUDED_HEADERS)
+
+
+def normalize_header(name):
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(name))).lower()
+
+
+@lru_cache(maxsize=None)
+def match_header(name, data_type):
+    # 返回表头对应的目标列，无法识别时返回 None
+    normalized = normalize_header(name)
+    if COMPILED_EXCLUDED.fullmatch(normalized):
+        return None
+    for target, pattern in COMPILED_RULES[data_type]:
+        if pattern.fullmatch(normalized):
+            return target
+    return None
+
+
+@lru_cache(maxsize=None)
+def resolve_headers(headers, data_type):
+    """
+    headers 为表头元组，返回 (mapping, missing)：
+    mapping 为 {原表头: 目标列}，每个目标列只对应一个表头（有已是目标列名的表头时取该表头）；
+    missing 为未能识别的目标列元组，包括没有表头匹配和有多个表头匹配、无法确定取哪一个的目标列。
+    结果会被缓存复用，调用方不要修改 mapping。
+    """
+    candidates = {}
+    for name in headers:
+        target = match_header(name, data_type)
+        if target is not None:
+            candidates.setdefault(target, []).append(name)
+
+    mapping = {}
+    for target, names in candidates.items():
+        exact = [name for name in names if name == target]
+        names = exact or names
+        if len(names) == 1:
+            mapping[names[0]] = target
+
+    missing = tuple(target for target, _ in COMPILED_RULES[data_type] if target not in mapping.values())
+    return mapping, missing
+
+
+def header_filter(data_type):
+    # 供 ExcelReader 的 usecols 使用，只解析能识别的列
+    return lambda name: match_header(name, data_type) is not None
+
+
+def cache_tag(data_type):
+    return f"alias:{data_type}:{RULES_SIGNATURE}"
+
+
+def unresolved_record(file_path, data_type, headers, missing):
+    return {
+        "file": file_path,
+        "data_type": data_type,
+        "missing": "|".join(missing),
+        "headers": "|".join(str(name) for name in headers),
+        "normalized_headers": "|".join(normalize_header(name) for name in headers),
+        # 各缺失目标列匹配到的表头，多个时为重复匹配
+        "matches": "|".join(f"{target}={','.join(str(name) for name in headers if match_header(name, data_type) == target)}"
+                            for target in missing),
+    }
@@ -3,8 +3,17 @@ import numpy as np
 import os
 import datetime
 import pymongo
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from datetime import datetime, timedelta
+from Station_Executor import run_stations
+from Build_Manifest import BuildManifest, run_outdated
+from Storage import get_storage
+from Gap_Index import GapIndex, write_gap_index
+from Time_Parse import parse_times
+from Run_Metrics import current_span, span, stage, start_run
 
 column_name_map = {
     "WIND": {
@@ -21,17 +30,49 @@ column_name_map = {
     }
 }
 
+# 每天 288 个点（5 分钟间隔），point1 对应 00:00
+POINT_COLUMNS = [f"point{i}" for i in range(1, 289)]
+POINT_OFFSETS = (np.arange(288) * np.timedelta64(5, "m")).astype("timedelta64[ns]")
+
+# 只从服务端读取需要的字段
+POINT_PROJECTION = {"_id": 0, "ybDate": 1, **{col: 1 for col in POINT_COLUMNS}}
+CURSOR_BATCH_SIZE = 500
+
+# 同时在途的 MongoDB 查询数上限
+MAX_QUERY_WORKERS = int(os.getenv("MONGO_MAX_WORKERS", "4"))
+
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
+
+# 同一进程内按连接串共享 MongoClient（自带连接池），避免每个场站重新建立连接
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(mongo_uri):
+    with _shared_clients_lock:
+        if mongo_uri not in _shared_clients:
+            _shared_clients[mongo_uri] = pymongo.MongoClient(mongo_uri, maxPoolSize=MAX_QUERY_WORKERS * 2)
+        return _shared_clients[mongo_uri]
+
+
 class MongoDBFetcher:
-    def __init__(self, db_name="nwpc", layer=80, log=False):
+    def __init__(self, db_name="nwpc", layer=80, log=False, client=None, max_workers=None):
         username = os.getenv("MONGO_USERNAME", "nari")
         password = os.getenv("MONGO_PASSWORD", "nari0755")
         host = os.getenv("MONGO_HOST", "192.168.5.8")
         port = os.getenv("MONGO_PORT", "27017")
         
         mongo_uri = f"mongodb://{username}:{password}@{host}:{port}/"
-        self.client = pymongo.MongoClient(mongo_uri)
+        # 可传入外部客户端（如 mongomock 或本地 mongod）用于测试
+        self.client = client if client is not None else get_shared_client(mongo_uri)
         self.db = self.client[db_name]
         self.layer = layer
+        # 并发查询上限
+        self.max_workers = max_workers or MAX_QUERY_WORKERS
+        self._query_slots = threading.BoundedSemaphore(self.max_workers)
+        # 每个场站本次读取到的各数据集最新 ybDate，用于增量更新的高水位
+        self.watermarks = {}
         if log:
             self._log_collections_info(db_name)
 
@@ -41,44 +82,90 @@ class MongoDBFetcher:
         print(f"Database List: {db_list}")
         print(f"Collection List for {db_name}: {collection_list}")
 
-    def _get_collection_data(self, collection_name, station_id, col_name, source="FINAL", days=7, end_time=None, add_source_suffix=False):
+    def _get_collection_data(self, collection_name, station_id, col_name, source="FINAL", days=7, end_time=None, add_source_suffix=False, since=None):
         end_time = end_time or (datetime.today() - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         start_time = end_time - timedelta(days=days)
         
         if col_name in ["\u9884\u6d4b\u98ce\u901f\u98ce\u5411", "\u5b9e\u6d4b\u98ce\u901f\u5b9e\u6d4b\u98ce\u5411"]:
             weather_types = ["WIND_SPEED", "WIND_DIR"]
-            data_frames = []
-            for weather_type in weather_types:
+
+            def fetch_weather_type(weather_type):
                 col_name_temp = "\u5b9e\u6d4b\u98ce\u901f" if weather_type == "WIND_SPEED" else "\u5b9e\u6d4b\u98ce\u5411"
                 if col_name == "\u9884\u6d4b\u98ce\u901f\u98ce\u5411":
                     col_name_temp = "\u9884\u6d4b\u98ce\u901f" if weather_type == "WIND_SPEED" else "\u9884\u6d4b\u98ce\u5411"
-                query = self._build_query(collection_name, station_id, col_name_temp, source, start_time, end_time, weather_type)
-                cursor = self.db[collection_name].find(query).sort("ybDate", pymongo.ASCENDING)
-                df = pd.DataFrame(list(cursor))
-                df = df.drop_duplicates(subset='ybDate')
+                query = self._build_query(collection_name, station_id, col_name_temp, source, start_time, end_time, weather_type, since=since)
+                yb_dates, values = self._find_matrix(collection_name, query)
 
-                if df.empty:
+                if len(yb_dates) == 0:
                     print(f"No data found for station {station_id} and column {col_name_temp} with weather type {weather_type}")
-                    continue
-                formatted_df = self._format_dataframe(df, col_name_temp, source, add_source_suffix)
-                data_frames.append(formatted_df)
+                    if since is not None:
+                        self._track_watermark(station_id, since)
+                    return pd.DataFrame()
+                self._track_watermark(station_id, yb_dates.max())
+                return self._format_matrix(yb_dates, values, col_name_temp, source, add_source_suffix)
+
+            # 风速、风向两个查询并发执行
+            with ThreadPoolExecutor(max_workers=len(weather_types)) as pool:
+                data_frames = [df for df in pool.map(fetch_weather_type, weather_types) if not df.empty]
             if data_frames:
                 return reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how="outer"), data_frames)
             else:
                 return pd.DataFrame()
         else:
-            query = self._build_query(collection_name, station_id, col_name, source, start_time, end_time)
-            cursor = self.db[collection_name].find(query).sort("ybDate", pymongo.ASCENDING)
-            df = pd.DataFrame(list(cursor))
-            df = df.drop_duplicates(subset='ybDate')
+            query = self._build_query(collection_name, station_id, col_name, source, start_time, end_time, since=since)
+            yb_dates, values = self._find_matrix(collection_name, query)
 
-            if df.empty:
+            if len(yb_dates) == 0:
                 print(f"No data found for station {station_id} and column {col_name}")
+                if since is not None:
+                    self._track_watermark(station_id, since)
                 return pd.DataFrame()
-            return self._format_dataframe(df, col_name, source, add_source_suffix)
+            self._track_watermark(station_id, yb_dates.max())
+            return self._format_matrix(yb_dates, values, col_name, source, add_source_suffix)
+
+    @stage("mongo")
+    def _find_matrix(self, collection_name, query):
+        # 只取 ybDate 和 point1..point288，逐批解码到 (天数 × 288) 数组，不再生成完整的文档列表；
+        # 数组按需倍增扩容，不为预估大小另外执行 count_documents
+        # 信号量限制同时在途的查询数，连接由共享客户端的连接池复用
+        with self._query_slots:
+            collection = self.db[collection_name]
+            capacity = CURSOR_BATCH_SIZE
+            yb_dates = np.empty(capacity, dtype=object)
+            values = np.full((capacity, 288), np.nan)
 
-    def _build_query(self, collection_name, station_id, col_name, source, start_time, end_time, weather_type=None):
-        query = {"stationId": station_id, "ybDate": {"$gte": start_time, "$lte": end_time}}
+            n = 0
+            cursor = collection.find(query, dict(POINT_PROJECTION), batch_size=CURSOR_BATCH_SIZE).sort("ybDate", pymongo.ASCENDING)
+            for doc in cursor:
+                yb_date = doc["ybDate"]
+                # 按 ybDate 升序返回，重复日期相邻，保留第一条（同 drop_duplicates）
+                if n > 0 and yb_dates[n - 1] == yb_date:
+                    continue
+                if n == capacity:
+                    capacity *= 2
+                    yb_dates = np.resize(yb_dates, capacity)
+                    values = np.resize(values, (capacity, 288))
+                yb_dates[n] = yb_date
+                values[n] = [doc.get(col) for col in POINT_COLUMNS]
+                n += 1
+
+        current_span().add(rows=n)
+        return pd.to_datetime(yb_dates[:n]).values, values[:n]
+
+    def _track_watermark(self, station_id, yb_date):
+        self.watermarks.setdefault(station_id, []).append(pd.Timestamp(yb_date))
+
+    def get_watermark(self, station_id):
+        # 取各数据集最新 ybDate 的最小值，保证滞后的数据集在下次增量时不会被跳过
+        marks = self.watermarks.get(station_id)
+        return min(marks) if marks else None
+
+    def _build_query(self, collection_name, station_id, col_name, source, start_time, end_time, weather_type=None, since=None):
+        if since is not None:
+            # 增量模式：只读取高水位之后的文档
+            query = {"stationId": station_id, "ybDate": {"$gt": since, "$lte": end_time}}
+        else:
+            query = {"stationId": station_id, "ybDate": {"$gte": start_time, "$lte": end_time}}
         if "forecast" in collection_name:
             query["dataSource"] = source
         if collection_name in ["forecastWeather", "rtTower"]:
@@ -91,24 +178,23 @@ class MongoDBFetcher:
         return query
 
     def _format_dataframe(self, df, col_name, source, add_source_suffix):
-        def point_to_time(point):
-            point_index = int(point.replace('point', '')) - 1
-            hours = (point_index * 5) // 60
-            minutes = (point_index * 5) % 60
-            return f'{hours:02d}:{minutes:02d}' 
-
-        df = df.drop(columns=["_id", "_class", "stationId"], errors="ignore")
-        df["TIME"] = pd.to_datetime(df["ybDate"]) + pd.DateOffset(days=1)
-        df = df.drop(columns=["ybDate"]).set_index("TIME")
-        df = df[[f"point{i}" for i in range(1, 289)]].stack().reset_index()
-        df["level_1"] = df['level_1'].apply(point_to_time)
-        df["TIME"] = df["TIME"].dt.date.astype(str) + " " + df["level_1"]
-        df["TIME"] = pd.to_datetime(df["TIME"])
-        df = df.drop(columns=["level_1"]).set_index("TIME")
+        values = df[POINT_COLUMNS].to_numpy(dtype=float)
+        return self._format_matrix(df["ybDate"].to_numpy(), values, col_name, source, add_source_suffix)
+
+    @stage("format")
+    def _format_matrix(self, yb_dates, values, col_name, source, add_source_suffix):
+        # (天数 × 288) 矩阵直接按 "ybDate 次日零点 + (point序号-1) × 5分钟" 计算时间戳
+        day_base = pd.DatetimeIndex(pd.to_datetime(yb_dates)).normalize() + pd.Timedelta(days=1)
+        times = (day_base.values[:, None] + POINT_OFFSETS[None, :]).ravel()
+        values = values.ravel()
+
+        # 与 stack() 一致丢弃空值，再等价实现 shift(1).dropna()：值顺延一位，首行丢弃
+        keep = ~np.isnan(values)
+        times, values = times[keep], values[keep]
         if add_source_suffix:
             col_name = f"{col_name}_{source}"
-        df = df.rename(columns={0: col_name})
-        return df.shift(1).dropna()
+        index = pd.DatetimeIndex(times[1:], name="TIME")
+        return pd.DataFrame({col_name: values[:-1]}, index=index)
 
     def get_station_data(self, station_id, 
                          days=15, 
@@ -117,7 +203,9 @@ class MongoDBFetcher:
                          end_time=None,
                          db_list=None,
                          sources=["FINAL"],
-                         station_type="WIND"):
+                         station_type="WIND",
+                         since=None):
+        self.watermarks[station_id] = []
         collections = ['rtLoad']
         if not db_list:
             if not only_rt:
@@ -128,18 +216,25 @@ class MongoDBFetcher:
                 end_time = pd.to_datetime(end_time)
         else:
             collections = db_list
-        data_frames = []
+        if since is not None:
+            since = pd.to_datetime(since).to_pydatetime()
         add_source_suffix = len(sources) > 1
 
-        for collection in collections:
-            for source in sources:
-                col_name = self._get_column_name_based_on_context(collection, station_type)
-                print(f'reading {col_name} data from source {source}')
+        def fetch(task):
+            collection, source, col_name = task
+            print(f'reading {col_name} data from source {source}')
+            with span("fetch", station_id, collection=collection, source=source) as metrics:
+                df = self._get_collection_data(collection, station_id, col_name, source=source, days=days, end_time=end_time, add_source_suffix=add_source_suffix, since=since)
+                metrics.add(rows=len(df))
+                return df
+
+        tasks = [(collection, source, self._get_column_name_based_on_context(collection, station_type))
+                 for collection in collections for source in sources]
+        tasks = [task for task in tasks if task[2]]
 
-                if col_name:
-                    df = self._get_collection_data(collection, station_id, col_name, source=source, days=days, end_time=end_time, add_source_suffix=add_source_suffix)
-                    if not df.empty:
-                        data_frames.append(df)
+        # 各数据集、数据源并发查询，结果按原顺序合并
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tasks)))) as pool:
+            data_frames = [df for df in pool.map(fetch, tasks) if not df.empty]
 
         if not data_frames:
             return pd.DataFrame()
@@ -147,71 +242,148 @@ class MongoDBFetcher:
         merged_df = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how="outer"), data_frames)
         return merged_df.sort_index().replace(-99, np.nan).round(4)
 
+    def get_stations_data(self, station_ids, **kwargs):
+        # 多个场站并发下载，共享同一个客户端与查询并发上限，返回 {场站: DataFrame}
+        station_ids = list(station_ids)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(station_ids)))) as pool:
+            frames = pool.map(lambda station_id: self.get_station_data(station_id, **kwargs), station_ids)
+            return dict(zip(station_ids, frames))
+
     def _get_column_name_based_on_context(self, collection_name, station_type):
         return column_name_map.get(station_type, {}).get(collection_name)
 
 
-if __name__ == "__main__":
-    INFO = pd.read_excel("station_info.xlsx").set_index("NwpId")
-    for nwp in INFO.index:
-        f = MongoDBFetcher(layer=80)
-        df = f.get_station_data(nwp, need_weather=True, db_list=["rtLoad", "rtTower"], station_type="SOLAR", days=2000, sources=["FINAL"])
-        output_path = r"D:\\新能源预测小组\\Project\\concat\\data\\DB_Download"
+def watermark_path(output_path, nwp):
+    return os.path.join(output_path, f"{nwp}.watermark")
+
+
+def read_watermark(output_path, nwp):
+    path = watermark_path(output_path, nwp)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return pd.Timestamp(f.read().strip())
+
+
+def write_watermark(output_path, nwp, watermark):
+    with open(watermark_path(output_path, nwp), "w") as f:
+        f.write(watermark.isoformat())
+
 
+@stage("download", station="nwp")
+def download_station(nwp, output_path, incremental=False, lookback_days=1):
+    f = MongoDBFetcher(layer=80)
+    fetch_kwargs = dict(need_weather=True, db_list=["rtLoad", "rtTower"], station_type="SOLAR", sources=["FINAL"])
+    column_rename_map = {
+        "\u5b9e\u6d4b\u529f\u7387": "Power_DB",
+        "\u5b9e\u6d4b\u8f90\u7167\u5ea6": "Radiation_DB"
+    }
+
+    # 增量模式：已有高水位和历史文件时，只读取 (高水位 - 回看天数) 之后的文档并追加
+    # 回看至少 1 天，才能补上跨天 shift(1) 时新数据首行丢失的点，并覆盖迟到的修正数据
+    stored_path = storage.path(output_path, nwp)
+    watermark = read_watermark(output_path, nwp) if incremental else None
+    if watermark is not None and os.path.exists(stored_path):
+        since = watermark - timedelta(days=lookback_days)
+        df = f.get_station_data(nwp, since=since, **fetch_kwargs)
         if df.empty or df.columns.empty:
-            print(f"No data found for {nwp}, generating default data")
-            start_date = pd.to_datetime("2021-01-01")
-            end_date = pd.to_datetime("today")
-            time_index = pd.date_range(start=start_date, end=end_date, freq="5min")
-            df = pd.DataFrame(index=time_index, columns=["Power_DB", "Radiation_DB"])
-        
-        column_rename_map = {
-            "\u5b9e\u6d4b\u529f\u7387": "Power_DB",
-            "\u5b9e\u6d4b\u8f90\u7167\u5ea6": "Radiation_DB"
-        }
+            print(f"场站 {nwp} 在 {watermark} 之后没有新数据")
+            return
         df = df.rename(columns=column_rename_map)
-
+        stored = storage.read(stored_path, time_index=True)
+        df = pd.concat([stored, df])
+        df = df[~df.index.duplicated(keep='last')].sort_index()
         df.index.name = "Time"
+        storage.write(df, output_path, nwp, encoding='utf-8')
+        write_watermark(output_path, nwp, max(watermark, f.get_watermark(nwp)))
+        print(f"文件{nwp}已增量更新")
+        return
+
+    df = f.get_station_data(nwp, days=2000, **fetch_kwargs)
+
+    if df.empty or df.columns.empty:
+        print(f"No data found for {nwp}, generating default data")
+        start_date = pd.to_datetime("2021-01-01")
+        end_date = pd.to_datetime("today")
+        time_index = pd.date_range(start=start_date, end=end_date, freq="5min")
+        df = pd.DataFrame(index=time_index, columns=["Power_DB", "Radiation_DB"])
+    
+    df = df.rename(columns=column_rename_map)
+
+    df.index.name = "Time"
+
+    storage.write(df, output_path, nwp, encoding='utf-8')
+    if f.get_watermark(nwp) is not None:
+        write_watermark(output_path, nwp, f.get_watermark(nwp))
+    print(f"文件{nwp}已处理完毕")
+
+
+@stage("clean_db", station="filename")
+def clean_db_file(filename, source_folder, target_folder, start_time, time_freq="5min"):
+    source_file_path = os.path.join(source_folder, filename)
+    
+    df = storage.read(source_file_path)
+    df.rename(columns={df.columns[0]: "Time"}, inplace=True)
+    df["Time"] = parse_times(df["Time"], source=source_file_path)
+    
+    df.set_index("Time", inplace=True)
+    df = df[df.index >= start_time]
+    
+    if df.empty or df.index.max() is pd.NaT:
+        print(f"文件 {filename} 时间索引为空，已跳过。")
+        return
+    
+    df = df[~df.index.duplicated(keep='last')]
+    full_time_index = pd.date_range(start=start_time, end=df.index.max(), freq=time_freq)
+    df = df.reindex(full_time_index)
+    
+    if 'Power_DB' in df.columns and 'Radiation_DB' in df.columns:
+        df = df[['Power_DB', 'Radiation_DB']]      
+    
+    df.reset_index(inplace=True)
+    df.rename(columns={"index": "Time"}, inplace=True)
+
+    output_file_path = storage.write(df, target_folder, os.path.splitext(filename)[0])
+    write_gap_index(GapIndex.from_frame(df, start_time, freq=time_freq), output_file_path)
+    current_span().add(rows=len(df))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从 MongoDB 下载场站实测数据")
+    parser.add_argument("--full", action="store_true", help="忽略高水位，全量下载最近 2000 天数据")
+    parser.add_argument("--lookback-days", type=int, default=1, help="增量模式下回看的天数，用于补充迟到的修正数据")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，重新整理全部下载文件")
+    args = parser.parse_args()
+    start_run("DB_Data")
+
+    INFO = pd.read_excel("station_info.xlsx").set_index("NwpId")
+    output_path = r"D:\\新能源预测小组\\Project\\concat\\data\\DB_Download"
 
-        df.to_csv(f'{output_path}/{nwp}.csv', index=True, encoding='utf-8')
-        print(f"文件{nwp}已处理完毕")
+    # 按场站并行下载，每个进程使用独立的 MongoDB 连接
+    nwp_list = list(INFO.index)
+    tasks = [(nwp, output_path, not args.full, args.lookback_days) for nwp in nwp_list]
+    for nwp, (_, error) in zip(nwp_list, run_stations(download_station, tasks)):
+        if error is not None:
+            print(f"场站 {nwp} 下载失败: {error}")
 
     source_folder = r"D:\\新能源预测小组\\Project\\concat\\data\\DB_Download"
     target_folder = r"D:\\新能源预测小组\\Project\\concat\\data\\DB"
+    # 下载文件的时间列解析结果按文件缓存
+    os.environ.setdefault("TIME_PARSE_CACHE", r"D:\\新能源预测小组\\Project\\concat\\data\\time_cache.sqlite")
 
     os.makedirs(target_folder, exist_ok=True)
     start_time = pd.Timestamp("2021-01-01 00:00")
     time_freq = "5min"
 
-    for filename in os.listdir(source_folder):
-        if filename.endswith(".csv"):
-            source_file_path = os.path.join(source_folder, filename)
-            target_file_path = os.path.join(target_folder, filename)
-            
-            df = pd.read_csv(source_file_path)
-            df.rename(columns={df.columns[0]: "Time"}, inplace=True)
-            try:
-                df["Time"] = pd.to_datetime(df["Time"], format="%Y-%m-%d %H:%M:%S.%f")
-            except ValueError:
-                df["Time"] = pd.to_datetime(df["Time"], format='mixed', errors='coerce')
-            
-            df.set_index("Time", inplace=True)
-            df = df[df.index >= start_time]
-            
-            if df.empty or df.index.max() is pd.NaT:
-                print(f"文件 {filename} 时间索引为空，已跳过。")
-                continue
-            
-            df = df[~df.index.duplicated(keep='last')]
-            full_time_index = pd.date_range(start=start_time, end=df.index.max(), freq=time_freq)
-            df = df.reindex(full_time_index)
-            
-            if 'Power_DB' in df.columns and 'Radiation_DB' in df.columns:
-                df = df[['Power_DB', 'Radiation_DB']]      
-            
-            df.reset_index(inplace=True)
-            df.rename(columns={"index": "Time"}, inplace=True)
-
-            df.to_csv(target_file_path, index=False)
+    # 下载文件未变化的场站跳过整理
+    manifest = BuildManifest(r"D:\\新能源预测小组\\Project\\concat\\data\\build_manifest.sqlite", force=args.force)
+    file_names = [os.path.basename(f) for f in storage.list_stations(source_folder).values()]
+    tasks = [(filename, source_folder, target_folder, start_time, time_freq) for filename in file_names]
+    builds = [("clean_db", storage.path(target_folder, os.path.splitext(filename)[0]),
+               [os.path.join(source_folder, filename)], f"{start_time}|{time_freq}") for filename in file_names]
+    for filename, (_, error) in zip(file_names, run_outdated(clean_db_file, tasks, builds, manifest)):
+        if error is not None:
+            print(f"文件 {filename} 处理失败: {error}")
+    manifest.close()
 
     print(f"所有文件已处理完成，并保存到 {target_folder} 文件夹中！")
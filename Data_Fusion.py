@@ -1,5 +1,14 @@
 import os
+import argparse
 import pandas as pd
+from Fusion_Engine import FUSION_RULES, fuse_columns
+from Build_Manifest import BuildManifest, run_outdated
+from Station_Chunks import ChunkOrderError, resolve_chunk_rows, with_positions
+from Station_Series import StationSeries
+from Storage import get_storage
+from Gap_Index import GapIndex, write_gap_index
+from Time_Parse import parse_times
+from Run_Metrics import current_span, stage, start_run
 
 """
 1、如果Power_Nas非空，Power_DB为空，则使用Power_Nas的；
@@ -12,46 +21,118 @@ import pandas as pd
 # 输入和输出文件夹路径
 input_folder = r"D:\新能源预测小组\Project\concat\data\DB+Nas"
 output_folder = r"D:\新能源预测小组\Project\concat\data\Fusion"
+manifest_file = r"D:\新能源预测小组\Project\concat\data\build_manifest.sqlite"
+time_cache_file = r"D:\新能源预测小组\Project\concat\data\time_cache.sqlite"
 
-# 创建输出文件夹（如果不存在）
-os.makedirs(output_folder, exist_ok=True)
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
 
 # 定义时间序列起始时间和间隔
 start_time = pd.Timestamp("2021-01-01 00:00")
 time_interval = pd.Timedelta(minutes=5)
 
-# 遍历输入文件夹中的所有 CSV 文件
-for file_name in os.listdir(input_folder):
-    if file_name.endswith(".csv"):
-        file_path = os.path.join(input_folder, file_name)
-        
-        # 读取 CSV 文件
-        data = pd.read_csv(file_path)
-
-        # 确保 'Time' 列为 datetime 格式
-        data['Time'] = pd.to_datetime(data['Time'], errors='coerce')
-        if data['Time'].isna().all():
-            print(f"文件 {file_name} 的 'Time' 列无法解析为有效日期，跳过处理")
+
+def fusion_station(data, file_name, source=None):
+    # 确保 'Time' 列为 datetime 格式，source 为数据文件路径（用于时间解析缓存）
+    data['Time'] = parse_times(data['Time'], source=source)
+    if data['Time'].isna().all():
+        print(f"文件 {file_name} 的 'Time' 列无法解析为有效日期，跳过处理")
+        return None
+
+    # 按时间放到从 start_time 起、与文件行数等长的 5 分钟网格上，再按规则表融合 Power / Radiation 列
+    series = StationSeries.from_frame(data, start=start_time, length=len(data))
+    return series.fuse(FUSION_RULES).to_frame()
+
+
+def fusion_chunks(chunks):
+    """
+    分块融合：第 k 块输出的时间窗口与整表模式中相同行号的时间一致，
+    每行按时间放入对应窗口，时间晚于当前窗口的行留到后续块；
+    出现无法解析的时间或早于当前窗口的时间（输入未按时间排序）时抛出 ChunkOrderError。
+    """
+    pending = None
+    for position, data in with_positions(chunks):
+        if data.empty:
             continue
+        data['Time'] = parse_times(data['Time'])
+        if data['Time'].isna().any():
+            raise ChunkOrderError("'Time' 列存在无法解析的时间")
+
+        window = pd.date_range(start=start_time + position * time_interval, periods=len(data), freq='5min')
+        if pending is not None:
+            data = pd.concat([pending, data])
+
+        # 早于起始时间的行在整表模式中同样不会出现在结果中
+        late = (data['Time'] < window[0]) & (data['Time'] >= start_time)
+        if late.any():
+            raise ChunkOrderError("'Time' 列未按时间排序")
+        in_window = data['Time'] <= window[-1]
+        pending = data[~in_window & (data['Time'] >= start_time)]
+
+        chunk = data[in_window & (data['Time'] >= start_time)].set_index('Time').reindex(window).reset_index()
+        chunk.rename(columns={'index': 'Time'}, inplace=True)
+        yield fuse_columns(chunk, FUSION_RULES)
+
+
+@stage("fusion", station="file_name")
+def fusion_file(file_name, input_folder, output_folder, chunk_rows=None):
+    file_path = os.path.join(input_folder, file_name)
+    station_id = os.path.splitext(file_name)[0]
+    metrics = current_span()
+    metrics.add_file(file_path)
+
+    # 分块模式：逐块读取、融合、写入
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    if chunk_rows:
+        written, rows, index = False, 0, None
+        try:
+            with storage.chunk_writer(output_folder, station_id, encoding='utf-8-sig') as writer:
+                for data in fusion_chunks(storage.read_chunks(file_path, chunk_rows)):
+                    writer.write(data)
+                    part = GapIndex.from_frame(data, start_time, freq=time_interval)
+                    index = part if index is None else index.extend(part)
+                    written, rows = True, rows + len(data)
+            if written:
+                write_gap_index(index, writer.file_path)
+                metrics.add(rows=rows)
+                print(f"文件 {file_name} 已分块融合并保存至 {writer.file_path}")
+                return
+        except ChunkOrderError as e:
+            # 已写入的部分结果随临时文件删除，改用整表处理
+            print(f"文件 {file_name} 无法分块处理（{e}），改为整表处理")
+
+    # 读取场站文件
+    data = fusion_station(storage.read(file_path), file_name, file_path)
+    if data is None:
+        return
+
+    # 保存结果到输出文件夹
+    output_file_path = storage.write(data, output_folder, station_id, encoding='utf-8-sig')
+    write_gap_index(GapIndex.from_frame(data, start_time, freq=time_interval), output_file_path)
+    metrics.add(rows=len(data))
+    print(f"文件 {file_name} 已融合并保存至 {output_file_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB 与 Nas 数据融合")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，重新融合全部场站")
+    args = parser.parse_args()
+    start_run("Data_Fusion")
+    os.environ.setdefault("TIME_PARSE_CACHE", time_cache_file)
+
+    # 创建输出文件夹（如果不存在）
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 按场站并行处理输入文件夹中的所有场站文件
+    file_names = [os.path.basename(f) for f in storage.list_stations(input_folder).values()]
+    # 合并文件和融合规则均未变化的场站跳过
+    manifest = BuildManifest(manifest_file, force=args.force)
+    tasks = [(file_name, input_folder, output_folder) for file_name in file_names]
+    builds = [("fusion", storage.path(output_folder, os.path.splitext(file_name)[0]), [os.path.join(input_folder, file_name)],
+               repr(FUSION_RULES)) for file_name in file_names]
+    for file_name, (_, error) in zip(file_names, run_outdated(fusion_file, tasks, builds, manifest)):
+        if error is not None:
+            print(f"文件 {file_name} 融合失败: {error}")
+    manifest.close()
 
-        # 自动生成完整时间序列
-        full_time_index = pd.date_range(start=start_time, periods=len(data), freq='5min')
-        data = data.set_index('Time').reindex(full_time_index).reset_index()
-        data.rename(columns={'index': 'Time'}, inplace=True)
-
-        # 按规则融合 Power 列
-        data['Power_fusion'] = data.apply(
-            lambda row: row['Power_Nas'] if pd.notna(row['Power_Nas']) else row['Power_DB'], axis=1
-        )
-        
-        # 按规则融合 Radiation 列
-        data['Radiation_fusion'] = data.apply(
-            lambda row: row['Radiation_Nas'] if pd.notna(row['Radiation_Nas']) else row['Radiation_DB'], axis=1
-        )
-
-        # 保存结果到输出文件夹
-        output_file_path = os.path.join(output_folder, file_name)
-        data.to_csv(output_file_path, index=False, encoding='utf-8-sig')
-        print(f"文件 {file_name} 已融合并保存至 {output_file_path}")
-
-print("所有文件处理完成！")
+    print("所有文件处理完成！")
@@ -1,45 +1,87 @@
 import os
+import argparse
+from itertools import zip_longest
 import pandas as pd
+from Build_Manifest import BuildManifest, run_outdated
+from Station_Chunks import resolve_chunk_rows, with_positions
+from Station_Series import StationSeries, GRID_START
+from Storage import get_storage
+from Run_Metrics import current_span, stage, start_run
 
 # 设置文件路径
 db_path = r"D:\新能源预测小组\Project\concat\data\DB"
 nas_path = r"D:\新能源预测小组\Project\concat\data\Nas"
 output_path = r"D:\新能源预测小组\Project\concat\data\DB+Nas"
+manifest_file = r"D:\新能源预测小组\Project\concat\data\build_manifest.sqlite"
 
-# 创建输出目录（如果不存在）
-os.makedirs(output_path, exist_ok=True)
-
-# 获取两个目录中的文件名
-db_files = {os.path.splitext(f)[0]: os.path.join(db_path, f) for f in os.listdir(db_path) if f.endswith(".csv")}
-nas_files = {os.path.splitext(f)[0]: os.path.join(nas_path, f) for f in os.listdir(nas_path) if f.endswith(".csv")}
-
-# 合并所有场站 ID
-all_ids = set(db_files.keys()).union(set(nas_files.keys()))
-
-# 遍历所有场站 ID，进行数据处理和合并
-for station_id in all_ids:
-    # 读取 DB 文件（如果存在）
-    if station_id in db_files:
-        db_df = pd.read_csv(db_files[station_id])
-        if 'Power_DB' in db_df.columns and 'Radiation_DB' in db_df.columns:
-            db_df['Time'] = pd.date_range(start='2021-01-01 00:00', periods=len(db_df), freq='5min')  # 使用 5 分钟间隔
-        else:
-            print(f"Warning: 文件 {db_files[station_id]} 缺少必要的列，跳过处理")
-            db_df = pd.DataFrame(columns=['Time', 'Power_DB', 'Radiation_DB'])
-    else:
-        db_df = pd.DataFrame(columns=['Time', 'Power_DB', 'Radiation_DB'])
-    
-    # 读取 NAS 文件（如果存在）
-    if station_id in nas_files:
-        nas_df = pd.read_csv(nas_files[station_id])
-        if 'Power_Nas' in nas_df.columns and 'Radiation_Nas' in nas_df.columns:
-            nas_df['Time'] = pd.date_range(start='2021-01-01 00:00', periods=len(nas_df), freq='5min')  # 使用 5 分钟间隔
-        else:
-            print(f"Warning: 文件 {nas_files[station_id]} 缺少必要的列，跳过处理")
-            nas_df = pd.DataFrame(columns=['Time', 'Power_Nas', 'Radiation_Nas'])
-    else:
-        nas_df = pd.DataFrame(columns=['Time', 'Power_Nas', 'Radiation_Nas'])
-    
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
+
+
+def read_station_series(file_path, value_columns):
+    # 读取文件（如果存在），第 i 行对应 2021-01-01 起第 i 个 5 分钟；缺少必要列时返回空序列
+    if file_path:
+        df = storage.read(file_path)
+        if set(value_columns).issubset(df.columns):
+            return StationSeries.from_frame(df, start=GRID_START, positional=True)
+        print(f"Warning: 文件 {file_path} 缺少必要的列，跳过处理")
+    return StationSeries.empty(GRID_START, value_columns)
+
+
+def station_chunks(file_path, value_columns, chunk_rows):
+    # 分块读取场站文件，返回 (列名, 块迭代器)；各块按行号补上 5 分钟间隔的时间列
+    if file_path:
+        columns = storage.read_columns(file_path)
+        if set(value_columns).issubset(columns):
+            if 'Time' not in columns:
+                columns = columns + ['Time']
+
+            def chunks():
+                for position, df in with_positions(storage.read_chunks(file_path, chunk_rows)):
+                    df['Time'] = pd.date_range(start=pd.Timestamp('2021-01-01 00:00') + position * pd.Timedelta(minutes=5),
+                                               periods=len(df), freq='5min')
+                    yield df
+            return columns, chunks()
+        print(f"Warning: 文件 {file_path} 缺少必要的列，跳过处理")
+    return ['Time'] + value_columns, iter(())
+
+
+def merge_station_chunks(db_file, nas_file, chunk_rows):
+    # 分块合并：DB 与 Nas 按行号对齐，与 merge_station 的结果逐块一致
+    db_columns, db_chunks = station_chunks(db_file, ['Power_DB', 'Radiation_DB'], chunk_rows)
+    nas_columns, nas_chunks = station_chunks(nas_file, ['Power_Nas', 'Radiation_Nas'], chunk_rows)
+
+    # 较短的文件读完后以同类型的空表补齐（整表合并时该部分同样为空值）
+    db_empty, nas_empty = pd.DataFrame(columns=db_columns), pd.DataFrame(columns=nas_columns)
+    merged = False
+    for db_df, nas_df in zip_longest(db_chunks, nas_chunks):
+        if db_df is not None:
+            db_empty = db_df.iloc[:0]
+        if nas_df is not None:
+            nas_empty = nas_df.iloc[:0]
+        merged = True
+        yield merge_frames(db_empty if db_df is None else db_df, nas_empty if nas_df is None else nas_df)
+
+    # 两个文件都没有数据时仍输出一个只有表头的空块
+    if not merged:
+        yield merge_frames(db_empty, nas_empty)
+
+
+def merge_station_series(db_file, nas_file):
+    db_series = read_station_series(db_file, ['Power_DB', 'Radiation_DB'])
+    nas_series = read_station_series(nas_file, ['Power_Nas', 'Radiation_Nas'])
+
+    # 两个序列在同一网格上，按行号对齐合并，只保留一个时间
+    merged = db_series.merge(nas_series)
+    merged.columns = {name: values for name, values in merged.columns.items() if not name.startswith('Time_')}
+    return merged
+
+
+def merge_station(db_file, nas_file):
+    return merge_station_series(db_file, nas_file).to_frame()
+
+
+def merge_frames(db_df, nas_df):
     # 合并数据（基于时间列）
     merged_df = pd.merge(db_df, nas_df, on='Time', how='outer')
     
@@ -50,13 +92,56 @@ for station_id in all_ids:
     
     # 确保时间列在最左边
     cols = ['Time'] + [col for col in merged_df.columns if col != 'Time']
-    merged_df = merged_df[cols]
-    
-    # 将合并后的数据保存到输出目录
-    output_file = os.path.join(output_path, f"{station_id}.csv")
-    merged_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    return merged_df[cols]
+
+
+@stage("merge", station="station_id")
+def merge_and_save(station_id, db_file, nas_file, output_folder, chunk_rows=None):
+    metrics = current_span()
+    metrics.add_file(db_file, nas_file)
+
+    # 分块模式：逐块合并并追加写入
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    if chunk_rows:
+        with storage.chunk_writer(output_folder, station_id, encoding='utf-8-sig') as writer:
+            for merged_df in merge_station_chunks(db_file, nas_file, chunk_rows):
+                writer.write(merged_df)
+                metrics.add(rows=len(merged_df))
+    else:
+        merged_df = merge_station(db_file, nas_file)
+
+        # 将合并后的数据保存到输出目录
+        storage.write(merged_df, output_folder, station_id, encoding='utf-8-sig')
+        metrics.add(rows=len(merged_df))
     
     # 打印完成信息
-    print(f"文件 {station_id}.csv 已完成处理并保存至 {output_path}")
+    print(f"文件 {station_id}{storage.suffix} 已完成处理并保存至 {output_folder}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB 与 Nas 数据合并")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，重新合并全部场站")
+    args = parser.parse_args()
+    start_run("Data_merge")
+
+    # 创建输出目录（如果不存在）
+    os.makedirs(output_path, exist_ok=True)
+
+    # 获取两个目录中的文件名
+    db_files = storage.list_stations(db_path)
+    nas_files = storage.list_stations(nas_path)
+
+    # 合并所有场站 ID
+    all_ids = sorted(set(db_files.keys()).union(set(nas_files.keys())))
+
+    # 按场站并行进行数据处理和合并
+    # DB 与 Nas 文件均未变化的场站跳过
+    manifest = BuildManifest(manifest_file, force=args.force)
+    tasks = [(station_id, db_files.get(station_id), nas_files.get(station_id), output_path) for station_id in all_ids]
+    builds = [("merge", storage.path(output_path, station_id), [db_file, nas_file], "") for station_id, db_file, nas_file, _ in tasks]
+    for station_id, (_, error) in zip(all_ids, run_outdated(merge_and_save, tasks, builds, manifest)):
+        if error is not None:
+            print(f"场站 {station_id} 合并失败: {error}")
+    manifest.close()
 
-print("所有文件处理完成！")
+    print("所有文件处理完成！")
@@ -0,0 +1,96 @@
+import io
+import os
+import pickle
+import hashlib
+import pandas as pd
+
+"""
+Nas Excel 读取层：
+1、引擎可插拔：优先使用 calamine（Rust 实现，需安装 python-calamine），否则回退到 openpyxl 只读模式（.xls 由 pandas 自动选择）；
+2、可只读取表头能识别的列（columns 为列名集合或判断函数），其余列不再解析，原始表头保存在 df.attrs["source_columns"]；
+3、解析结果按 路径 + 大小 + 修改时间 + 所选列（判断函数时使用 cache_tag）缓存为 Parquet 文件（列类型不兼容时退回 pickle），文件未变化时直接读取缓存；
+4、read() 可传入已读入内存的文件内容（content），由 Nas_Ingest 的 I/O 线程预先读取，解析时不再访问共享目录。
+"""
+
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def default_engine(file_path):
+    if HAS_CALAMINE:
+        return "calamine"
+    return "openpyxl" if file_path.endswith(".xlsx") else None
+
+
+class ExcelReader:
+    def __init__(self, engine=None, cache_folder=None):
+        self.engine = engine
+        self.cache_folder = cache_folder
+        if cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+
+    def _cache_key(self, file_path, columns, cache_tag=None):
+        stat = os.stat(file_path)
+        selected = cache_tag or (sorted(columns) if columns else '*')
+        signature = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{selected}"
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()
+
+    def _load_cache(self, key):
+        parquet_path = os.path.join(self.cache_folder, f"{key}.parquet")
+        if os.path.exists(parquet_path):
+            return pd.read_parquet(parquet_path)
+        pickle_path = os.path.join(self.cache_folder, f"{key}.pkl")
+        if os.path.exists(pickle_path):
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+        return None
+
+    def _save_cache(self, key, df):
+        if HAS_PYARROW:
+            try:
+                df.to_parquet(os.path.join(self.cache_folder, f"{key}.parquet"))
+                return
+            except (TypeError, ValueError, pyarrow.ArrowException):
+                # 混合类型列、非字符串列名等无法按列式保存，改用 pickle
+                pass
+        with open(os.path.join(self.cache_folder, f"{key}.pkl"), "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def cached(self, file_path, columns=None, cache_tag=None):
+        # 文件未变化时返回缓存的解析结果，否则返回 None
+        if not self.cache_folder:
+            return None
+        return self._load_cache(self._cache_key(file_path, columns, cache_tag))
+
+    def read(self, file_path, columns=None, cache_tag=None, content=None):
+        key = None
+        if self.cache_folder:
+            key = self._cache_key(file_path, columns, cache_tag)
+            if content is None:
+                cached = self._load_cache(key)
+                if cached is not None:
+                    return cached
+
+        source_columns = []
+        keep = columns if callable(columns) else (lambda name: name in columns) if columns else None
+
+        def usecols(name):
+            source_columns.append(str(name))
+            return keep is None or keep(name)
+
+        source = io.BytesIO(content) if content is not None else file_path
+        df = pd.read_excel(source, engine=self.engine or default_engine(file_path), usecols=usecols)
+        df.attrs["source_columns"] = source_columns
+
+        if key is not None:
+            self._save_cache(key, df)
+        return df
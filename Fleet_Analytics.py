@@ -0,0 +1,234 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from Availability import BucketCounts, grid_buckets, valid_mask
+from Station_Executor import run_stations
+from Station_Series import GRID_START
+from Gap_Index import read_gap_index, run_lengths
+from Storage import get_storage
+from Report_Writer import RATE_RULES, write_report
+from Run_Metrics import current_span, stage, start_run
+
+"""
+全场站数据可用率分析：
+1、所有场站 Fusion 文件的有效值掩码放进一个 场站 × 5 分钟时间点 的布尔数组（每个指标一个，1 字节 / 点），
+   第 j 列对应 2021-01-01 起第 j 个 5 分钟，各场站只统计自身文件覆盖的时间点，口径与 Calculate_Rate 一致；
+   文件旁有可用的缺口索引（Gap_Index）时由缺口还原掩码，不读取文件；
+2、按月 / 日 / 小时可用率：沿时间轴按桶边界 np.add.reduceat；按一天中的时段（288 个）可用率：按天重排后求和；
+3、全场站停运窗口：同一时间点缺数的场站比例达到阈值（默认 50%）的连续时间段，通常对应 DB / Nas 数据源故障；
+4、缺口统计：按场站分块求连续缺失段，给出缺口个数、缺失总时长和最长缺口的起止时间；
+5、python Fleet_Analytics.py [--input Fusion 文件夹] [--output 输出文件夹] [--threshold 0.5]。
+"""
+
+input_folder = r"D:\新能源预测小组\Project\concat\data\Fusion"
+output_folder = r"D:\新能源预测小组\Project\concat\data\fleet"
+
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
+
+METRICS = ["Power_fusion", "Radiation_fusion"]
+FREQ = pd.Timedelta(minutes=5)
+FLEET_ROW = "全部场站"
+
+# 按场站分块计算时每块的场站数，限制临时数组大小
+BLOCK_STATIONS = 64
+
+
+@stage("fleet_load", station="file_name")
+def load_station_mask(file_name, input_folder, metrics):
+    # 返回 (时间点数, {指标: 按位压缩的有效值掩码})，缺少的指标全部视为缺失
+    file_path = os.path.join(input_folder, file_name)
+    # 有可用的缺口索引时由缺口还原掩码，不读取数据文件
+    index = read_gap_index(file_path, metrics)
+    if index is not None and index.start == GRID_START and index.freq == FREQ:
+        return index.length, {metric: np.packbits(index.valid_mask(metric)) for metric in metrics}
+    present = [metric for metric in metrics if metric in storage.read_columns(file_path)]
+    # 没有任何所需指标时只读 Time 列，行数仍为文件覆盖的时间点数
+    data = storage.read(file_path, columns=present or ["Time"])
+    current_span().add(rows=len(data))
+    current_span().add_file(file_path)
+    packed = {metric: np.packbits(valid_mask(data[metric].to_numpy()) if metric in present else np.zeros(len(data), bool))
+              for metric in metrics}
+    return len(data), packed
+
+
+class FleetMask:
+    def __init__(self, station_ids, masks, lengths, start=GRID_START, freq=FREQ):
+        # masks 为 {指标: 场站 × 时间点 布尔数组}，lengths 为各场站文件覆盖的时间点数
+        self.station_ids = list(station_ids)
+        self.masks = masks
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.start = pd.Timestamp(start)
+        self.freq = pd.Timedelta(freq)
+
+    @classmethod
+    def load(cls, input_folder, metrics=METRICS, workers=None):
+        # 各场站并行读取，按位压缩后传回主进程，写入预先分配的数组
+        files = storage.list_stations(input_folder)
+        station_ids = sorted(files)
+        tasks = [(os.path.basename(files[station_id]), input_folder, metrics) for station_id in station_ids]
+        results = []
+        for station_id, (result, error) in zip(station_ids, run_stations(load_station_mask, tasks, workers)):
+            if error is not None:
+                print(f"场站 {station_id} 读取失败: {error}")
+                continue
+            results.append((station_id, result))
+
+        slots = max((length for _, (length, _) in results), default=0)
+        masks = {metric: np.zeros((len(results), slots), dtype=bool) for metric in metrics}
+        for row, (_, (length, packed)) in enumerate(results):
+            for metric in metrics:
+                masks[metric][row, :length] = np.unpackbits(packed[metric], count=length).view(bool)
+        return cls([station_id for station_id, _ in results], masks, [length for _, (length, _) in results])
+
+    @property
+    def slots(self):
+        return next(iter(self.masks.values())).shape[1] if self.masks else 0
+
+    def times(self, positions):
+        # 时间点序号对应的时间
+        offsets = np.asarray(positions, dtype=np.int64) * np.timedelta64(self.freq.value, "ns")
+        return pd.DatetimeIndex(np.datetime64(self.start, "ns") + offsets)
+
+    def covered(self, rows=slice(None), lo=0, hi=None):
+        # 场站文件覆盖的时间点（lo..hi 列）
+        hi = self.slots if hi is None else hi
+        return np.arange(lo, hi)[None, :] < self.lengths[rows, None]
+
+    def _frame(self, valid, covered, columns):
+        # 场站 × 列 的可用率，最后一行为全部场站合计；没有覆盖的格为 NaN
+        valid = np.vstack([valid, valid.sum(axis=0)])
+        covered = np.vstack([covered, covered.sum(axis=0)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = np.round(np.where(covered > 0, valid / covered, np.nan), 3)
+        index = pd.Index(self.station_ids + [FLEET_ROW], name="ID")
+        return pd.DataFrame(rates, index=index, columns=columns)
+
+    def period_rates(self, metric, granularity="month"):
+        # 按月 / 日 / 小时的可用率，覆盖点数由各场站长度直接推算
+        buckets, starts = grid_buckets(self.start, self.freq, self.slots, granularity)
+        ends = np.r_[starts[1:], self.slots]
+        mask = self.masks[metric]
+        valid = np.vstack([np.add.reduceat(mask[lo:lo + BLOCK_STATIONS], starts, axis=1, dtype=np.int64)
+                           for lo in range(0, len(mask), BLOCK_STATIONS)]) if len(mask) else np.zeros((0, len(starts)))
+        covered = np.clip(self.lengths[:, None] - starts[None, :], 0, (ends - starts)[None, :])
+        columns = pd.Index(BucketCounts(buckets, {}, None).labels(granularity), name="Time")
+        return self._frame(valid, covered, columns)
+
+    def time_of_day_rates(self, metric):
+        # 一天中各时段（00:00 ~ 23:55）的可用率：完整的天按 (场站, 天, 时段) 重排求和，首尾不足一天的部分单独累加
+        mask = self.masks[metric]
+        per_day = int(pd.Timedelta(days=1) / self.freq)
+        offset = int((self.start - self.start.normalize()) / self.freq)
+        head = (per_day - offset) % per_day
+        days = max(self.slots - head, 0) // per_day
+        body_end = head + days * per_day
+
+        valid = mask[:, head:body_end].reshape(len(mask), days, per_day).sum(axis=1, dtype=np.int64)
+        for lo, hi in [(0, min(head, self.slots)), (body_end, self.slots)]:
+            slot_of_day = (offset + np.arange(lo, hi)) % per_day
+            valid[:, slot_of_day] += mask[:, lo:hi]
+
+        # 第 j 列属于时段 (offset + j) % per_day，长度为 L 的场站在时段 k 上覆盖的列数
+        first = (np.arange(per_day) - offset) % per_day
+        covered = np.maximum((self.lengths[:, None] - 1 - first[None, :]) // per_day + 1, 0)
+        columns = pd.Index(pd.date_range("00:00", periods=per_day, freq=self.freq).strftime("%H:%M"), name="Time")
+        return self._frame(valid, covered, columns)
+
+    def outage_windows(self, metric, threshold=0.5, min_stations=2, min_slots=1):
+        """
+        全场站停运窗口：缺数场站占覆盖场站的比例 >= threshold 且覆盖场站不少于 min_stations 的连续时间点，
+        至少 min_slots 个点。返回每个窗口的起止时间、时长、平均 / 最多缺数场站数。
+        """
+        covered = len(self.lengths) - np.searchsorted(np.sort(self.lengths), np.arange(self.slots), side="right")
+        down = covered - self.masks[metric].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(covered > 0, down / covered, 0.0)
+        outage = (share >= threshold) & (covered >= min_stations)
+
+        _, starts, lengths = run_lengths(outage[None, :])
+        keep = lengths >= min_slots
+        starts, lengths = starts[keep], lengths[keep]
+        ends = starts + lengths
+        # 窗口内的均值由前缀和相减得到
+        cumulative = np.r_[0, np.cumsum(down)]
+        cumulative_share = np.r_[0.0, np.cumsum(share)]
+        bounds = np.ravel(np.column_stack([starts, ends]))
+        peak = np.maximum.reduceat(np.r_[down, 0], bounds)[::2] if len(starts) else np.zeros(0, dtype=np.int64)
+        return pd.DataFrame({
+            "start": self.times(starts),
+            "end": self.times(ends),
+            "slots": lengths,
+            "minutes": lengths * (self.freq / pd.Timedelta(minutes=1)),
+            "mean_down": np.round((cumulative[ends] - cumulative[starts]) / np.maximum(lengths, 1), 1),
+            "max_down": peak,
+            "mean_share": np.round((cumulative_share[ends] - cumulative_share[starts]) / np.maximum(lengths, 1), 3),
+        })
+
+    def gap_stats(self, metric):
+        # 各场站的连续缺失段：覆盖范围内缺数的时间点，按场站分块求连续段
+        gaps = np.zeros(len(self.lengths), dtype=np.int64)
+        missing = np.zeros(len(self.lengths), dtype=np.int64)
+        longest = np.zeros(len(self.lengths), dtype=np.int64)
+        longest_start = np.full(len(self.lengths), -1, dtype=np.int64)
+        for lo in range(0, len(self.lengths), BLOCK_STATIONS):
+            rows_slice = slice(lo, lo + BLOCK_STATIONS)
+            rows, starts, lengths = run_lengths(~self.masks[metric][rows_slice] & self.covered(rows_slice))
+            if not len(rows):
+                continue
+            rows += lo
+            gaps += np.bincount(rows, minlength=len(gaps))
+            missing += np.bincount(rows, weights=lengths, minlength=len(gaps)).astype(np.int64)
+            # 段按行有序：各行的最长段长度，再取等于最长长度的第一段（同长取最早）
+            present, first = np.unique(rows, return_index=True)
+            longest[present] = np.maximum.reduceat(lengths, first)
+            is_longest = np.flatnonzero(lengths == longest[rows])
+            present, first = np.unique(rows[is_longest], return_index=True)
+            longest_start[present] = starts[is_longest[first]]
+
+        has_gap = longest_start >= 0
+        minutes = self.freq / pd.Timedelta(minutes=1)
+        return pd.DataFrame({
+            "slots": self.lengths,
+            "gaps": gaps,
+            "missing_hours": np.round(missing * minutes / 60, 2),
+            "missing_share": np.round(np.where(self.lengths > 0, missing / np.maximum(self.lengths, 1), np.nan), 4),
+            "longest_hours": np.round(longest * minutes / 60, 2),
+            "longest_start": self.times(longest_start).where(has_gap),
+            "longest_end": self.times(longest_start + longest).where(has_gap),
+        }, index=pd.Index(self.station_ids, name="ID"))
+
+
+@stage("fleet_report")
+def write_fleet_report(fleet, output_folder, threshold=0.5, min_stations=2, min_slots=1):
+    # 可用率矩阵写入工作簿（条件格式同 Calculate_Rate），停运窗口和缺口统计按指标写出 CSV
+    os.makedirs(output_folder, exist_ok=True)
+    sheets = {}
+    for metric in fleet.masks:
+        sheets[f"{metric}_month"] = fleet.period_rates(metric, "month")
+        sheets[f"{metric}_day"] = fleet.period_rates(metric, "day")
+        sheets[f"{metric}_time_of_day"] = fleet.time_of_day_rates(metric)
+        outages = fleet.outage_windows(metric, threshold, min_stations, min_slots)
+        outages.to_csv(os.path.join(output_folder, f"{metric}_outages.csv"), index=False, encoding="utf-8-sig")
+        fleet.gap_stats(metric).to_csv(os.path.join(output_folder, f"{metric}_gaps.csv"), encoding="utf-8-sig")
+        print(f"{metric}：停运窗口 {len(outages)} 个，共 {outages['minutes'].sum():.0f} 分钟")
+    write_report(sheets, os.path.join(output_folder, "fleet_availability.xlsx"), RATE_RULES)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全场站数据可用率分析")
+    parser.add_argument("--input", default=input_folder, help="Fusion 文件夹")
+    parser.add_argument("--output", default=output_folder, help="输出文件夹")
+    parser.add_argument("--metrics", nargs="+", default=METRICS)
+    parser.add_argument("--threshold", type=float, default=0.5, help="停运窗口：缺数场站比例阈值")
+    parser.add_argument("--min-stations", type=int, default=2, help="停运窗口：至少覆盖的场站数")
+    parser.add_argument("--min-slots", type=int, default=1, help="停运窗口：至少连续的 5 分钟点数")
+    parser.add_argument("--workers", type=int, default=None, help="读取文件的并行进程数，默认取 STATION_WORKERS 或 CPU 核数")
+    args = parser.parse_args()
+    start_run("Fleet_Analytics")
+
+    fleet = FleetMask.load(args.input, args.metrics, args.workers)
+    print(f"已加载 {len(fleet.station_ids)} 个场站 × {fleet.slots} 个时间点")
+    write_fleet_report(fleet, args.output, args.threshold, args.min_stations, args.min_slots)
+    print(f"分析完成，结果已保存至 {args.output}")
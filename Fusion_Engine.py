@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+"""
+向量化数据融合引擎：
+1、每个融合指标对应一条规则，按 priority 中列的先后顺序取第一个有效值（默认 Nas 优先于 DB）；
+2、所有来源都无效时使用 fallback（默认空值）；
+3、可选 bounds=(下限, 上限)，超出范围的值视为无效，继续取下一个来源；
+4、整列在 NumPy 数组上一次完成，不再逐行 apply。
+"""
+
+# 融合规则表（可按指标扩展或替换）
+FUSION_RULES = {
+    "Power_fusion": {
+        "priority": ["Power_Nas", "Power_DB"],
+        "fallback": np.nan,
+        "bounds": None,
+    },
+    "Radiation_fusion": {
+        "priority": ["Radiation_Nas", "Radiation_DB"],
+        "fallback": np.nan,
+        "bounds": None,
+    },
+}
+
+
+def _valid_mask(column, bounds):
+    values = column.to_numpy()
+    valid = ~pd.isna(values)
+    if bounds is not None:
+        low, high = bounds
+        numeric = pd.to_numeric(column, errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            if low is not None:
+                valid &= numeric >= low
+            if high is not None:
+                valid &= numeric <= high
+    return values, valid
+
+
+def fuse_metric(data, rule):
+    n = len(data)
+    sources = [name for name in rule["priority"] if name in data.columns]
+    fallback = rule.get("fallback", np.nan)
+
+    # 全部来源均为数值列时保持 float，否则退回 object，与逐行 apply 的结果一致
+    dtypes = [data[name].dtype for name in sources]
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in dtypes):
+        result = np.full(n, fallback, dtype=float)
+    else:
+        result = np.full(n, fallback, dtype=object)
+
+    filled = np.zeros(n, dtype=bool)
+    for name in sources:
+        values, valid = _valid_mask(data[name], rule.get("bounds"))
+        take = valid & ~filled
+        result[take] = values[take]
+        filled |= take
+    return pd.Series(result, index=data.index)
+
+
+def fuse_columns(data, rules=None):
+    rules = FUSION_RULES if rules is None else rules
+    for target, rule in rules.items():
+        data[target] = fuse_metric(data, rule)
+    return data
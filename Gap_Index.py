@@ -0,0 +1,242 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from Availability import GRANULARITIES, BucketCounts, grid_buckets, valid_mask
+from Rate_Cache import file_fingerprint
+from Station_Series import GRID_START
+from Storage import get_storage
+
+"""
+缺口索引（游程编码）：
+1、每个场站、每个指标只保存连续缺失段的 (起点, 长度)，起点为 5 分钟网格上的行号（第 i 行对应 start + i × 5 分钟）；
+   数据基本完整的场站只有几十到几百个缺口，远小于逐点的 NaN 数组；
+2、DB_Data、Nas_Data 整理和 Data_Fusion 融合写出文件时同时生成，保存在数据文件旁（<场站>.gaps.npz），
+   并记录数据文件的指纹，数据文件被改动后索引失效，读取方回退到读取数据文件；
+3、可用率（BucketCounts，与 grid_counts 结果一致）、缺口长度分布、有缺口的月份等查询直接在游程上计算，不展开完整网格；
+4、python Gap_Index.py <文件夹> [--metric Power_fusion] [--granularity month] 查看各场站的缺口概况，
+   python Gap_Index.py <文件夹> --build 为已有数据文件补建索引。
+"""
+
+FREQ = pd.Timedelta(minutes=5)
+SUFFIX = ".gaps.npz"
+
+# 缺口长度分布的分组边界（时间点数）：≤5 分钟、≤15 分钟、≤1 小时、≤3 小时、≤1 天、≤7 天、7 天以上
+HISTOGRAM_EDGES = [1, 2, 4, 13, 37, 289, 2017]
+
+storage = get_storage()
+
+
+def run_lengths(flags):
+    """
+    二维布尔数组每行的连续 True 段：返回 (行号, 起始列, 长度)，按行、列升序。
+    每行首尾补 False 后展平，相邻元素不同的位置依次为各段的起点和终点。
+    """
+    rows, columns = flags.shape
+    padded = np.zeros((rows, columns + 2), dtype=bool)
+    padded[:, 1:-1] = flags
+    edges = np.flatnonzero(padded[:, 1:] != padded[:, :-1])
+    starts, ends = edges[::2], edges[1::2]
+    return starts // (columns + 1), starts % (columns + 1), ends - starts
+
+
+def _duration(slots, freq=FREQ):
+    minutes = int(slots * freq / pd.Timedelta(minutes=1))
+    if minutes % 1440 == 0:
+        return f"{minutes // 1440}天"
+    if minutes % 60 == 0:
+        return f"{minutes // 60}小时"
+    return f"{minutes}分钟"
+
+
+class GapIndex:
+    def __init__(self, start, freq, length, gaps):
+        # gaps 为 {指标: (起点数组, 长度数组)}，各指标的缺口按起点升序、互不重叠
+        self.start = pd.Timestamp(start)
+        self.freq = pd.Timedelta(freq)
+        self.length = int(length)
+        self.gaps = {metric: (np.asarray(starts, dtype=np.int64), np.asarray(lengths, dtype=np.int64))
+                     for metric, (starts, lengths) in gaps.items()}
+
+    @property
+    def metrics(self):
+        return list(self.gaps)
+
+    @classmethod
+    def from_masks(cls, start, masks, length=None, freq=FREQ):
+        # masks 为 {指标: 有效值布尔数组}
+        if length is None:
+            length = len(next(iter(masks.values()))) if masks else 0
+        gaps = {}
+        for metric, mask in masks.items():
+            _, starts, lengths = run_lengths(~np.asarray(mask, dtype=bool)[None, :])
+            gaps[metric] = (starts, lengths)
+        return cls(start, freq, length, gaps)
+
+    @classmethod
+    def from_frame(cls, df, start=GRID_START, metrics=None, freq=FREQ):
+        # 固定网格上的数据（第 i 行对应 start + i × freq），默认对 Time 以外的所有列建立索引
+        metrics = [col for col in df.columns if col != "Time"] if metrics is None else metrics
+        return cls.from_masks(start, {metric: valid_mask(df[metric].to_numpy()) for metric in metrics}, len(df), freq)
+
+    def extend(self, other):
+        # 拼接紧随其后的一段（分块写出时逐块累加），跨块边界的缺口合并为一个
+        gaps = {}
+        for metric in self.gaps:
+            starts, lengths = self.gaps[metric]
+            other_starts, other_lengths = other.gaps[metric]
+            other_starts = other_starts + self.length
+            if len(starts) and len(other_starts) and starts[-1] + lengths[-1] == other_starts[0]:
+                lengths = np.r_[lengths[:-1], lengths[-1] + other_lengths[0]]
+                other_starts, other_lengths = other_starts[1:], other_lengths[1:]
+            gaps[metric] = (np.r_[starts, other_starts], np.r_[lengths, other_lengths])
+        return GapIndex(self.start, self.freq, self.length + other.length, gaps)
+
+    def missing_before(self, metric, positions):
+        # 各位置之前（不含）的缺失点数：前缀和加上所在缺口已经过的部分
+        starts, lengths = self.gaps[metric]
+        positions = np.asarray(positions, dtype=np.int64)
+        cumulative = np.r_[0, np.cumsum(lengths)]
+        k = np.searchsorted(starts, positions, side="right")
+        inside = np.minimum(positions - starts[np.maximum(k - 1, 0)], lengths[np.maximum(k - 1, 0)]) if len(starts) else 0
+        return cumulative[np.maximum(k - 1, 0)] + np.where(k > 0, inside, 0)
+
+    def missing(self, metric):
+        return int(self.gaps[metric][1].sum())
+
+    def counts(self, metrics=None, granularity="month"):
+        # 各时间桶的有效个数和总个数，与在完整网格上 grid_counts 的结果一致
+        metrics = self.metrics if metrics is None else metrics
+        if not self.length:
+            return BucketCounts.empty(metrics, granularity)
+        buckets, starts = grid_buckets(self.start, self.freq, self.length, granularity)
+        bounds = np.r_[starts, self.length]
+        total = np.diff(bounds).astype(np.int64)
+        valid = {metric: total - np.diff(self.missing_before(metric, bounds)) for metric in metrics}
+        return BucketCounts(buckets, valid, total)
+
+    def gap_table(self, metric):
+        # 每个缺口一行：起止时间（结束时间为最后一个缺失点）和缺失点数
+        starts, lengths = self.gaps[metric]
+        first = self.start + starts * self.freq
+        return pd.DataFrame({
+            "start": first,
+            "end": first + (lengths - 1) * self.freq,
+            "slots": lengths,
+        })
+
+    def histogram(self, metric, edges=HISTOGRAM_EDGES):
+        # 缺口长度分布：各长度区间的缺口个数和缺失点数
+        lengths = self.gaps[metric][1]
+        bins = np.searchsorted(edges, lengths, side="right") - 1
+        labels = [f"≤{_duration(hi - 1, self.freq)}" for hi in edges[1:]] + [f">{_duration(edges[-1] - 1, self.freq)}"]
+        return pd.DataFrame({
+            "gaps": np.bincount(bins, minlength=len(edges)),
+            "slots": np.bincount(bins, weights=lengths, minlength=len(edges)).astype(np.int64),
+        }, index=pd.Index(labels, name="length"))
+
+    def holes(self, metric, granularity="month", min_slots=1):
+        # 缺失点数不少于 min_slots 的时间桶（如有缺口的月份）
+        counts = self.counts([metric], granularity)
+        missing = counts.total - counts.valid[metric]
+        keep = missing >= min_slots
+        return pd.DataFrame({
+            "missing": missing[keep],
+            "total": counts.total[keep],
+            "rate": np.round(counts.valid[metric][keep] / counts.total[keep], 3),
+        }, index=pd.Index(counts.labels(granularity)[keep], name="bucket"))
+
+    def valid_mask(self, metric):
+        # 还原完整网格上的有效值掩码
+        starts, lengths = self.gaps[metric]
+        edges = np.zeros(self.length + 1, dtype=np.int64)
+        np.add.at(edges, starts, 1)
+        np.add.at(edges, starts + lengths, -1)
+        return np.cumsum(edges[:-1]) == 0
+
+    def save(self, path, source=""):
+        # 起点和长度以 int32 压缩保存；source 为数据文件指纹
+        arrays = {}
+        for i, (starts, lengths) in enumerate(self.gaps.values()):
+            arrays[f"starts_{i}"] = starts.astype(np.int32)
+            arrays[f"lengths_{i}"] = lengths.astype(np.int32)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, start=np.datetime64(self.start, "ns"), freq=np.timedelta64(self.freq, "ns"),
+                     length=self.length, metrics=np.array(self.metrics, dtype=str), source=source, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        # 返回 (索引, 数据文件指纹)
+        with np.load(path) as data:
+            gaps = {str(metric): (data[f"starts_{i}"], data[f"lengths_{i}"]) for i, metric in enumerate(data["metrics"])}
+            index = cls(pd.Timestamp(data["start"][()]), pd.Timedelta(data["freq"][()]), int(data["length"]), gaps)
+            return index, str(data["source"])
+
+
+def gap_index_path(data_path):
+    return os.path.splitext(data_path)[0] + SUFFIX
+
+
+def write_gap_index(index, data_path):
+    # 数据文件写出后调用，记录其指纹
+    path = gap_index_path(data_path)
+    index.save(path, file_fingerprint([data_path]))
+    return path
+
+
+def read_gap_index(data_path, metrics=None):
+    # 索引不存在、数据文件已改动或缺少所需指标时返回 None
+    path = gap_index_path(data_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        index, source = GapIndex.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"缺口索引 {path} 读取失败: {e}")
+        return None
+    if source != file_fingerprint([data_path]) or not set(metrics or []).issubset(index.metrics):
+        return None
+    return index
+
+
+def build_file(data_path, start=GRID_START):
+    # 为已有的固定网格数据文件补建索引
+    index = GapIndex.from_frame(storage.read(data_path), start)
+    return write_gap_index(index, data_path)
+
+
+def summary(folder, metric, granularity="month"):
+    # 各场站一行：时间点数、缺口个数、缺失点数、可用率、最长缺口和有缺口的时间桶
+    rows = {}
+    for station_id, data_path in sorted(storage.list_stations(folder).items()):
+        index = read_gap_index(data_path, [metric])
+        if index is None:
+            print(f"场站 {station_id} 没有可用的缺口索引，跳过")
+            continue
+        lengths = index.gaps[metric][1]
+        holes = index.holes(metric, granularity)
+        rows[station_id] = {
+            "slots": index.length,
+            "gaps": len(lengths),
+            "missing": int(lengths.sum()),
+            "rate": round(1 - lengths.sum() / index.length, 3) if index.length else np.nan,
+            "longest": _duration(lengths.max(), index.freq) if len(lengths) else "",
+            "holes": len(holes),
+            "first_hole": holes.index[0] if len(holes) else "",
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="缺口索引")
+    parser.add_argument("folder")
+    parser.add_argument("--metric", default="Power_fusion")
+    parser.add_argument("--granularity", default="month", choices=list(GRANULARITIES))
+    parser.add_argument("--build", action="store_true", help="为文件夹中没有可用索引的数据文件补建索引")
+    args = parser.parse_args()
+
+    if args.build:
+        for station_id, data_path in sorted(storage.list_stations(args.folder).items()):
+            if read_gap_index(data_path) is None:
+                print(f"已保存缺口索引：{build_file(data_path)}")
+    print(summary(args.folder, args.metric, args.granularity).to_string())
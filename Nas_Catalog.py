@@ -0,0 +1,102 @@
+import os
+import sqlite3
+
+"""
+Nas 文件目录索引（SQLite）：
+1、scan() 遍历一次共享目录，记录每个 Excel 文件的路径、文件名、大小和修改时间；
+2、lookup() 按场站前缀在文件名索引上做范围查询，代替对全部文件的线性 startswith 扫描；
+3、changed() / mark_processed() 记录文件上次处理时的大小和修改时间，未变化的文件在后续运行中可跳过；
+4、对本地目录同样适用，可离线测试。
+"""
+
+EXCEL_SUFFIXES = (".xlsx", ".xls")
+
+
+class NasCatalog:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                processed_size INTEGER,
+                processed_mtime REAL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_name ON files (name)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _walk(self, root_directory):
+        # os.scandir 在 Windows/SMB 上遍历目录时即可拿到文件大小和修改时间
+        stack = [root_directory]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(EXCEL_SUFFIXES):
+                        stat = entry.stat()
+                        yield entry.path, entry.name, stat.st_size, stat.st_mtime
+
+    def scan(self, root_directory):
+        known = {path: (size, mtime) for path, size, mtime in self.conn.execute("SELECT path, size, mtime FROM files")}
+        seen = set()
+        new_count = changed_count = 0
+
+        with self.conn:
+            for path, name, size, mtime in self._walk(root_directory):
+                seen.add(path)
+                if path not in known:
+                    new_count += 1
+                elif known[path] != (size, mtime):
+                    changed_count += 1
+                else:
+                    continue
+                self.conn.execute(
+                    "INSERT INTO files (path, name, size, mtime) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET name = excluded.name, size = excluded.size, mtime = excluded.mtime",
+                    (path, name, size, mtime),
+                )
+
+            # 删除共享目录中已不存在的文件
+            removed = [path for path in known if path not in seen]
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+        print(f"文件索引已更新：共 {len(seen)} 个文件，新增 {new_count}，修改 {changed_count}，删除 {len(removed)}")
+        # 返回被删除文件的文件名，用于判断对应场站是否需要重新处理
+        return [os.path.basename(path) for path in removed]
+
+    def lookup(self, prefix, data_type):
+        # 文件名以 prefix 开头：在 name 索引上做 [prefix, prefix + U+10FFFF) 的范围查询
+        rows = self.conn.execute(
+            "SELECT path, name FROM files WHERE name >= ? AND name < ? ORDER BY path",
+            (prefix, prefix + "\U0010ffff"),
+        )
+        return [path for path, name in rows if f"_{data_type}_" in name]
+
+    def changed(self, paths):
+        # 返回自上次处理后新增或修改过的文件
+        changed_paths = []
+        for path in paths:
+            row = self.conn.execute(
+                "SELECT size = processed_size AND mtime = processed_mtime FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None or not row[0]:
+                changed_paths.append(path)
+        return changed_paths
+
+    def mark_processed(self, paths):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE files SET processed_size = size, processed_mtime = mtime WHERE path = ?",
+                [(path,) for path in paths],
+            )
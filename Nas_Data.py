@@ -2,39 +2,27 @@ import os
 import re
 import pandas as pd
 import datetime
-import shutil
+import time
 import warnings
+import argparse
+from Station_Executor import run_stations
+from Build_Manifest import BuildManifest, run_outdated
+from Station_Chunks import ChunkOrderError, resolve_chunk_rows
+from Station_Series import StationSeries
+from Storage import get_storage
+from Gap_Index import GapIndex, write_gap_index
+from Time_Parse import parse_times
+from Nas_Catalog import NasCatalog
+from Excel_Reader import ExcelReader
+from Nas_Ingest import NasFetcher
+from Column_Alias import resolve_headers, header_filter, cache_tag, unresolved_record
+from Run_Metrics import current_span, stage, start_run
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 
-# 重命名字典
-rename_dict_power = {
-    "time": "Time", "TIME": "Time", "时间.1": "Time",
-    "Power(mw)": "rtPower(MW)", "Power(MW)": "rtPower(MW)", "Power（MW）": "rtPower(MW)",
-    "Power（MW)": "rtPower(MW)", "Power(Mw)": "rtPower(MW)", "power（mw）": "rtPower(MW)",
-    "亮马光伏电站": "rtPower(MW)", "Power(WM)": "rtPower(MW)",
-    "焦作.亮马光伏电站亮马光伏有功总加值": "rtPower(MW)", "POWER(mv)": "rtPower(MW)",
-    "QX2": "rtPower(MW)", "POWER(MW)": "rtPower(MW)", "Power（mw)": "rtPower(MW)",
-    "power(mw)": "rtPower(MW)", "Power（mw）": "rtPower(MW)", "总有功": "rtPower(MW)",
-    "焦作.庞冯营光伏电站庞冯营有功总加值Power(MW)": "rtPower(MW)",
-}
-
-rename_dict_radiation = {
-    "TIME": "Time", "TIME ": "Time", "Radiation(w/m2)": "Radiation",
-    "RADIATION(w/m2)": "Radiation", "RADIATION(w/m²)": "Radiation",
-    "Radiation(w/m²）": "Radiation", "Radiation（w/m²)": "Radiation",
-    "RADIATION(W/M2)": "Radiation", "Gerneral_Radiation": "Radiation",
-    "Radiation（w/m2）": "Radiation", "GERNERAL_RADIATION": "Radiation",
-    "Power(MW)": "Radiation", "XQ2": "Radiation",
-}
-
-# 修改列名
-rename_final_columns = {
-    "rtPower(MW)": "Power_Nas",
-    "RADIATION": "Radiation_Nas",
-    "Radiation": "Radiation_Nas",
-}
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
 
 # 使用 os.walk 遍历路径并获取所有文件
 def get_all_files(root_directory):
@@ -47,126 +35,256 @@ def get_all_files(root_directory):
     return file_list
 
 # 数据处理函数
-def process_files(path_list, prefix, rename_dict, output_folder, data_type, error_log):
+@stage("ingest", station="prefix")
+def process_files(path_list, prefix, output_folder, data_type, error_log, timings=None, reader=None, unresolved=None,
+                  fetcher=None):
     os.makedirs(output_folder, exist_ok=True)
     error_nwp_list = []
-    df = pd.DataFrame()
-
-    for file_path in path_list:
+    frames = []
+    read_seconds = 0.0
+    reader = reader or ExcelReader()
+    fetcher = fetcher or NasFetcher()
+    columns, tag = header_filter(data_type), cache_tag(data_type)
+
+    # 按路径排序，保证重复时间戳的取舍与文件遍历顺序无关
+    station_files = sorted(f for f in path_list
+                           if os.path.basename(f).startswith(prefix) and f"_{data_type}_" in os.path.basename(f))
+    # I/O 线程按顺序预读文件内容，当前线程解析
+    for file_path, tmp, error, seconds in fetcher.read_files(station_files, reader, columns, tag):
         basename = os.path.basename(file_path)
-        if basename.startswith(prefix) and f"_{data_type}_" in basename:
-            try:
-                tmp = pd.read_excel(file_path)
-
-                # 检查并解析时间列
-                if "TIME" in tmp.columns and "Time" in tmp.columns:
-                    tmp.drop(["TIME"], axis=1, inplace=True)
-                tmp.rename(columns=rename_dict, inplace=True)
-
-                # 检查时间列是否有效
-                if "Time" not in tmp.columns:
-                    print(f"文件 {file_path} 缺少时间列，跳过处理")
-                    error_nwp_list.append(prefix)
-                    continue
-                tmp['Time'] = pd.to_datetime(tmp['Time'], errors='coerce')
-                tmp = tmp.dropna(subset=['Time'])  # 删除时间无效的行
-                tmp.rename(columns=rename_final_columns, inplace=True)
-
-                # 如果列缺失，添加空列
-                if "Power_Nas" not in tmp.columns and data_type == "Power":
-                    tmp["Power_Nas"] = None
-                if "Radiation_Nas" not in tmp.columns and data_type == "Radiation":
-                    tmp["Radiation_Nas"] = None
-
-                tmp.set_index("Time", inplace=True)
-                df = pd.concat([df, tmp]).sort_values(by='Time')
-            except Exception as e:
+        read_seconds += seconds
+        try:
+            if error is not None:
+                raise error
+
+            # 按表头解析目标列（表头相同的文件复用解析结果）
+            headers = tuple(tmp.attrs.get("source_columns", tmp.columns))
+            mapping, missing = resolve_headers(headers, data_type)
+
+            # 检查时间列是否有效
+            if "Time" in missing:
+                print(f"文件 {file_path} 缺少时间列，跳过处理")
+                error_nwp_list.append(prefix)
+                continue
+            # 表头无法识别的文件记入报告，不再补空列
+            if missing:
+                print(f"文件 {file_path} 表头无法识别 {list(missing)}，跳过处理")
                 error_nwp_list.append(prefix)
-                print(f"Error processing file {basename}: {e}")
+                if unresolved is not None:
+                    unresolved.append(unresolved_record(file_path, data_type, headers, missing))
+                continue
+            # 时间列按样本推断的格式解析，文件未变化时取缓存（以原始表头区分）
+            time_header = next(source for source, target in mapping.items() if target == "Time")
+            tmp = tmp[list(mapping)].rename(columns=mapping)
+            tmp['Time'] = parse_times(tmp['Time'], source=file_path, column=time_header)
+            tmp = tmp.dropna(subset=['Time'])  # 删除时间无效的行
+
+            tmp.set_index("Time", inplace=True)
+            frames.append(tmp)
+        except Exception as e:
+            error_nwp_list.append(prefix)
+            print(f"Error processing file {basename}: {e}")
 
+    # 所有文件读取完后只合并、排序一次；重复时间戳保留排序靠后文件中的值
+    t0 = time.perf_counter()
+    df = pd.concat(frames) if frames else pd.DataFrame()
+    if not df.empty:
+        df = df.sort_index(kind="stable")
+        df = df[~df.index.duplicated(keep="last")]
+    merge_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    # 文件名包含起止日期：中间文件夹保留到下次运行，先删除本场站上次的输出
+    for name in os.listdir(output_folder):
+        if name.startswith(f"{prefix}_{data_type}_") and name.endswith(storage.suffix):
+            os.remove(os.path.join(output_folder, name))
     if not df.empty:
         start_time = datetime.datetime.strftime(df.index[0].date(), "%Y%m%d")
         end_time = datetime.datetime.strftime(df.index[-1].date(), "%Y%m%d")
-        output_file = os.path.join(output_folder, f"{prefix}_{data_type}_{start_time}_{end_time}.csv")
-        df.to_csv(output_file)
+        storage.write(df, output_folder, f"{prefix}_{data_type}_{start_time}_{end_time}")
     else:
         error_nwp_list.append(prefix)
+    write_seconds = time.perf_counter() - t0
+
+    metrics = current_span()
+    metrics.set(data_type=data_type, files=len(station_files))
+    metrics.add(rows=len(df))
+    metrics.add_file(*station_files)
+
+    print(f"{prefix} {data_type}: {len(station_files)} 个文件，读取 {read_seconds:.2f}s，合并排序 {merge_seconds:.2f}s，写入 {write_seconds:.2f}s")
+    if timings is not None:
+        timings.append({"prefix": prefix, "data_type": data_type, "files": len(station_files), "rows": len(df),
+                        "read_seconds": round(read_seconds, 3), "merge_seconds": round(merge_seconds, 3),
+                        "write_seconds": round(write_seconds, 3)})
 
     error_log.extend(error_nwp_list)
     return error_nwp_list
 
+def process_station(path_list, prefix, power_folder, radiation_folder, reader=None, fetcher=None):
+    error_log, timings, unresolved = [], [], []
+    process_files(path_list, prefix, power_folder, "Power", error_log, timings, reader, unresolved, fetcher)
+    process_files(path_list, prefix, radiation_folder, "Radiation", error_log, timings, reader, unresolved, fetcher)
+    return error_log, timings, unresolved
+
+def write_timing_report(timings, timing_file):
+    # 按场站耗时从高到低输出，便于定位 Nas 读取慢的场站
+    report = pd.DataFrame(timings)
+    if report.empty:
+        return
+    report["total_seconds"] = report[["read_seconds", "merge_seconds", "write_seconds"]].sum(axis=1).round(3)
+    report.sort_values("total_seconds", ascending=False).to_csv(timing_file, index=False, encoding="utf-8-sig")
+    print(f"场站耗时统计已保存到: {timing_file}")
+
+def write_unresolved_report(unresolved, unresolved_file):
+    # 每行一个表头无法识别的文件：缺失的目标列、原始表头和规范化后的表头，用于补充别名规则
+    report = pd.DataFrame(unresolved, columns=["file", "data_type", "missing", "headers", "normalized_headers"])
+    report.to_csv(unresolved_file, index=False, encoding="utf-8-sig")
+    print(f"无法识别的表头共 {len(report)} 个文件，已保存到: {unresolved_file}")
+
 def extract_station_number(filename):
     match = re.search(r'NARI-(\d+)-', filename)
     return match.group(1) if match else None
 
-def merge_station_files(power_folder, radiation_folder, output_folder, error_log):
+def merge_station_files(power_folder, radiation_folder, output_folder, error_log, manifest=None):
     os.makedirs(output_folder, exist_ok=True)
-    power_files = {extract_station_number(f): os.path.join(power_folder, f) for f in os.listdir(power_folder) if f.endswith('.csv')}
-    radiation_files = {extract_station_number(f): os.path.join(radiation_folder, f) for f in os.listdir(radiation_folder) if f.endswith('.csv')}
-
-    for station_number, power_file in power_files.items():
-        radiation_file = radiation_files.get(station_number)
-        try:
-            # 读取Power文件
-            power_data = pd.read_csv(power_file, index_col='Time', parse_dates=True)
-            if "Power_Nas" not in power_data.columns:
-                power_data["Power_Nas"] = None  # 确保Power_Nas列存在
-
-            # 读取Radiation文件
-            if radiation_file:
-                radiation_data = pd.read_csv(radiation_file, index_col='Time', parse_dates=True)
-
-                # 检查是否存在`Radiation_Nas`列，如果不存在则创建空列
-                if 'Radiation_Nas' not in radiation_data.columns:
-                    radiation_data['Radiation_Nas'] = None
-                radiation_data = radiation_data[['Radiation_Nas']]  # 只保留`Radiation_Nas`列
-            else:
-                # 如果辐射文件不存在，创建一个空的DataFrame
-                radiation_data = pd.DataFrame(index=power_data.index)
-                radiation_data["Radiation_Nas"] = None
-
-            # 合并数据
-            merged_data = pd.merge(power_data, radiation_data, left_index=True, right_index=True, how='outer')
-
-            # 保存合并结果
-            output_file = os.path.join(output_folder, f"{station_number}.csv")
-            merged_data.to_csv(output_file)
-        except Exception as e:
+    power_files = {extract_station_number(f): os.path.join(power_folder, f) for f in os.listdir(power_folder) if f.endswith(storage.suffix)}
+    radiation_files = {extract_station_number(f): os.path.join(radiation_folder, f) for f in os.listdir(radiation_folder) if f.endswith(storage.suffix)}
+
+    # 按场站并行合并，失败场站按顺序记入错误日志
+    tasks = [(station_number, power_file, radiation_files.get(station_number), output_folder)
+             for station_number, power_file in power_files.items()]
+    # 功率、辐照度文件均未变化的场站跳过（manifest 为构建清单，None 时全部合并）
+    builds = [("nas_merge", storage.path(output_folder, station_number), [power_file, radiation_file], "")
+              for station_number, power_file, radiation_file, _ in tasks]
+    for (station_number, _, _, _), (_, error) in zip(tasks, run_outdated(merge_station_file, tasks, builds, manifest)):
+        if error is not None:
             error_log.append(station_number)
-            print(f"Error merging station {station_number}: {e}")
+            print(f"Error merging station {station_number}: {error}")
+
+@stage("nas_merge", station="station_number")
+def merge_station_file(station_number, power_file, radiation_file, output_folder):
+    # 读取Power文件
+    power_data = storage.read(power_file, time_index=True)
+    if "Power_Nas" not in power_data.columns:
+        power_data["Power_Nas"] = None  # 确保Power_Nas列存在
+
+    # 读取Radiation文件
+    if radiation_file:
+        radiation_data = storage.read(radiation_file, time_index=True)
+
+        # 检查是否存在`Radiation_Nas`列，如果不存在则创建空列
+        if 'Radiation_Nas' not in radiation_data.columns:
+            radiation_data['Radiation_Nas'] = None
+        radiation_data = radiation_data[['Radiation_Nas']]  # 只保留`Radiation_Nas`列
+    else:
+        # 如果辐射文件不存在，创建一个空的DataFrame
+        radiation_data = pd.DataFrame(index=power_data.index)
+        radiation_data["Radiation_Nas"] = None
 
-def clean_and_save_final(source_folder, target_folder, start_time, time_freq="5min"):
+    # 合并数据
+    merged_data = pd.merge(power_data, radiation_data, left_index=True, right_index=True, how='outer')
+
+    # 保存合并结果
+    storage.write(merged_data, output_folder, station_number)
+    current_span().add(rows=len(merged_data))
+
+def clean_and_save_final(source_folder, target_folder, start_time, time_freq="5min", chunk_rows=None, manifest=None):
     os.makedirs(target_folder, exist_ok=True)
-    csv_files = [f for f in os.listdir(source_folder) if f.endswith('.csv')]
+    csv_files = [f for f in os.listdir(source_folder) if f.endswith(storage.suffix)]
 
     if not csv_files:
         return
 
-    # 合并重复时间索引
-    for csv_file in csv_files:
-        file_path = os.path.join(source_folder, csv_file)
+    # 按文件并行合并重复时间索引
+    tasks = [(csv_file, source_folder, target_folder, start_time, time_freq, chunk_rows) for csv_file in csv_files]
+    builds = [("clean", storage.path(target_folder, os.path.splitext(csv_file)[0]), [os.path.join(source_folder, csv_file)],
+               f"{start_time}|{time_freq}") for csv_file in csv_files]
+    for csv_file, (_, error) in zip(csv_files, run_outdated(clean_file, tasks, builds, manifest)):
+        if error is not None:
+            print(f"处理文件 {csv_file} 失败: {error}")
+
+def _reindex_chunks(data, grid, chunk_rows):
+    # 将已去重的数据按完整时间序列分段输出，每段不超过 chunk_rows 行
+    data = data[~data.index.duplicated(keep='last')]
+    for i in range(0, len(grid), chunk_rows):
+        chunk = data.reindex(grid[i:i + chunk_rows])
+        chunk.reset_index(inplace=True)
+        chunk.rename(columns={"index": "Time"}, inplace=True)
+        yield chunk
+
+
+def clean_chunks(chunks, start_time, time_freq, chunk_rows):
+    """
+    分块补全时间序列：输入需按时间有序。早于当前块最大时间的行不会再有重复，可以输出；
+    等于最大时间的行留到下一块，以便按 keep='last' 去重。出现早于已输出时间的行时抛出 ChunkOrderError。
+    """
+    cursor = pd.Timestamp(start_time)
+    pending = None
+    for chunk in chunks:
+        data = chunk if pending is None else pd.concat([pending, chunk])
+        data = data[data.index.notna()]
+        if ((data.index < cursor) & (data.index >= start_time)).any():
+            raise ChunkOrderError("时间索引未按时间排序")
+        data = data[data.index >= cursor]
+        if data.empty:
+            pending = data
+            continue
+
+        last = data.index.max()
+        ready = data.index < last
+        grid = pd.date_range(start=cursor, end=last, freq=time_freq, inclusive="left")
+        yield from _reindex_chunks(data[ready], grid, chunk_rows)
+        if len(grid):
+            cursor = grid[-1] + pd.tseries.frequencies.to_offset(time_freq)
+        pending = data[~ready]
+
+    # 最后一段补全到最大时间（含）
+    if pending is not None and not pending.empty:
+        grid = pd.date_range(start=cursor, end=pending.index.max(), freq=time_freq)
+        yield from _reindex_chunks(pending, grid, chunk_rows)
+
+
+@stage("clean", station="csv_file")
+def clean_file(csv_file, source_folder, target_folder, start_time, time_freq="5min", chunk_rows=None):
+    file_path = os.path.join(source_folder, csv_file)
+    station_id = os.path.splitext(csv_file)[0]
+
+    # 分块模式：逐块去重、补全时间序列并写入，输入未按时间排序时改为整表处理
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    if chunk_rows:
+        written, index = False, None
         try:
-            data = pd.read_csv(file_path, index_col='Time', parse_dates=True)
-
-            # 如果数据为空，跳过处理
-            if data.empty:
-                continue
-
-            # 处理重复时间索引
-            data = data[~data.index.duplicated(keep='last')]
+            with storage.chunk_writer(target_folder, station_id) as writer:
+                for chunk in clean_chunks(storage.read_chunks(file_path, chunk_rows, time_index=True),
+                                          start_time, time_freq, chunk_rows):
+                    writer.write(chunk)
+                    part = GapIndex.from_frame(chunk, start_time, freq=time_freq)
+                    index = part if index is None else index.extend(part)
+                    written = True
+            if written:
+                write_gap_index(index, writer.file_path)
+                print(f"已保存文件：{writer.file_path}")
+            return
+        except ChunkOrderError as e:
+            # 已写入的部分结果随临时文件删除，改用整表处理
+            print(f"文件 {csv_file} 无法分块处理（{e}），改为整表处理")
+
+    data = storage.read(file_path, time_index=True)
+
+    # 如果数据为空，跳过处理
+    if data.empty:
+        return
 
-            # 创建完整时间序列
-            full_time_index = pd.date_range(start=start_time, end=data.index.max(), freq=time_freq)
-            data = data.reindex(full_time_index)
+    # 处理重复时间索引
+    data = data[~data.index.duplicated(keep='last')]
 
-            # 重置索引并保存
-            data.reset_index(inplace=True)
-            data.rename(columns={"index": "Time"}, inplace=True)
-            output_file_path = os.path.join(target_folder, csv_file)
-            data.to_csv(output_file_path, index=False)
-            print(f"已保存文件：{output_file_path}")
-        except Exception as e:
-            print(f"处理文件 {csv_file} 失败: {e}")
+    # 放到从 start_time 到最后时间的完整时间序列上并保存
+    series = StationSeries.from_frame(data, start=start_time, end=data.index.max(), freq=time_freq)
+    data = series.to_frame()
+    output_file_path = storage.write(data, target_folder, station_id)
+    write_gap_index(GapIndex.from_frame(data, start_time, freq=time_freq), output_file_path)
+    current_span().add(rows=len(data))
+    print(f"已保存文件：{output_file_path}")
 
 def write_error_log(error_log, log_file):
     with open(log_file, "w") as f:
@@ -174,50 +292,95 @@ def write_error_log(error_log, log_file):
             f.write(f"{error}\n")
     print(f"错误场站信息已保存到: {log_file}")
 
-# 主流程
-backup_folder = r"D:\新能源预测小组\Project\concat\data\backup"
-power_folder = r"D:\新能源预测小组\Project\concat\data\backup\Power-5.5"
-radiation_folder = r"D:\新能源预测小组\Project\concat\data\backup\Radiation-5.5"
-merged_folder = r"D:\新能源预测小组\Project\concat\data\backup\merged-5.5"
-cleaned_folder = r"D:\新能源预测小组\Project\concat\data\Nas"
-log_file = r"D:\新能源预测小组\Project\concat\data\error_log.txt"
-
-INFO = pd.read_excel("station_info.xlsx").set_index("NwpId")
-root_directory = r"\\192.168.5.5\homes\projectControl\0000 给XBY数据\0001 光伏反馈"
-
-# 获取所有匹配的文件路径
-path_list = get_all_files(root_directory)
-
-# 确保所有输出文件夹存在
-os.makedirs(power_folder, exist_ok=True)
-os.makedirs(radiation_folder, exist_ok=True)
-os.makedirs(merged_folder, exist_ok=True)
-os.makedirs(cleaned_folder, exist_ok=True)
-
-error_log = []
-
-# 对每个场站进行数据处理
-for nwp in INFO.index:
-    prefix = INFO.loc[nwp, "天气预报前缀"]
-    process_files(path_list, prefix, rename_dict_power, power_folder, "Power", error_log)
-    process_files(path_list, prefix, rename_dict_radiation, radiation_folder, "Radiation", error_log)
-
-merge_station_files(power_folder, radiation_folder, merged_folder, error_log)
-
-# 执行清理
-start_time = pd.Timestamp("2021-01-01 00:00")
-clean_and_save_final(merged_folder, cleaned_folder, start_time)
-
-# 写入日志文件
-write_error_log(error_log, log_file)
-
-# 删除过程处理文件
-backup_folder_path = r"D:\新能源预测小组\Project\concat\data\backup"
-if os.path.exists(backup_folder_path):
-    shutil.rmtree(backup_folder_path)
-    print(f"已成功删除文件夹: {backup_folder_path}")
-else:
-    print(f"文件夹不存在: {backup_folder_path}")
-
-print(f"所有文件已处理完成，并保存到 {cleaned_folder} 文件夹中！")
-
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nas 光伏反馈数据整理")
+    parser.add_argument("--full", action="store_true", help="忽略文件索引和构建清单中的处理记录，重新处理全部场站")
+    parser.add_argument("--io-workers", type=int, default=None, help="每个进程读取共享目录的线程数，默认取 NAS_IO_WORKERS 或 4")
+    parser.add_argument("--prefetch", type=int, default=None, help="每个进程已读入待解析的文件数上限，默认取 NAS_PREFETCH 或 2 × 线程数")
+    args = parser.parse_args()
+    start_run("Nas_Data")
+
+    # 主流程
+    backup_folder = r"D:\新能源预测小组\Project\concat\data\backup"
+    power_folder = r"D:\新能源预测小组\Project\concat\data\backup\Power-5.5"
+    radiation_folder = r"D:\新能源预测小组\Project\concat\data\backup\Radiation-5.5"
+    merged_folder = r"D:\新能源预测小组\Project\concat\data\backup\merged-5.5"
+    cleaned_folder = r"D:\新能源预测小组\Project\concat\data\Nas"
+    log_file = r"D:\新能源预测小组\Project\concat\data\error_log.txt"
+    timing_file = r"D:\新能源预测小组\Project\concat\data\nas_timing.csv"
+    unresolved_file = r"D:\新能源预测小组\Project\concat\data\unresolved_headers.csv"
+    catalog_file = r"D:\新能源预测小组\Project\concat\data\nas_catalog.sqlite"
+    manifest_file = r"D:\新能源预测小组\Project\concat\data\build_manifest.sqlite"
+    excel_cache_folder = r"D:\新能源预测小组\Project\concat\data\excel_cache"
+    time_cache_file = r"D:\新能源预测小组\Project\concat\data\time_cache.sqlite"
+
+    INFO = pd.read_excel("station_info.xlsx").set_index("NwpId")
+    root_directory = r"\\192.168.5.5\homes\projectControl\0000 给XBY数据\0001 光伏反馈"
+
+    # 更新文件索引（只遍历一次共享目录）
+    catalog = NasCatalog(catalog_file)
+    removed_names = catalog.scan(root_directory)
+
+    # 确保所有输出文件夹存在
+    os.makedirs(power_folder, exist_ok=True)
+    os.makedirs(radiation_folder, exist_ok=True)
+    os.makedirs(merged_folder, exist_ok=True)
+    os.makedirs(cleaned_folder, exist_ok=True)
+
+    error_log = []
+
+    # Excel 读取器：优先 calamine 引擎，解析结果按文件缓存
+    reader = ExcelReader(cache_folder=excel_cache_folder)
+    # 时间列解析结果按文件缓存（子进程通过环境变量共用）
+    os.environ.setdefault("TIME_PARSE_CACHE", time_cache_file)
+    # 共享目录读取线程与预读上限
+    fetcher = NasFetcher(args.io_workers, args.prefetch)
+
+    # 通过索引查找每个场站的文件，文件未变化且已有结果的场站直接跳过
+    prefixes, tasks = [], []
+    for nwp in INFO.index:
+        prefix = INFO.loc[nwp, "天气预报前缀"]
+        station_paths = catalog.lookup(prefix, "Power") + catalog.lookup(prefix, "Radiation")
+        station_number = extract_station_number(f"{prefix}_Power_")
+        unchanged = not catalog.changed(station_paths) and not any(name.startswith(prefix) for name in removed_names)
+        if not args.full and station_paths and unchanged and station_number \
+                and os.path.exists(storage.path(cleaned_folder, station_number)):
+            print(f"场站 {prefix} 文件未变化，跳过处理")
+            continue
+        prefixes.append(prefix)
+        tasks.append((station_paths, prefix, power_folder, radiation_folder, reader, fetcher))
+
+    # 按场站并行进行数据处理，错误信息按场站顺序汇总
+    processed_paths, timings, unresolved = [], [], []
+    for prefix, (station_paths, *_), (result, error) in zip(prefixes, tasks, run_stations(process_station, tasks)):
+        if error is not None:
+            result = ([prefix], [], [])
+            print(f"Error processing station {prefix}: {error}")
+        station_errors, station_timings, station_unresolved = result
+        error_log.extend(station_errors)
+        timings.extend(station_timings)
+        unresolved.extend(station_unresolved)
+        if not station_errors:
+            processed_paths.extend(station_paths)
+
+    # 中间文件未变化的场站跳过合并和补全时间序列
+    manifest = BuildManifest(manifest_file, force=args.full)
+    merge_station_files(power_folder, radiation_folder, merged_folder, error_log, manifest)
+
+    # 执行清理
+    start_time = pd.Timestamp("2021-01-01 00:00")
+    clean_and_save_final(merged_folder, cleaned_folder, start_time, manifest=manifest)
+    manifest.close()
+
+    # 写入日志文件
+    write_error_log(error_log, log_file)
+    write_timing_report(timings, timing_file)
+    write_unresolved_report(unresolved, unresolved_file)
+
+    # 全部处理成功后再记录文件状态，出错的场站下次继续重试
+    catalog.mark_processed(processed_paths)
+    catalog.close()
+
+    # 过程文件（backup）保留，下次运行时未变化的场站直接复用
+
+    print(f"所有文件已处理完成，并保存到 {cleaned_folder} 文件夹中！")
@@ -0,0 +1,68 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Nas 文件并发读取：
+1、I/O 线程（NAS_IO_WORKERS，默认 4）预先从共享目录读取文件内容，解析在调用方线程中进行，
+   网络延迟与解析重叠；场站之间仍由 run_stations 按进程并行解析，共享目录上同时在途的读取不超过 进程数 × I/O 线程数；
+2、背压：在途（读取中、已读入待解析和正在解析）的文件不超过 NAS_PREFETCH 个（默认 2 × I/O 线程数），解析较慢时暂停读取，
+   内存有上限；NAS_PREFETCH=1 时与逐个读取相同；
+3、文件按输入顺序产出，单个文件读取失败时产出异常，由调用方按原方式记入错误日志；解析结果有缓存的文件直接取缓存，不读取文件内容；
+4、NAS_READ_LATENCY（秒）为每次读取额外注入的延迟，在本地目录上模拟共享目录。
+"""
+
+
+def _env_int(name, default):
+    value = os.getenv(name, "")
+    return int(value) if value else default
+
+
+class NasFetcher:
+    def __init__(self, io_workers=None, max_pending=None, latency=None):
+        self.io_workers = max(1, io_workers or _env_int("NAS_IO_WORKERS", 4))
+        self.max_pending = max(1, max_pending or _env_int("NAS_PREFETCH", 2 * self.io_workers))
+        self.latency = float(os.getenv("NAS_READ_LATENCY", "0")) if latency is None else latency
+
+    def fetch(self, file_path, reader, columns=None, cache_tag=None):
+        # I/O 线程中执行：返回缓存的 DataFrame 或文件内容（bytes）
+        cached = reader.cached(file_path, columns, cache_tag)
+        if cached is not None:
+            return cached
+        if self.latency:
+            time.sleep(self.latency)
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def read_files(self, file_paths, reader, columns=None, cache_tag=None):
+        """
+        按顺序产出 (文件路径, DataFrame, 异常, 耗时)：耗时为调用方等待读取和解析的时间。
+        """
+        file_paths = list(file_paths)
+        with ThreadPoolExecutor(max_workers=min(self.io_workers, max(len(file_paths), 1))) as pool:
+            pending = deque()
+            queued = iter(file_paths)
+
+            def submit():
+                # 在途文件达到上限时不再提交
+                for file_path in queued:
+                    pending.append((file_path, pool.submit(self.fetch, file_path, reader, columns, cache_tag)))
+                    if len(pending) >= self.max_pending:
+                        return
+
+            submit()
+            while pending:
+                file_path, future = pending[0]
+                t0 = time.perf_counter()
+                try:
+                    content = future.result()
+                    df = content if not isinstance(content, bytes) else reader.read(file_path, columns, cache_tag, content)
+                    error = None
+                except Exception as e:
+                    df, error = None, e
+                # 解析完成后释放文件内容，再提交下一个文件
+                content = None
+                pending.popleft()
+                submit()
+                yield file_path, df, error, time.perf_counter() - t0
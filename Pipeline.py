@@ -0,0 +1,162 @@
+import os
+import argparse
+from contextlib import ExitStack
+from Data_merge import db_path, nas_path, merge_station_series, merge_station_chunks
+from Data_Fusion import fusion_chunks
+from Station_Executor import run_stations
+from Station_Chunks import DEFAULT_CHUNK_ROWS, resolve_chunk_rows
+from Storage import get_storage
+from Calculate_Rate import output_file, station_availability_chunks, write_rate_report, required_columns
+from Availability import GRANULARITIES, AvailabilityReport, series_counts
+from Rate_Cache import RateCache, file_fingerprint
+from Run_Metrics import current_span, span, stage, start_run
+
+"""
+单次流式处理：每个场站在内存中依次完成 合并(Data_merge) → 融合(Data_Fusion) → 月度非空率(Calculate_Rate)，
+只读取一次 DB 与 Nas 文件、写一次统计报表；DB+Nas 与 Fusion 中间文件按需输出。
+分块模式（--chunk-rows 或 STATION_CHUNK_ROWS）下三个阶段逐块完成，内存只与块大小有关，结果与整表模式一致。
+--cache 时按场站保存计数，DB、Nas 文件和已输出的中间文件均未变化的场站直接取缓存，整条流程跳过；--force 全部重新处理。
+"""
+
+
+# 数据存储格式（CSV / Parquet）
+storage = get_storage()
+
+pipeline_cache_file = r"D:\新能源预测小组\Project\concat\data\pipeline_cache.sqlite"
+
+
+def _written(chunks, writer):
+    # 边处理边写出中间文件
+    for chunk in chunks:
+        if writer is not None:
+            writer.write(chunk)
+        yield chunk
+
+
+def run_station_chunks(station_id, db_file, nas_file, merged_folder, fusion_folder, chunk_rows, granularity="month"):
+    file_name = f"{station_id}{storage.suffix}"
+    with ExitStack() as stack:
+        merged_writer = stack.enter_context(storage.chunk_writer(merged_folder, station_id, encoding='utf-8-sig')) \
+            if merged_folder else None
+        fusion_writer = stack.enter_context(storage.chunk_writer(fusion_folder, station_id, encoding='utf-8-sig')) \
+            if fusion_folder else None
+
+        # 合并 → 融合 → 月度计数，逐块流式完成；合并结果按行号生成时间，融合窗口总是对齐
+        merged = _written(merge_station_chunks(db_file, nas_file, chunk_rows), merged_writer)
+        fused = _written(fusion_chunks(merged), fusion_writer)
+        return station_availability_chunks(fused, required_columns, file_name, granularity)
+
+
+@stage("station", station="station_id")
+def run_station(station_id, db_file, nas_file, merged_folder=None, fusion_folder=None, chunk_rows=None,
+                granularity="month"):
+    current_span().add_file(db_file, nas_file)
+    chunk_rows = resolve_chunk_rows(chunk_rows)
+    if chunk_rows:
+        return run_station_chunks(station_id, db_file, nas_file, merged_folder, fusion_folder, chunk_rows, granularity)
+
+    file_name = f"{station_id}{storage.suffix}"
+
+    # 合并：DB 与 Nas 在同一 5 分钟网格上按行号对齐
+    with span("merge", station_id) as metrics:
+        merged = merge_station_series(db_file, nas_file)
+        if merged_folder:
+            storage.write(merged.to_frame(), merged_folder, station_id, encoding='utf-8-sig')
+        metrics.add(rows=len(merged))
+    current_span().add(rows=len(merged))
+
+    # 融合：合并结果的时间本就在网格上，直接按规则表融合
+    if not len(merged):
+        print(f"文件 {file_name} 的 'Time' 列无法解析为有效日期，跳过处理")
+        return None
+    with span("fusion", station_id) as metrics:
+        fused = merged.fuse()
+        if fusion_folder:
+            storage.write(fused.to_frame(), fusion_folder, station_id, encoding='utf-8-sig')
+        metrics.add(rows=len(fused))
+
+    # 非空率计数：直接在网格数组上按时间桶求和
+    with span("rate", station_id) as metrics:
+        metrics.add(rows=len(fused))
+        return series_counts(fused, required_columns, granularity)
+
+
+def station_fingerprint(station_id, db_file, nas_file, merged_folder, fusion_folder, granularity):
+    # 输入文件与要求输出的中间文件：中间文件被删除或改动时同样重新处理
+    outputs = [storage.path(folder, station_id) for folder in (merged_folder, fusion_folder) if folder]
+    extra = f"pipeline|{granularity}|{','.join(required_columns)}"
+    return file_fingerprint([db_file, nas_file] + outputs, extra)
+
+
+def run_pipeline(db_folder, nas_folder, report_file, merged_folder=None, fusion_folder=None, workers=None,
+                 chunk_rows=None, granularity="month", cache_file=None, force=False):
+    for folder in (merged_folder, fusion_folder):
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    db_files = storage.list_stations(db_folder)
+    nas_files = storage.list_stations(nas_folder)
+    all_ids = sorted(set(db_files.keys()).union(set(nas_files.keys())))
+
+    # 未变化的场站直接取缓存的计数
+    cache = RateCache(cache_file) if cache_file else None
+    results = {}
+    if cache is not None and not force:
+        for station_id in all_ids:
+            fingerprint = station_fingerprint(station_id, db_files.get(station_id), nas_files.get(station_id),
+                                              merged_folder, fusion_folder, granularity)
+            counts = cache.get(station_id, granularity, fingerprint, required_columns)
+            if counts is not None:
+                results[station_id] = counts
+        print(f"缓存命中 {len(results)} 个场站，重新处理 {len(all_ids) - len(results)} 个场站")
+
+    # 按场站并行处理，结果按场站顺序汇总
+    pending = [station_id for station_id in all_ids if station_id not in results]
+    tasks = [(station_id, db_files.get(station_id), nas_files.get(station_id), merged_folder, fusion_folder, chunk_rows,
+              granularity) for station_id in pending]
+    for station_id, (counts, error) in zip(pending, run_stations(run_station, tasks, workers)):
+        if error is not None:
+            print(f"场站 {station_id} 处理失败: {error}")
+            continue
+        if counts is not None:
+            results[station_id] = counts
+            if cache is not None:
+                # 中间文件已写出，按写出后的状态记录指纹
+                cache.put(station_id, granularity, station_fingerprint(
+                    station_id, db_files.get(station_id), nas_files.get(station_id), merged_folder, fusion_folder,
+                    granularity), counts)
+        print(f"场站 {station_id} 已处理完毕")
+    if cache is not None:
+        cache.prune(all_ids, granularity)
+        cache.close()
+
+    report = AvailabilityReport(required_columns, granularity)
+    for station_id in all_ids:
+        if station_id in results:
+            report.add(station_id, results[station_id])
+
+    results_sheets = report.sheets()
+    write_rate_report(results_sheets, report_file)
+    return results_sheets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB/Nas 合并、融合与非空率统计一体化流程")
+    parser.add_argument("--db", default=db_path, help="DB 数据文件夹")
+    parser.add_argument("--nas", default=nas_path, help="Nas 数据文件夹")
+    parser.add_argument("--output", default=output_file, help="非空率统计报表路径")
+    parser.add_argument("--merged-folder", default=None, help="可选：输出 DB+Nas 中间文件")
+    parser.add_argument("--fusion-folder", default=None, help="可选：输出 Fusion 中间文件")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认取 STATION_WORKERS 或 CPU 核数")
+    parser.add_argument("--chunk-rows", type=int, nargs="?", const=DEFAULT_CHUNK_ROWS, default=None,
+                        help=f"分块处理的行数（不带数值时为 {DEFAULT_CHUNK_ROWS}），默认取 STATION_CHUNK_ROWS，0 为整表处理")
+    parser.add_argument("--granularity", default="month", choices=list(GRANULARITIES), help="非空率统计粒度，默认按月")
+    parser.add_argument("--cache", nargs="?", const=pipeline_cache_file, default=None,
+                        help=f"按场站缓存计数，未变化的场站跳过（不带路径时为 {pipeline_cache_file}）")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，全部重新处理并更新缓存")
+    args = parser.parse_args()
+    start_run("Pipeline")
+
+    run_pipeline(args.db, args.nas, args.output, args.merged_folder, args.fusion_folder, args.workers, args.chunk_rows,
+                 args.granularity, args.cache, args.force)
+    print(f"统计完成，结果已保存至 {args.output}")
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import hashlib
+import numpy as np
+from Availability import BucketCounts, bucket_dtype
+
+"""
+非空率统计缓存（SQLite）：
+1、按 场站 + 统计粒度 保存每个时间桶、每个指标的有效个数和总个数；
+2、每个场站记录源文件指纹（路径、大小、修改时间及统计口径），Data_Fusion 重写融合文件后指纹随之变化，缓存自动失效；
+   指纹未变化时直接使用缓存的计数，不再读取文件；
+3、固定网格的 CSV 同时记录每个时间桶对应的字节块摘要（blocks），指纹变化时从第一个变化的时间桶开始重新计数，
+   之前的桶沿用缓存（融合文件通常只在末尾追加新数据）；其他情况整个文件重新计数（有缺口索引时不读取数据文件）；
+4、缺少必要列等统计不出结果的文件同样按指纹记录（skipped），文件未变化时不再重复读取。
+"""
+
+
+def file_fingerprint(paths, extra=""):
+    # 源文件不存在时以 "-" 记录，文件新增或删除同样会使缓存失效
+    parts = [extra]
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}")
+        else:
+            parts.append("-")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class RateCache:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                station_id TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (station_id, granularity)
+            );
+            CREATE TABLE IF NOT EXISTS counts (
+                station_id TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                valid INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                PRIMARY KEY (station_id, granularity, bucket, metric)
+            );
+            CREATE TABLE IF NOT EXISTS blocks (
+                station_id TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                byte_offset INTEGER NOT NULL,
+                byte_length INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (station_id, granularity, bucket)
+            );
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _source(self, station_id, granularity):
+        return self.conn.execute(
+            "SELECT fingerprint, skipped FROM sources WHERE station_id = ? AND granularity = ?", (station_id, granularity)
+        ).fetchone()
+
+    def get(self, station_id, granularity, fingerprint, metrics):
+        # 指纹一致时返回缓存的计数，否则（或记录为没有结果）返回 None
+        row = self._source(station_id, granularity)
+        if row is None or row[0] != fingerprint or row[1]:
+            return None
+        return self._counts(station_id, granularity, metrics)
+
+    def _counts(self, station_id, granularity, metrics):
+        known = {}
+        for bucket, metric, valid, total in self.conn.execute(
+                "SELECT bucket, metric, valid, total FROM counts WHERE station_id = ? AND granularity = ? ORDER BY bucket",
+                (station_id, granularity)):
+            known.setdefault(bucket, ({}, total))[0][metric] = valid
+        if not known:
+            return BucketCounts.empty(metrics, granularity)
+        if any(set(metrics) - set(valid) for valid, _ in known.values()):
+            return None
+        labels = sorted(known)
+        buckets = np.array(labels, dtype=bucket_dtype(granularity))
+        valid = {metric: np.array([known[label][0][metric] for label in labels], dtype=np.int64) for metric in metrics}
+        total = np.array([known[label][1] for label in labels], dtype=np.int64)
+        return BucketCounts(buckets, valid, total)
+
+    def resume(self, station_id, granularity, metrics):
+        # 增量统计的依据：上次的计数和每个时间桶的字节块 [偏移, 长度, 摘要]，没有记录时返回 None
+        row = self._source(station_id, granularity)
+        if row is None or row[1]:
+            return None
+        blocks = [list(block) for block in self.conn.execute(
+            "SELECT byte_offset, byte_length, digest FROM blocks WHERE station_id = ? AND granularity = ? ORDER BY bucket",
+            (station_id, granularity))]
+        counts = self._counts(station_id, granularity, metrics) if blocks else None
+        if counts is None or len(counts) != len(blocks):
+            return None
+        return counts, blocks
+
+    def skipped(self, station_id, granularity, fingerprint):
+        # 指纹一致且上次统计没有结果（如缺少必要列）
+        row = self._source(station_id, granularity)
+        return row is not None and row[0] == fingerprint and bool(row[1])
+
+    def put(self, station_id, granularity, fingerprint, counts, blocks=None):
+        # counts 为 None 时记录该指纹统计不出结果；blocks 为与 counts 逐桶对应的字节块，没有时不能增量统计
+        rows = []
+        block_rows = []
+        if counts is not None:
+            labels = np.datetime_as_string(counts.buckets)
+            rows = [(station_id, granularity, label, metric, int(counts.valid[metric][i]), int(counts.total[i]))
+                    for i, label in enumerate(labels) for metric in counts.valid]
+            if blocks is not None:
+                block_rows = [(station_id, granularity, label, offset, length, digest)
+                              for label, (offset, length, digest) in zip(labels, blocks)]
+        with self.conn:
+            self.conn.execute("DELETE FROM counts WHERE station_id = ? AND granularity = ?", (station_id, granularity))
+            self.conn.execute("DELETE FROM blocks WHERE station_id = ? AND granularity = ?", (station_id, granularity))
+            self.conn.executemany(
+                "INSERT INTO counts (station_id, granularity, bucket, metric, valid, total) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT INTO blocks (station_id, granularity, bucket, byte_offset, byte_length, digest) VALUES (?, ?, ?, ?, ?, ?)",
+                block_rows)
+            self.conn.execute(
+                "INSERT INTO sources (station_id, granularity, fingerprint, skipped) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(station_id, granularity) DO UPDATE SET fingerprint = excluded.fingerprint, skipped = excluded.skipped",
+                (station_id, granularity, fingerprint, int(counts is None)),
+            )
+
+    def prune(self, station_ids, granularity):
+        # 删除源文件已不存在的场站
+        keep = set(station_ids)
+        stale = [(station_id,) for (station_id,) in self.conn.execute(
+            "SELECT station_id FROM sources WHERE granularity = ?", (granularity,)) if station_id not in keep]
+        with self.conn:
+            self.conn.executemany("DELETE FROM sources WHERE station_id = ? AND granularity = ?",
+                                  [(station_id, granularity) for (station_id,) in stale])
+            self.conn.executemany("DELETE FROM counts WHERE station_id = ? AND granularity = ?",
+                                  [(station_id, granularity) for (station_id,) in stale])
+            self.conn.executemany("DELETE FROM blocks WHERE station_id = ? AND granularity = ?",
+                                  [(station_id, granularity) for (station_id,) in stale])
+        return len(stale)
@@ -0,0 +1,161 @@
+import numpy as np
+
+"""
+非空率报表写出：
+1、单元格写入数值（0~1）并使用百分比数字格式，颜色由工作表内的条件格式规则给出，不再写入 "95.3%" 文本后重新加载逐格着色；
+2、颜色规则为声明式配置：ranges 为 (比较符, 阈值, 颜色) 列表，按顺序第一条满足的生效；empty 为 (占位值, 颜色)，
+   None 时空值保持空白。RATE_RULES 与原 Calculate_Rate 一致，RED_GREEN_RULES / FULL_NAN_RULES 对应 Red_Green.py / Full_Nan.py，
+   RULE_SETS 中的 red_green / full_nan 相当于 Calculate_Rate 写出后再运行对应脚本；
+3、优先使用 xlsxwriter 的 constant_memory 模式逐行写出，未安装时使用 openpyxl 只写模式，均为单次写出，不重新加载。
+"""
+
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
+RED = "FFCCCC"    # 淡红色
+GREEN = "CCFFCC"  # 淡绿色
+PERCENT_FORMAT = "0.0%"
+
+# Excel 单个工作表的最大列数
+EXCEL_MAX_COLUMNS = 16384
+
+RATE_RULES = {"ranges": [("<", 0.8, RED), ("==", 1.0, GREEN)], "empty": None}
+RED_GREEN_RULES = {"ranges": [("<", 0.6, RED), (">=", 0.9, GREEN)], "empty": (0.0, RED)}
+FULL_NAN_RULES = {"ranges": [], "empty": (0.0, RED)}
+
+
+def layered_rules(*rule_sets):
+    # 叠加规则，前者优先：相当于先按后面的规则着色，再用前面的规则覆盖
+    empty = next((rules["empty"] for rules in rule_sets if rules["empty"] is not None), None)
+    return {"ranges": [rule for rules in rule_sets for rule in rules["ranges"]], "empty": empty}
+
+
+RULE_SETS = {
+    "rate": RATE_RULES,
+    "red_green": layered_rules(RED_GREEN_RULES, RATE_RULES),
+    "full_nan": layered_rules(FULL_NAN_RULES, RATE_RULES),
+}
+
+# 比较符对应的 Excel 公式写法
+EXCEL_OPERATORS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "==": "=", "!=": "<>"}
+
+
+def rule_formula(operator, threshold, cell="B2"):
+    # 条件格式公式，相对于区域左上角单元格；空白单元格不参与比较（Excel 中空白按 0 比较）
+    if operator not in EXCEL_OPERATORS:
+        raise ValueError(f"未知的比较符: {operator}，可选 {list(EXCEL_OPERATORS)}")
+    return f"AND(ISNUMBER({cell}),{cell}{EXCEL_OPERATORS[operator]}{float(threshold)!r})"
+
+
+def check_columns(sheets):
+    # 按小时统计多年数据时列数会超过 Excel 上限
+    for sheet_name, sheet_data in sheets.items():
+        if sheet_data.shape[1] + 1 > EXCEL_MAX_COLUMNS:
+            raise ValueError(f"{sheet_name} 共 {sheet_data.shape[1]} 个时间列，超过 Excel 列数上限，请改用更粗的统计粒度")
+
+
+def _rows(sheet_data):
+    # 逐行给出 (行标签, 数值数组)
+    values = sheet_data.to_numpy(dtype=np.float64)
+    return zip(sheet_data.index, values)
+
+
+def _write_xlsxwriter(sheets, output_file, rules):
+    workbook = xlsxwriter.Workbook(output_file, {"constant_memory": True})
+    header = workbook.add_format({"bold": True, "border": 1})
+    percent = workbook.add_format({"num_format": PERCENT_FORMAT})
+    fills = {color: workbook.add_format({"bg_color": f"#{color}"}) for _, _, color in rules["ranges"]}
+    empty = rules["empty"]
+    if empty is not None:
+        empty_format = workbook.add_format({"num_format": PERCENT_FORMAT, "bg_color": f"#{empty[1]}", "pattern": 1})
+
+    for sheet_name, sheet_data in sheets.items():
+        sheet = workbook.add_worksheet(sheet_name)
+        sheet.write_string(0, 0, sheet_data.index.name or "", header)
+        for col, label in enumerate(sheet_data.columns, start=1):
+            sheet.write_string(0, col, str(label), header)
+
+        # constant_memory 模式下必须按行顺序写出，写完的行立即落盘
+        for row, (station_id, values) in enumerate(_rows(sheet_data), start=1):
+            sheet.write(row, 0, station_id, header)
+            for col, value in enumerate(values, start=1):
+                if not np.isnan(value):
+                    sheet.write_number(row, col, value, percent)
+                elif empty is not None:
+                    sheet.write_number(row, col, empty[0], empty_format)
+
+        if len(sheet_data) and len(sheet_data.columns):
+            for operator, threshold, color in rules["ranges"]:
+                sheet.conditional_format(1, 1, len(sheet_data), len(sheet_data.columns), {
+                    "type": "formula",
+                    "criteria": "=" + rule_formula(operator, threshold),
+                    "format": fills[color],
+                    "stop_if_true": True,
+                })
+    workbook.close()
+
+
+def _write_openpyxl(sheets, output_file, rules):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.styles import Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    def solid(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    bold = Font(bold=True)
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    empty = rules["empty"]
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, sheet_data in sheets.items():
+        sheet = workbook.create_sheet(sheet_name)
+
+        def header(value):
+            cell = WriteOnlyCell(sheet, value)
+            cell.font = bold
+            cell.border = border
+            return cell
+
+        def number(value):
+            if not np.isnan(value):
+                cell = WriteOnlyCell(sheet, float(value))
+            elif empty is not None:
+                cell = WriteOnlyCell(sheet, empty[0])
+                cell.fill = solid(empty[1])
+            else:
+                return None
+            cell.number_format = PERCENT_FORMAT
+            return cell
+
+        sheet.append([header(sheet_data.index.name or "")] + [header(str(label)) for label in sheet_data.columns])
+        for station_id, values in _rows(sheet_data):
+            sheet.append([header(station_id)] + [number(value) for value in values])
+
+        if len(sheet_data) and len(sheet_data.columns):
+            area = f"B2:{get_column_letter(len(sheet_data.columns) + 1)}{len(sheet_data) + 1}"
+            for operator, threshold, color in rules["ranges"]:
+                sheet.conditional_formatting.add(area, FormulaRule(
+                    formula=[rule_formula(operator, threshold)], fill=solid(color), stopIfTrue=True))
+    workbook.save(output_file)
+
+
+def write_report(sheets, output_file, rules=RATE_RULES, engine=None):
+    """
+    sheets 为 {工作表名: DataFrame(index=ID, columns=时间)}，值为 0~1 的非空率，NaN 表示无数据。
+    engine 为 "xlsxwriter" / "openpyxl"，缺省时优先 xlsxwriter。
+    """
+    check_columns(sheets)
+    engine = engine or ("xlsxwriter" if HAS_XLSXWRITER else "openpyxl")
+    if engine == "xlsxwriter":
+        _write_xlsxwriter(sheets, output_file, rules)
+    elif engine == "openpyxl":
+        _write_openpyxl(sheets, output_file, rules)
+    else:
+        raise ValueError(f"未知的写出引擎: {engine}")
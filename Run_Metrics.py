@@ -0,0 +1,287 @@
+import os
+import json
+import atexit
+import time
+import uuid
+import inspect
+import argparse
+import datetime
+import functools
+import threading
+
+"""
+运行指标采集：
+1、环境变量 RUN_METRICS=<文件路径> 启用，每个计时区间（阶段 + 场站）结束时向该文件追加一行 JSON：
+   耗时、行数、字节数、区间内进程内存（RSS）峰值和异常；子进程继承环境变量，同一次运行共用 run_id；
+2、未启用时 span() / current_span() 返回共享的空对象，@stage 直接调用原函数，不计时、不采样、不读取文件大小；
+3、RUN_PROFILE=cprofile|pyinstrument 时对 RUN_PROFILE_STAGES（逗号分隔，默认 run）中的阶段做性能剖析，
+   结果保存在指标文件旁的 profiles 文件夹；
+4、python Run_Metrics.py summary <指标文件> 按阶段汇总耗时、行数和内存峰值。
+"""
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+METRICS_FILE = os.getenv("RUN_METRICS", "")
+PROFILER = os.getenv("RUN_PROFILE", "")
+PROFILE_STAGES = set(filter(None, os.getenv("RUN_PROFILE_STAGES", "run").split(",")))
+SAMPLE_INTERVAL = float(os.getenv("RUN_METRICS_INTERVAL", "0.05"))
+
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+def metrics_enabled():
+    return bool(METRICS_FILE)
+
+
+def rss_bytes():
+    # 当前进程常驻内存；没有 psutil 时 Linux 读取 /proc，其余平台返回 None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _MemorySampler:
+    # 后台线程定期采样 RSS，更新所有进行中区间的峰值；fork 出的子进程重新启动线程
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = set()
+        self.pid = None
+
+    def start(self, span):
+        span.peak = rss_bytes()
+        if span.peak is None:
+            return
+        with self.lock:
+            self.active.add(span)
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True, name="run-metrics-sampler").start()
+
+    def stop(self, span):
+        with self.lock:
+            self.active.discard(span)
+        rss = rss_bytes()
+        if rss is not None and span.peak is not None:
+            span.peak = max(span.peak, rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                spans = list(self.active)
+            if not spans:
+                continue
+            rss = rss_bytes()
+            for span in spans:
+                span.peak = max(span.peak, rss)
+
+
+_sampler = _MemorySampler(SAMPLE_INTERVAL)
+
+
+def _write(record):
+    # 每条记录一次 write 追加，多进程同时写入时不会交错
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _write_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _start_profiler(stage):
+    if not PROFILER or stage not in PROFILE_STAGES:
+        return None
+    try:
+        if PROFILER == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except (ImportError, ValueError, RuntimeError) as e:
+        # 未安装 pyinstrument，或已有剖析器在运行（嵌套阶段）
+        print(f"阶段 {stage} 无法启动性能剖析: {e}")
+        return None
+    return profiler
+
+
+def _save_profile(profiler, record):
+    folder = os.path.join(os.path.dirname(os.path.abspath(METRICS_FILE)), "profiles")
+    os.makedirs(folder, exist_ok=True)
+    name = "-".join(str(part) for part in (record["stage"], record["station"], record["pid"], int(time.time() * 1000)) if part)
+    if PROFILER == "pyinstrument":
+        profiler.stop()
+        path = os.path.join(folder, f"{name}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = os.path.join(folder, f"{name}.prof")
+        profiler.dump_stats(path)
+    return path
+
+
+class Span:
+    def __init__(self, stage, station=None, **fields):
+        self.stage = stage
+        self.station = station
+        self.fields = fields
+        self.rows = 0
+        self.nbytes = 0
+        self.peak = None
+
+    def add(self, rows=0, nbytes=0):
+        self.rows += int(rows)
+        self.nbytes += int(nbytes)
+
+    def set(self, **fields):
+        # 附加到记录中的其他字段
+        self.fields.update(fields)
+
+    def add_file(self, *paths):
+        # 累加文件大小（读取或写出的字节数）
+        for path in paths:
+            if path and os.path.isfile(path):
+                self.nbytes += os.path.getsize(path)
+
+    def __enter__(self):
+        self.stack = getattr(_local, "spans", None)
+        if self.stack is None:
+            self.stack = _local.spans = []
+        self.stack.append(self)
+        self.started = datetime.datetime.now()
+        self.profiler = _start_profiler(self.stage)
+        _sampler.start(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.t0
+        _sampler.stop(self)
+        self.stack.remove(self)
+        record = {
+            "run_id": os.getenv("RUN_ID"),
+            "pid": os.getpid(),
+            "stage": self.stage,
+            "station": self.station,
+            "start": self.started.isoformat(timespec="milliseconds"),
+            "seconds": round(seconds, 6),
+            "rows": self.rows,
+            "bytes": self.nbytes,
+            "peak_rss_mb": round(self.peak / 2 ** 20, 1) if self.peak is not None else None,
+            "error": f"{exc_type.__name__}: {exc}" if exc_type is not None else None,
+            **self.fields,
+        }
+        if self.profiler is not None:
+            record["profile"] = _save_profile(self.profiler, record)
+        _write(record)
+        return False
+
+
+class _NoSpan:
+    # 未启用时的空区间，所有操作直接返回
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, rows=0, nbytes=0):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def add_file(self, *paths):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage, station=None, **fields):
+    if not METRICS_FILE:
+        return _NO_SPAN
+    return Span(stage, station, **fields)
+
+
+def current_span():
+    # 当前线程最内层的区间，供被调用的函数累加行数、字节数
+    spans = getattr(_local, "spans", None)
+    return spans[-1] if spans else _NO_SPAN
+
+
+def stage(name, station=None):
+    """
+    函数级计时装饰器：station 为参数名，其值记录为场站（文件名时去掉扩展名）。
+    未启用时直接调用原函数。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_FILE:
+                return func(*args, **kwargs)
+            label = None
+            if station is not None:
+                label = signature.bind_partial(*args, **kwargs).arguments.get(station)
+                label = os.path.splitext(os.path.basename(str(label)))[0] if label is not None else None
+            with Span(name, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_run(name):
+    """
+    入口脚本调用：生成 run_id（通过环境变量传给之后创建的子进程），开始顶层区间 run，进程退出时结束。
+    """
+    if not METRICS_FILE:
+        return _NO_SPAN
+    if not os.getenv("RUN_ID"):
+        os.environ["RUN_ID"] = f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    run_span = Span("run", name).__enter__()
+    atexit.register(run_span.__exit__, None, None, None)
+    return run_span
+
+
+def summarize(metrics_file, run_id=None):
+    # 按 运行 + 阶段 汇总；run_id 缺省时取最后一次运行
+    import pandas as pd
+    records = pd.read_json(metrics_file, lines=True)
+    if records.empty:
+        return records
+    run_id = run_id or records["run_id"].dropna().iloc[-1]
+    records = records[records["run_id"] == run_id]
+    return records.groupby("stage").agg(
+        count=("seconds", "size"),
+        seconds=("seconds", "sum"),
+        max_seconds=("seconds", "max"),
+        rows=("rows", "sum"),
+        mb=("bytes", lambda x: round(x.sum() / 2 ** 20, 1)),
+        peak_rss_mb=("peak_rss_mb", "max"),
+        errors=("error", "count"),
+    ).sort_values("seconds", ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="运行指标汇总")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="按阶段汇总一次运行的指标")
+    summary_parser.add_argument("metrics_file")
+    summary_parser.add_argument("--run-id", default=None, help="缺省时取最后一次运行")
+    args = parser.parse_args()
+
+    print(summarize(args.metrics_file, args.run_id).to_string())
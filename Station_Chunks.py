@@ -0,0 +1,32 @@
+import os
+
+"""
+场站分块处理：
+1、分块模式下每个场站按时间顺序逐块（默认 31 天 = 8928 行）完成补全时间序列、融合和非空率计数，内存占用只与块大小有关；
+2、块大小由 chunk_rows 参数或环境变量 STATION_CHUNK_ROWS 指定，<=0 时使用原有的整表读取；
+3、输入不是按时间有序时抛出 ChunkOrderError，调用方回退到整表处理，保证输出与整表模式一致。
+"""
+
+DEFAULT_CHUNK_ROWS = 31 * 288
+
+
+class ChunkOrderError(ValueError):
+    pass
+
+
+def default_chunk_rows():
+    return int(os.getenv("STATION_CHUNK_ROWS", 0))
+
+
+def resolve_chunk_rows(chunk_rows=None):
+    # None 取环境变量；返回 0 表示整表模式
+    chunk_rows = default_chunk_rows() if chunk_rows is None else chunk_rows
+    return max(int(chunk_rows), 0)
+
+
+def with_positions(chunks):
+    # 为每块附上其首行在整个文件中的行号
+    position = 0
+    for chunk in chunks:
+        yield position, chunk
+        position += len(chunk)
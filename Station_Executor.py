@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+场站级并行执行器：
+1、每个任务是一组参数，func(*args) 在进程池中执行，func 必须是模块级函数；
+2、结果按任务提交顺序返回 [(result, error), ...]，与串行运行的顺序完全一致；
+3、进程数由 workers 参数或环境变量 STATION_WORKERS 指定，<=1 时在当前进程串行执行。
+"""
+
+
+def default_workers():
+    return int(os.getenv("STATION_WORKERS", os.cpu_count() or 1))
+
+
+def _run_task(func, args):
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, e
+
+
+def run_stations(func, tasks, workers=None):
+    tasks = [args if isinstance(args, tuple) else (args,) for args in tasks]
+    workers = default_workers() if workers is None else workers
+
+    if workers <= 1 or len(tasks) <= 1:
+        return [_run_task(func, args) for args in tasks]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [pool.submit(_run_task, func, args) for args in tasks]
+        return [future.result() for future in futures]
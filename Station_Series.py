@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from Fusion_Engine import FUSION_RULES, fuse_metric
+from Time_Parse import parse_times
+
+"""
+固定 5 分钟网格上的场站时间序列：
+1、只保存起始时间和各列连续数组（数值列为 float32），不保存 Time 列和索引，内存约为 DataFrame 的一半以下；
+2、第 i 个值对应 start + i × 5 分钟，对齐、合并和融合都是偏移量计算和数组切片，不再做基于索引的哈希连接；
+3、数值转为 float32 后按最短表示写出的文本与原值不一致的列保留 float64，其余类型的列原样保存，
+   与现有 DataFrame / CSV 格式互相转换不丢失数据；
+4、valid_mask() / validity_bitmap() 给出各列的有效值位图。
+"""
+
+FREQ = np.timedelta64(5, "m")
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+
+
+def _float32_exact(values):
+    # 判断 float64 数组转为 float32 后，按 float32 最短表示写出的文本能否还原原值
+    values32 = values.astype(np.float32)
+    back = values32.astype(np.float64)
+    rest = ~((back == values) | np.isnan(values))
+    if not rest.any():
+        return True
+
+    # 有效数字不超过 6 位的十进制数在 float32 中可以唯一还原
+    x = values[rest]
+    if not np.isfinite(x).all():
+        return False
+    with np.errstate(divide="ignore"):
+        digits = 5 - np.floor(np.log10(np.abs(x))).astype(int)
+    scale = 10.0 ** np.abs(digits)
+    rounded = np.where(digits >= 0, np.round(x * scale) / scale, np.round(x / scale) * scale)
+    rest_x = x[rounded != x]
+    if not len(rest_x):
+        return True
+
+    # 其余值逐个按文本比较
+    return bool(np.array_equal(rest_x.astype(np.float32).astype(str).astype(np.float64), rest_x))
+
+
+def _compact(values):
+    values = np.asarray(values)
+    if values.dtype == np.float64 and _float32_exact(values):
+        return values.astype(np.float32)
+    return values
+
+
+def _padded(values, length, offset):
+    # 放到长度为 length 的网格中 offset 起的位置，其余位置为空值（整数列转 float64，布尔列转 object，与 pandas 补空一致）
+    dtype = values.dtype
+    if dtype.kind in "iu":
+        dtype = np.dtype(np.float64)
+    elif dtype.kind not in "fcmM":
+        dtype = np.dtype(object)
+    fill = np.datetime64("NaT") if dtype.kind in "mM" else np.nan
+    result = np.full(length, fill, dtype=dtype)
+    result[offset:offset + len(values)] = values
+    return result
+
+
+class StationSeries:
+    def __init__(self, start, columns, length=None, freq=FREQ):
+        self.start = pd.Timestamp(start)
+        self.freq = pd.Timedelta(freq)
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in self.columns.values()}
+        if length is not None:
+            lengths.add(length)
+        if len(lengths) > 1:
+            raise ValueError(f"各列长度不一致: {sorted(lengths)}")
+        self.length = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def end(self):
+        # 最后一个点之后的时间（不含）
+        return self.start + self.length * self.freq
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    @classmethod
+    def empty(cls, start, names, freq=FREQ):
+        return cls(start, {name: np.empty(0, dtype=np.float32) for name in names}, freq=freq)
+
+    def offsets(self, times):
+        # 时间对应的网格下标，以及是否正好落在网格点上
+        times = pd.DatetimeIndex(times)
+        delta = (times - self.start).asi8
+        valid = ~times.isna()
+        return np.where(valid, delta // self.freq.value, -1), valid & (delta % self.freq.value == 0)
+
+    @classmethod
+    def from_frame(cls, df, start=None, length=None, end=None, positional=False, freq=FREQ):
+        """
+        由 DataFrame 构造：
+        positional=True 时忽略时间，第 i 行对应 start + i × freq（Data_merge 的做法）；
+        否则按 Time 列（或 Time 索引）把每行放到对应网格点，不在网格上或超出 [start, start + length) 的行丢弃，
+        length 缺省时由 end（含）或最后一个时间决定，与 reindex(date_range(start, ...)) 的结果一致。
+        """
+        if df.index.name == "Time":
+            df = df.reset_index()
+        data = df.drop(columns=["Time"]) if "Time" in df.columns else df
+
+        if positional or "Time" not in df.columns:
+            start = GRID_START if start is None else start
+            return cls(start, {name: _compact(data[name].to_numpy()) for name in data.columns}, len(data), freq)
+
+        times = pd.Series(parse_times(df["Time"]))
+        if start is None:
+            start = times.min() if times.notna().any() else GRID_START
+        series = cls(start, {}, 0, freq)
+        offsets, on_grid = series.offsets(times)
+
+        if length is None:
+            last = times.max() if end is None else pd.Timestamp(end)
+            length = 0 if pd.isna(last) or last < series.start else (last - series.start) // series.freq + 1
+        keep = on_grid & (offsets >= 0) & (offsets < length)
+        positions = offsets[keep].astype(np.int64)
+        if len(np.unique(positions)) != len(positions):
+            raise ValueError("Time 列存在重复时间，无法对齐到网格")
+
+        columns = {}
+        for name in data.columns:
+            values = data[name].to_numpy()
+            column = _padded(values[:0], length, 0)
+            column[positions] = values[keep]
+            columns[name] = _compact(column)
+        return cls(series.start, columns, length, freq)
+
+    def time_index(self):
+        return pd.date_range(start=self.start, periods=self.length, freq=self.freq)
+
+    def to_frame(self, time_index=False):
+        df = pd.DataFrame(self.columns, copy=False)
+        if time_index:
+            df.index = self.time_index().rename("Time")
+        else:
+            df.insert(0, "Time", self.time_index())
+        return df
+
+    def reframe(self, start, length):
+        # 平移到新的网格范围 [start, start + length)，超出部分截断，缺少部分补空
+        shift = (self.start - pd.Timestamp(start)) // self.freq
+        if shift == 0 and length == self.length:
+            return self
+        lo = max(0, -shift)
+        hi = max(lo, min(self.length, length - shift))
+        columns = {name: _padded(values[lo:hi], length, shift + lo) for name, values in self.columns.items()}
+        return StationSeries(start, columns, length, self.freq)
+
+    def merge(self, other, suffixes=("_x", "_y")):
+        # 按网格并集外连接（空序列不影响范围），同名列按 pd.merge 的方式加后缀
+        if self.freq != other.freq:
+            raise ValueError("时间间隔不同的序列不能合并")
+        spans = [series for series in (self, other) if series.length] or [self]
+        start = min(series.start for series in spans)
+        length = (max(series.end for series in spans) - start) // self.freq
+        left, right = self.reframe(start, length), other.reframe(start, length)
+
+        overlap = set(left.columns) & set(right.columns)
+        columns = {}
+        for name, values in left.columns.items():
+            columns[name + suffixes[0] if name in overlap else name] = values
+        for name, values in right.columns.items():
+            columns[name + suffixes[1] if name in overlap else name] = values
+        return StationSeries(start, columns, length, self.freq)
+
+    def fuse(self, rules=None):
+        # 按规则表融合；来源全为 float32 时结果也保存为 float32（取值本就来自 float32，不损失精度）
+        rules = FUSION_RULES if rules is None else rules
+        frame = pd.DataFrame(self.columns, copy=False)
+        columns = dict(self.columns)
+        for target, rule in rules.items():
+            result = fuse_metric(frame, rule).to_numpy()
+            sources = [name for name in rule["priority"] if name in self.columns]
+            if result.dtype == np.float64 and sources and all(self.columns[name].dtype == np.float32 for name in sources):
+                result = result.astype(np.float32)
+            columns[target] = result
+            frame[target] = result
+        return StationSeries(self.start, columns, self.length, self.freq)
+
+    def valid_mask(self, name):
+        return ~pd.isna(self.columns[name])
+
+    def validity_bitmap(self, name):
+        # 每个点 1 bit 的有效值位图
+        return np.packbits(self.valid_mask(name))
@@ -0,0 +1,280 @@
+import os
+import argparse
+import hashlib
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # 仅 Parquet 后端需要 pyarrow
+    pa = pq = None
+
+"""
+场站数据存储层：DB、Nas、DB+Nas、Fusion 等文件夹统一通过 Storage 读写。
+1、CsvStorage：原有 CSV 格式，保留用于导出和兼容；
+2、ParquetStorage：列式存储，Time 以 datetime64 索引保存，数值列保存为 float32，读取时无需再解析文本；
+3、通过环境变量 STORAGE_BACKEND=csv|parquet 选择后端（默认 csv）；
+4、read_chunks() / chunk_writer() 按行分块读写，单个场站的内存占用只与块大小有关；
+5、CSV 可按数据行号切成字节块并记录摘要（row_blocks），文件重写后用 matching_blocks 找到第一个变化的块，read_from 只读取其后的行；
+6、python Storage.py convert <源文件夹> <目标文件夹> --to parquet 用于批量转换已有数据。
+"""
+
+# 按字节扫描文件时每次读取的大小
+READ_BLOCK_SIZE = 1 << 24
+
+
+def _time_column(df):
+    # Time 可能在列中，也可能是索引
+    if "Time" in df.columns:
+        return df
+    if df.index.name == "Time":
+        return df.reset_index()
+    return df
+
+
+def _block_digest(handle, offset, length, salt=""):
+    # 文件中一段字节的摘要，salt 为统计口径，口径变化时摘要随之变化
+    digest = hashlib.sha1(salt.encode("utf-8"))
+    handle.seek(offset)
+    while length > 0:
+        data = handle.read(min(length, READ_BLOCK_SIZE))
+        if not data:
+            break
+        digest.update(data)
+        length -= len(data)
+    return digest.hexdigest()
+
+
+def _reset_time(df):
+    # 只把 Time 索引还原为列；没有命名索引时（RangeIndex）保持不变，与 CSV 读取一致
+    return df.reset_index() if df.index.name == "Time" else df
+
+
+def _parquet_frame(df):
+    df = _time_column(df).copy()
+    df.columns = [str(col) for col in df.columns]
+
+    if "Time" in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df["Time"]):
+            df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
+        df = df.set_index("Time")
+
+    # 数值列统一压缩为 float32，无法整体转为数值的列保存为字符串
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        numeric = pd.to_numeric(values, errors="coerce")
+        if numeric.notna().sum() == values.notna().sum():
+            df[col] = numeric.astype("float32")
+        else:
+            df[col] = values.astype("string")
+    return df
+
+
+class CsvChunkWriter:
+    """
+    分块写入 CSV：首块写表头，之后的块追加；从未写入时不创建文件。
+    先写入 <文件>.tmp，with 块正常结束时替换目标文件；出现任何异常时删除临时文件，目标文件保持原样，不会留下不完整的输出。
+    """
+    def __init__(self, file_path, encoding=None):
+        self.file_path = file_path
+        self.temp_path = f"{file_path}.tmp"
+        self.encoding = encoding or "utf-8"
+        self.handle = None
+
+    def write(self, df):
+        header = self.handle is None
+        if header:
+            self.handle = open(self.temp_path, "w", encoding=self.encoding, newline="")
+        df.to_csv(self.handle, header=header, index="Time" not in df.columns)
+
+    def close(self, completed=True):
+        if self.handle is None:
+            return
+        self.handle.close()
+        self.handle = None
+        if completed:
+            os.replace(self.temp_path, self.file_path)
+        elif os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(completed=exc_type is None)
+
+
+class ParquetChunkWriter(CsvChunkWriter):
+    # 每块写成一个 row group，列类型以首块为准
+    def __init__(self, file_path, encoding=None):
+        super().__init__(file_path, encoding)
+        self.schema = None
+
+    def write(self, df):
+        df = _parquet_frame(df)
+        if self.handle is None:
+            table = pa.Table.from_pandas(df)
+            self.schema = table.schema
+            self.handle = pq.ParquetWriter(self.temp_path, self.schema, compression="zstd")
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema)
+        self.handle.write_table(table)
+
+
+class CsvStorage:
+    name = "csv"
+    suffix = ".csv"
+    chunk_writer_class = CsvChunkWriter
+
+    def path(self, folder, station_id):
+        return os.path.join(folder, f"{station_id}{self.suffix}")
+
+    def list_stations(self, folder):
+        return {os.path.splitext(f)[0]: os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(self.suffix)}
+
+    def read(self, file_path, time_index=False, columns=None):
+        # columns 为只读取的数据列（不含 Time）
+        if time_index:
+            usecols = ["Time"] + list(columns) if columns is not None else None
+            return pd.read_csv(file_path, index_col="Time", parse_dates=True, usecols=usecols)
+        return pd.read_csv(file_path, low_memory=False, usecols=columns)
+
+    def read_columns(self, file_path):
+        return list(pd.read_csv(file_path, nrows=0).columns)
+
+    def read_chunks(self, file_path, chunk_rows, time_index=False):
+        if time_index:
+            return pd.read_csv(file_path, index_col="Time", parse_dates=True, chunksize=chunk_rows)
+        return pd.read_csv(file_path, low_memory=False, chunksize=chunk_rows)
+
+    def row_blocks(self, file_path, rows, salt=""):
+        """
+        按数据行号 rows（升序，首个为 0）把文件切成字节块，返回每块的 [偏移, 长度, 摘要]，首块包含表头，末块到文件结尾。
+        按换行符定位行首，假定字段内没有换行（各文件夹的 CSV 均由 pandas 写出的数值和时间）；行数不足时返回 None。
+        """
+        targets = np.asarray(rows[1:], dtype=np.int64)
+        offsets = np.zeros(len(targets), dtype=np.int64)
+        found = 0
+        seen = 0
+        position = 0
+        with open(file_path, "rb") as handle:
+            # 第 r 个数据行从第 r 个换行符（表头行末为第 0 个）之后开始
+            while found < len(targets):
+                data = handle.read(READ_BLOCK_SIZE)
+                if not data:
+                    return None
+                newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+                end = np.searchsorted(targets, seen + len(newlines), side="left")
+                offsets[found:end] = newlines[targets[found:end] - seen] + position + 1
+                found = end
+                seen += len(newlines)
+                position += len(data)
+
+            size = os.fstat(handle.fileno()).st_size
+            starts = np.r_[0, offsets]
+            lengths = np.diff(np.r_[starts, size])
+            return [[int(offset), int(length), _block_digest(handle, offset, length, salt)]
+                    for offset, length in zip(starts, lengths)]
+
+    def matching_blocks(self, file_path, blocks, salt=""):
+        # 从文件开头起与 row_blocks 记录一致的块数，即第一个变化块的下标
+        with open(file_path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            for i, (offset, length, digest) in enumerate(blocks):
+                if offset + length > size or _block_digest(handle, offset, length, salt) != digest:
+                    return i
+        return len(blocks)
+
+    def read_from(self, file_path, offset, columns, chunk_rows=None, usecols=None):
+        # 从行首偏移 offset 读取其后的所有数据行（表头由 columns 给出），chunk_rows 为 None 时整段作为一块
+        with open(file_path, "rb") as handle:
+            handle.seek(offset)
+            if not handle.read(1):
+                return
+            handle.seek(offset)
+            if not chunk_rows:
+                yield pd.read_csv(handle, header=None, names=columns, usecols=usecols, low_memory=False)
+                return
+            yield from pd.read_csv(handle, header=None, names=columns, usecols=usecols, low_memory=False,
+                                   chunksize=chunk_rows)
+
+    def write(self, df, folder, station_id, encoding=None):
+        file_path = self.path(folder, station_id)
+        df.to_csv(file_path, index="Time" not in df.columns, encoding=encoding)
+        return file_path
+
+    def chunk_writer(self, folder, station_id, encoding=None):
+        return self.chunk_writer_class(self.path(folder, station_id), encoding)
+
+
+class ParquetStorage(CsvStorage):
+    name = "parquet"
+    suffix = ".parquet"
+    chunk_writer_class = ParquetChunkWriter
+
+    def read(self, file_path, time_index=False, columns=None):
+        df = pd.read_parquet(file_path, columns=columns)
+        return df if time_index else _reset_time(df)
+
+    def read_columns(self, file_path):
+        # 与 read() 一致：Time 等索引列在前，其余列按保存顺序
+        schema = pq.read_schema(file_path)
+        index_columns = [col for col in (schema.pandas_metadata or {}).get("index_columns", []) if isinstance(col, str)]
+        return index_columns + [name for name in schema.names if name not in index_columns]
+
+    def read_chunks(self, file_path, chunk_rows, time_index=False):
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+            df = pa.Table.from_batches([batch]).to_pandas()
+            yield df if time_index else _reset_time(df)
+
+    def row_blocks(self, file_path, rows, salt=""):
+        # Parquet 压缩后的字节与行不对应，不支持按块增量读取
+        return None
+
+    def matching_blocks(self, file_path, blocks, salt=""):
+        return 0
+
+    def write(self, df, folder, station_id, encoding=None):
+        file_path = self.path(folder, station_id)
+        _parquet_frame(df).to_parquet(file_path, compression="zstd")
+        return file_path
+
+
+STORAGE_BACKENDS = {
+    "csv": CsvStorage,
+    "parquet": ParquetStorage,
+}
+
+
+def get_storage(backend=None):
+    backend = backend or os.getenv("STORAGE_BACKEND", "csv")
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的存储格式: {backend}，可选 {list(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend]()
+
+
+def convert_folder(source_folder, target_folder, source_backend, target_backend):
+    # 在两种存储格式之间批量转换（例如将 Parquet 导出为 CSV）
+    source = get_storage(source_backend)
+    target = get_storage(target_backend)
+    os.makedirs(target_folder, exist_ok=True)
+    for station_id, file_path in source.list_stations(source_folder).items():
+        target.write(source.read(file_path), target_folder, station_id)
+        print(f"文件 {station_id} 已转换为 {target.name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="场站数据存储格式转换")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="在 CSV 与 Parquet 之间转换整个文件夹")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("target")
+    convert_parser.add_argument("--from", dest="source_backend", default="csv", choices=list(STORAGE_BACKENDS))
+    convert_parser.add_argument("--to", dest="target_backend", default="parquet", choices=list(STORAGE_BACKENDS))
+    args = parser.parse_args()
+
+    convert_folder(args.source, args.target, args.source_backend, args.target_backend)
@@ -0,0 +1,167 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from DB_Data import POINT_COLUMNS
+from Storage import get_storage
+
+"""
+合成场站数据（基准测试和本地验证用，不依赖 Nas 共享目录和 MongoDB）：
+1、station_frame：5 分钟网格上的功率 / 辐照度曲线（白天有值、夜间为 0），按缺失率挖去连续缺口，按重复率插入重复时间戳；
+2、DB 下载文件（DB_Download 格式 CSV）、Nas 月度工作簿（表头写法混杂、带无关列、缺口处无行）、
+   MongoDB rtLoad 风格文档（ybDate + point1..point288）及 station_info.xlsx；
+3、generate() 把参数写入 params.json，参数相同的数据集直接复用，不同版本的基准测试使用完全相同的输入；
+4、python Synthetic_Data.py <输出文件夹> --stations 5 --years 1 --gap-rate 0.05 --dup-rate 0.01。
+"""
+
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+# 表头写法取自 Column_Alias 已收录的实际变体
+POWER_HEADERS = ["Power(MW)", "Power（MW）", "POWER(mv)", "总有功", " power (mw) "]
+RADIATION_HEADERS = ["Radiation(w/m2)", "RADIATION(W/M2)", "Gerneral_Radiation", "XQ2", "radiation"]
+TIME_HEADERS = ["Time", "TIME", "时间.1", " time "]
+
+# DB 下载文件与 DB_Data 使用相同的存储格式（STORAGE_BACKEND）
+storage = get_storage()
+
+
+def station_ids(stations):
+    # 场站编号同时用作 NwpId、DB 文件名和 Nas 前缀中的编号（NARI-<编号>-Synth）
+    return [str(1000 + i) for i in range(stations)]
+
+
+def nas_prefix(station_id):
+    return f"NARI-{station_id}-Synth"
+
+
+def gap_mask(n, gap_rate, mean_gap=12, rng=None):
+    # 缺失位置：按几何分布长度（平均 mean_gap 个点）的连续缺口，总体约占 gap_rate
+    rng = rng or np.random.default_rng()
+    mask = np.zeros(n + 1, dtype=np.int64)
+    gaps = int(n * gap_rate / mean_gap)
+    if gaps:
+        starts = rng.integers(0, n, gaps)
+        ends = np.minimum(starts + rng.geometric(1 / mean_gap, gaps), n)
+        np.add.at(mask, starts, 1)
+        np.add.at(mask, ends, -1)
+    return np.cumsum(mask[:-1]) > 0
+
+
+def station_frame(years=1.0, gap_rate=0.05, dup_rate=0.01, seed=0, start=GRID_START):
+    """
+    返回 (Time, Power, Radiation)：缺口处的行已删除，重复时间戳的行附加在末尾后按时间稳定排序（值略有不同）。
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start=start, periods=int(years * 365 * 288), freq="5min")
+    n = len(times)
+
+    # 日照曲线：6 点到 18 点为正弦，叠加逐日天气系数和噪声
+    hour = (times.hour + times.minute / 60).to_numpy()
+    daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+    weather = np.repeat(rng.uniform(0.3, 1.0, n // 288 + 1), 288)[:n]
+    radiation = np.round(daylight * weather * 1000 * rng.uniform(0.95, 1.05, n), 2)
+    power = np.round(radiation / 1000 * 50 * rng.uniform(0.9, 1.0, n), 3)
+
+    frame = pd.DataFrame({"Time": times, "Power": power, "Radiation": radiation})
+    frame = frame[~gap_mask(n, gap_rate, rng=rng)]
+
+    duplicates = frame.sample(frac=dup_rate, random_state=seed)
+    duplicates = duplicates.assign(Power=np.round(duplicates["Power"] * 1.01, 3))
+    return pd.concat([frame, duplicates]).sort_values("Time", kind="stable").reset_index(drop=True)
+
+
+def write_db_file(frame, folder, station_id):
+    # DB_Download 格式（同 download_station）：Time 索引 + Power_DB / Radiation_DB
+    df = frame.rename(columns={"Power": "Power_DB", "Radiation": "Radiation_DB"}).set_index("Time")
+    return storage.write(df, folder, station_id, encoding="utf-8")
+
+
+def write_nas_workbooks(frame, folder, station_id, seed=0):
+    # 每月一个功率工作簿和一个辐照度工作簿，表头、时间列写法按月轮换，附带无关列
+    rng = np.random.default_rng(seed)
+    prefix = nas_prefix(station_id)
+    engine = "xlsxwriter" if _has_xlsxwriter() else "openpyxl"
+    paths = []
+    for month, data in frame.groupby(frame["Time"].dt.to_period("M")):
+        k = month.month + int(station_id)
+        for data_type, column, headers in [("Power", "Power", POWER_HEADERS), ("Radiation", "Radiation", RADIATION_HEADERS)]:
+            sheet = pd.DataFrame({
+                TIME_HEADERS[k % len(TIME_HEADERS)]: data["Time"].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(),
+                headers[k % len(headers)]: data[column].to_numpy(),
+                "备注": "",
+                "状态": rng.integers(0, 2, len(data)),
+            })
+            station_folder = os.path.join(folder, prefix, data_type)
+            os.makedirs(station_folder, exist_ok=True)
+            path = os.path.join(station_folder, f"{prefix}_{data_type}_{month.strftime('%Y%m')}.xlsx")
+            sheet.to_excel(path, index=False, engine=engine)
+            paths.append(path)
+    return paths
+
+
+def point_documents(frame, station_id, column="Power"):
+    # MongoDB rtLoad 风格：每天一条文档，point1..point288；缺口为 NaN，重复时间取最后一个值
+    series = frame.drop_duplicates("Time", keep="last").set_index("Time")[column]
+    days = pd.date_range(series.index.min().normalize(), series.index.max().normalize(), freq="D")
+    grid = pd.date_range(days[0], periods=len(days) * 288, freq="5min")
+    values = series.reindex(grid).to_numpy(dtype=float).reshape(len(days), 288)
+    df = pd.DataFrame(values, columns=POINT_COLUMNS)
+    # _format_dataframe 按 ybDate 次日零点计算时间，ybDate 取数据日期的前一天
+    df.insert(0, "ybDate", days - pd.Timedelta(days=1))
+    df.insert(0, "stationId", station_id)
+    return df
+
+
+def _has_xlsxwriter():
+    try:
+        import xlsxwriter  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def generate(folder, stations=5, years=1.0, gap_rate=0.05, dup_rate=0.01, seed=0):
+    """
+    生成整套数据：<folder>/DB_Download、<folder>/nasroot、<folder>/mongo/<编号>.pkl、<folder>/station_info.xlsx。
+    params.json 与参数一致时直接返回已有数据。
+    """
+    params = {"stations": stations, "years": years, "gap_rate": gap_rate, "dup_rate": dup_rate, "seed": seed}
+    params_file = os.path.join(folder, "params.json")
+    if os.path.exists(params_file):
+        with open(params_file, encoding="utf-8") as f:
+            if json.load(f) == params:
+                return params
+
+    db_folder = os.path.join(folder, "DB_Download")
+    nas_root = os.path.join(folder, "nasroot")
+    mongo_folder = os.path.join(folder, "mongo")
+    for path in (db_folder, nas_root, mongo_folder):
+        os.makedirs(path, exist_ok=True)
+
+    info = []
+    for i, station_id in enumerate(station_ids(stations)):
+        frame = station_frame(years, gap_rate, dup_rate, seed=seed + i)
+        write_db_file(frame, db_folder, station_id)
+        write_nas_workbooks(frame, nas_root, station_id, seed=seed + i)
+        point_documents(frame, station_id).to_pickle(os.path.join(mongo_folder, f"{station_id}.pkl"))
+        info.append({"NwpId": station_id, "天气预报前缀": nas_prefix(station_id)})
+        print(f"场站 {station_id}：{len(frame)} 行")
+    pd.DataFrame(info).to_excel(os.path.join(folder, "station_info.xlsx"), index=False)
+
+    with open(params_file, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成场站数据")
+    parser.add_argument("folder")
+    parser.add_argument("--stations", type=int, default=5)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--gap-rate", type=float, default=0.05, help="缺失点比例（连续缺口）")
+    parser.add_argument("--dup-rate", type=float, default=0.01, help="重复时间戳比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.folder, args.stations, args.years, args.gap_rate, args.dup_rate, args.seed)
+    print(f"合成数据已保存至 {args.folder}")
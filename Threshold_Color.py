@@ -0,0 +1,273 @@
+import os
+import json
+import argparse
+import operator
+from copy import copy
+import xml.etree.ElementTree as ET
+import openpyxl
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.formatting import ConditionalFormatting
+from openpyxl.styles import NamedStyle, PatternFill
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter, range_boundaries
+from openpyxl.worksheet.dimensions import ColumnDimension, RowDimension, SheetFormatProperties
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from Station_Executor import run_stations
+from Report_Writer import FULL_NAN_RULES, PERCENT_FORMAT, RATE_RULES, RED_GREEN_RULES
+
+"""
+按阈值着色引擎（Red_Green.py / Full_Nan.py 的通用实现）：
+1、规则与 Report_Writer 相同：ranges 为 (比较符, 阈值, 颜色)，阈值为 0~1 的比例，按顺序第一条满足的生效；
+   empty 为 (占位值, 颜色)，None 时空值不处理；规则可用 JSON 文件声明；
+2、只读模式逐行读取、只写模式逐行写出，内存与工作簿大小无关；"95.3%" 文本转为百分比格式的数值，
+   未命中规则的单元格保留原有样式；源工作表的列宽、行高、冻结窗格、合并单元格、筛选和条件格式原样保留，
+   合并区域中被合并的单元格不着色；数据验证、批注、超链接和打印设置不保留；
+3、多个工作簿按进程并行处理，可调用 color_workbook / color_workbooks，也可通过命令行使用。
+"""
+
+COLOR_RULES = {"red_green": RED_GREEN_RULES, "full_nan": FULL_NAN_RULES, "rate": RATE_RULES}
+
+# 复制的行列属性，样式编号（s / style）属于源工作簿，不复制
+ROW_ATTRS = ("ht", "customHeight", "hidden", "outlineLevel", "collapsed", "thickBot", "thickTop")
+COLUMN_ATTRS = ("min", "max", "width", "customWidth", "hidden", "bestFit", "outlineLevel", "collapsed")
+# 只读模式下工作表 XML 和差异样式只能通过 openpyxl 的内部属性读取（_sheet_layout），只支持已验证的版本
+OPENPYXL_SERIES = "3.1."
+
+# 从源单元格复制的样式
+STYLE_ATTRS = ("font", "fill", "border", "alignment", "number_format", "protection")
+STYLE_PREFIX = "着色 "
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def load_rules(rules_file):
+    # {"ranges": [["<", 0.6, "FFCCCC"], ...], "empty": [0, "FFCCCC"] 或 null}
+    with open(rules_file, encoding="utf-8") as f:
+        config = json.load(f)
+    ranges = [tuple(rule) for rule in config.get("ranges", [])]
+    for op, _, _ in ranges:
+        if op not in OPERATORS:
+            raise ValueError(f"未知的比较符: {op}，可选 {list(OPERATORS)}")
+    empty = config.get("empty")
+    return {"ranges": ranges, "empty": tuple(empty) if empty is not None else None}
+
+
+def cell_rate(value, number_format="General"):
+    # 单元格对应的比例：百分号文本和百分比格式的数值直接换算，其余数值按百分数处理（与原脚本一致）
+    if isinstance(value, str):
+        return round(float(value.strip().rstrip('%')) / 100, 10)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(value)
+    return float(value) if number_format.endswith('%') else round(value / 100, 10)
+
+
+def match_color(rate, rules):
+    for op, threshold, color in rules["ranges"]:
+        if OPERATORS[op](rate, threshold):
+            return color
+    return None
+
+
+class _SheetWriter:
+    """
+    写出单元格并套用样式。每种 (源单元格的 style_array, 填充色, 数字格式) 只组装一次，注册为工作簿的命名样式后按名称套用；
+    逐格给 font / fill 等赋值时 openpyxl 会对样式对象逐个哈希比较，是流式着色的主要耗时。
+    """
+
+    def __init__(self, sheet, rules):
+        self.sheet = sheet
+        self.rules = rules
+        self.styles = {}
+
+    def cell(self, source, value=None, color=None, number_format=None):
+        has_style = getattr(source, "has_style", False)  # 只读模式下行内的空位为 EmptyCell，没有样式
+        cell = WriteOnlyCell(self.sheet, source.value if value is None else value)
+        key = (source.style_array if has_style else None, color, number_format)
+        name = self.styles.get(key)
+        if name is None:
+            name = f"{STYLE_PREFIX}{self.sheet.title} {len(self.styles) + 1}"
+            # 没有样式的源单元格沿用工作簿默认字体和边框，与 NamedStyle 自身的默认值不同
+            style = NamedStyle(name, font=copy(DEFAULT_FONT), border=copy(DEFAULT_BORDER))
+            if has_style:
+                for attr in STYLE_ATTRS:
+                    setattr(style, attr, getattr(source, attr))
+            if color is not None:
+                style.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            if number_format is not None:
+                style.number_format = number_format
+            self.sheet.parent.add_named_style(style)
+            self.styles[key] = name
+        cell.style = name
+        return cell
+
+    def colored(self, source):
+        if not self.rules["ranges"] and source.value is not None:
+            # 只处理空值的规则（如 FULL_NAN_RULES）不改动有值的单元格
+            return self.cell(source)
+        if source.value is None:
+            if self.rules["empty"] is None:
+                return self.cell(source)
+            placeholder, color = self.rules["empty"]
+            return self.cell(source, placeholder, color, PERCENT_FORMAT)
+
+        try:
+            rate = cell_rate(source.value, source.number_format)
+        except (TypeError, ValueError):
+            print(f"单元格值无法处理：{source.value}，跳过")
+            return self.cell(source)
+
+        color = match_color(rate, self.rules)
+        if isinstance(source.value, str):
+            return self.cell(source, rate, color, PERCENT_FORMAT)
+        return self.cell(source, color=color)
+
+
+def _sheet_layout(workbook, sheet):
+    # 只读模式不解析列宽、行高、冻结窗格、合并单元格、筛选和条件格式，单独流式扫描工作表 XML 读取
+    if not openpyxl.__version__.startswith(OPENPYXL_SERIES):
+        raise RuntimeError(f"阈值着色需要 openpyxl {OPENPYXL_SERIES}x（pip install \"openpyxl>=3.1,<3.2\"），当前为 {openpyxl.__version__}")
+    tags = {f"{{{SHEET_MAIN_NS}}}{name}": name for name in
+            ("row", "col", "pane", "sheetFormatPr", "mergeCell", "autoFilter", "conditionalFormatting")}
+    layout = {"format": None, "columns": [], "rows": {}, "freeze": None, "merged": [], "auto_filter": None, "conditional": []}
+    row_index = 0
+    with workbook._archive.open(sheet._worksheet_path) as f:
+        for _, element in ET.iterparse(f):
+            tag = tags.get(element.tag)
+            if tag == "row":
+                # 只记录有行高、隐藏、分级等属性的行
+                row_index = int(element.get("r", row_index + 1))
+                attrs = {key: element.get(key) for key in ROW_ATTRS if element.get(key) is not None}
+                if attrs:
+                    layout["rows"][row_index] = attrs
+                element.clear()
+            elif tag == "col":
+                layout["columns"].append({key: element.get(key) for key in COLUMN_ATTRS if element.get(key) is not None})
+            elif tag == "pane":
+                if element.get("state") in ("frozen", "frozenSplit"):
+                    layout["freeze"] = element.get("topLeftCell")
+            elif tag == "sheetFormatPr":
+                layout["format"] = SheetFormatProperties.from_tree(element)
+            elif tag == "mergeCell":
+                layout["merged"].append(element.get("ref"))
+            elif tag == "autoFilter":
+                layout["auto_filter"] = AutoFilter.from_tree(element)
+            elif tag == "conditionalFormatting":
+                cf = ConditionalFormatting.from_tree(element)
+                for rule in cf.rules:
+                    if rule.dxfId is not None:
+                        rule.dxf = workbook._differential_styles[rule.dxfId]
+                layout["conditional"].append(cf)
+    return layout
+
+
+def _apply_layout(target_sheet, layout):
+    # 列宽、行高和冻结窗格须在写出第一行之前设置，其余在保存时写出
+    if layout["format"] is not None:
+        target_sheet.sheet_format = layout["format"]
+    for attrs in layout["columns"]:
+        letter = get_column_letter(int(attrs["min"]))
+        target_sheet.column_dimensions[letter] = ColumnDimension(target_sheet, index=letter, **attrs)
+    for row_index, attrs in layout["rows"].items():
+        target_sheet.row_dimensions[row_index] = RowDimension(target_sheet, index=row_index, **attrs)
+    if layout["freeze"]:
+        target_sheet.freeze_panes = layout["freeze"]
+    for ref in layout["merged"]:
+        target_sheet.merged_cells.add(ref)
+    if layout["auto_filter"] is not None:
+        target_sheet.auto_filter = layout["auto_filter"]
+    for cf in layout["conditional"]:
+        for rule in cf.rules:
+            target_sheet.conditional_formatting.add(str(cf.sqref), rule)
+
+
+def _merged_cells(layout):
+    # 合并区域中除左上角以外的单元格坐标
+    cells = set()
+    for ref in layout["merged"]:
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        cells.update((r, c) for r in range(min_row, max_row + 1) for c in range(min_col, max_col + 1))
+        cells.discard((min_row, min_col))
+    return cells
+
+
+def color_workbook(input_file, output_file, rules, header_rows=1, header_cols=1):
+    """
+    按规则为工作簿所有工作表的数据区（跳过前 header_rows 行和前 header_cols 列）着色，写出到 output_file。
+    output_file 可以与 input_file 相同。返回处理的工作表名。
+    """
+    source = load_workbook(input_file, read_only=True)
+    target = Workbook(write_only=True)
+    try:
+        for source_sheet in source.worksheets:
+            print(f"正在处理工作表：{source_sheet.title}")
+            target_sheet = target.create_sheet(source_sheet.title)
+            layout = _sheet_layout(source, source_sheet)
+            _apply_layout(target_sheet, layout)
+            merged = _merged_cells(layout)
+            writer = _SheetWriter(target_sheet, rules)
+            for r, row in enumerate(source_sheet.iter_rows(), start=1):
+                target_sheet.append([
+                    writer.cell(cell) if r <= header_rows or c <= header_cols or (r, c) in merged else writer.colored(cell)
+                    for c, cell in enumerate(row, start=1)
+                ])
+
+        # 先写临时文件，输出覆盖输入时不影响读取
+        temp_file = f"{output_file}.tmp"
+        target.save(temp_file)
+    finally:
+        source.close()
+    os.replace(temp_file, output_file)
+    return source.sheetnames
+
+
+def color_workbooks(pairs, rules, workers=None, header_rows=1, header_cols=1):
+    # pairs 为 [(输入文件, 输出文件), ...]，按工作簿并行，结果按顺序返回 [(工作表名, 错误), ...]
+    tasks = [(input_file, output_file, rules, header_rows, header_cols) for input_file, output_file in pairs]
+    return run_stations(color_workbook, tasks, workers)
+
+
+def output_path(input_file, output=None, output_folder=None):
+    if output:
+        return output
+    if output_folder:
+        return os.path.join(output_folder, os.path.basename(input_file))
+    root, ext = os.path.splitext(input_file)
+    return f"{root}_colored{ext}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按阈值为非空率工作簿着色（保留列宽、行高、冻结窗格、合并单元格、筛选和条件格式，"
+                                                 "不保留数据验证、批注、超链接和打印设置）")
+    parser.add_argument("inputs", nargs="+", help="输入工作簿")
+    parser.add_argument("--output", help="输出工作簿（仅一个输入时），默认 <输入>_colored.xlsx")
+    parser.add_argument("--output-folder", help="输出文件夹（多个输入时），文件名与输入相同")
+    parser.add_argument("--rules", default="red_green", choices=list(COLOR_RULES),
+                        help="内置规则：red_green 标红 < 60%% 标绿 >= 90%% 空值 0%% 标红；full_nan 仅空值 0%% 标红；rate 标红 < 80%% 标绿 100%%")
+    parser.add_argument("--rules-file", help="JSON 规则文件，优先于 --rules")
+    parser.add_argument("--header-rows", type=int, default=1)
+    parser.add_argument("--header-cols", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认取 STATION_WORKERS 或 CPU 核数")
+    args = parser.parse_args()
+
+    if args.output and len(args.inputs) > 1:
+        parser.error("多个输入时请使用 --output-folder")
+    if args.output_folder:
+        os.makedirs(args.output_folder, exist_ok=True)
+
+    rules = load_rules(args.rules_file) if args.rules_file else COLOR_RULES[args.rules]
+    pairs = [(input_file, output_path(input_file, args.output, args.output_folder)) for input_file in args.inputs]
+    for (input_file, output_file), (_, error) in zip(pairs, color_workbooks(pairs, rules, args.workers, args.header_rows, args.header_cols)):
+        if error is not None:
+            print(f"文件处理失败: {input_file}，{error}")
+        else:
+            print(f"处理完成，结果保存为：{output_file}")
@@ -0,0 +1,171 @@
+import os
+import zlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+"""
+时间列解析：
+1、每列从样本（首尾和均匀抽取的非空值，默认 256 个）推断一次格式，按显式格式整列解析，
+   不再先试 "%Y-%m-%d %H:%M:%S.%f" 失败后退回 format='mixed'，也不再无格式解析；
+   与推断格式不符的个别行单独按 mixed 解析，无法解析的为 NaT；
+2、解析结果为等间隔序列（如 5 分钟网格）时只记录 起点、间隔、行数，读取缓存时按算术重新生成；
+3、环境变量 TIME_PARSE_CACHE=<SQLite 文件> 启用缓存：每个 源文件路径 + 列名 一行，同时记录文件指纹（大小、修改时间），
+   文件未变化时直接取缓存，后续运行和其他阶段不再解析同一列；文件变化后重新解析并覆盖该行，缓存大小与文件数成正比；
+   子进程继承环境变量，共用同一个缓存文件。
+"""
+
+SAMPLE_ROWS = 256
+
+# 样本中推断不出统一格式时依次尝试的格式
+FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y-%m-%d",
+    "ISO8601",
+]
+
+_connection = {}
+
+
+def _sample(values, sample_rows=SAMPLE_ROWS):
+    # 首尾各一段和中间均匀抽取的值，去掉其中的空值
+    if len(values) > sample_rows:
+        quarter = sample_rows // 4
+        middle = np.linspace(quarter, len(values) - quarter - 1, sample_rows - 2 * quarter).astype(np.int64)
+        values = np.concatenate([values[:quarter], values[middle], values[-quarter:]])
+    return values[pd.notna(values)]
+
+
+def infer_format(values, sample_rows=SAMPLE_ROWS):
+    """
+    返回样本全部能解析的第一个格式：样本中 guess_datetime_format 的结果（按出现次数）优先，然后是 FORMATS；
+    样本不是字符串（已是时间或 Excel 日期单元格）或没有统一格式时返回 None。
+    """
+    sample = _sample(np.asarray(values, dtype=object), sample_rows)
+    if not len(sample) or not all(isinstance(value, str) for value in sample):
+        return None
+    sample = pd.Series(sample)
+    guesses = pd.Series([guess_datetime_format(value) for value in sample[:16]]).value_counts().index
+    for fmt in list(guesses) + [fmt for fmt in FORMATS if fmt not in guesses]:
+        if not fmt:
+            continue
+        try:
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _parse(values, fmt):
+    if values.dtype != object:
+        # 数值等非文本列与 pd.to_datetime 默认行为一致
+        return pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    if fmt is None:
+        # 单元格已是时间（Excel 日期）或样本中没有统一格式
+        return pd.to_datetime(values, format="mixed", errors="coerce").to_numpy(dtype="datetime64[ns]")
+    times = pd.to_datetime(values, format=fmt, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    # 与推断格式不符的行逐个按 mixed 解析
+    rest = np.isnat(times)
+    if rest.any() and (rest := rest & pd.notna(values).to_numpy()).any():
+        times[rest] = pd.to_datetime(values[rest], format="mixed", errors="coerce").to_numpy(dtype="datetime64[ns]")
+    return times
+
+
+def regular_step(times):
+    # 无 NaT 且间隔相同、为正时返回间隔（纳秒），否则返回 None
+    ticks = times.view(np.int64)
+    if len(ticks) < 2 or np.isnat(times).any():
+        return None
+    step = ticks[1] - ticks[0]
+    if step <= 0 or not (np.diff(ticks) == step).all():
+        return None
+    return int(step)
+
+
+def _key(source, column):
+    # (路径, 列名, 文件指纹)
+    stat = os.stat(source)
+    return os.path.abspath(source), column, f"{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _cache():
+    # 每个进程按需打开 TIME_PARSE_CACHE 指定的缓存，未设置时返回 None
+    path = os.getenv("TIME_PARSE_CACHE", "")
+    if not path:
+        return None
+    key = (os.getpid(), path)
+    if key not in _connection:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=60)
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS time_columns (
+                path TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                fmt TEXT,
+                rows INTEGER NOT NULL,
+                start INTEGER,
+                step INTEGER,
+                ticks BLOB,
+                PRIMARY KEY (path, column_name)
+            );
+            """
+        )
+        conn.commit()
+        _connection[key] = conn
+    return _connection[key]
+
+
+def _load(conn, key, rows):
+    path, column, fingerprint = key
+    row = conn.execute("SELECT fingerprint, rows, start, step, ticks FROM time_columns WHERE path = ? AND column_name = ?",
+                       (path, column)).fetchone()
+    if row is None or row[0] != fingerprint or row[1] != rows:
+        return None
+    _, _, start, step, ticks = row
+    if step is not None:
+        # 等间隔：按起点和间隔重新生成
+        return (start + step * np.arange(rows, dtype=np.int64)).view("datetime64[ns]")
+    return np.cumsum(np.frombuffer(zlib.decompress(ticks), dtype=np.int64)).view("datetime64[ns]")
+
+
+def _store(conn, key, fmt, times):
+    step = regular_step(times)
+    start = int(times[0].view(np.int64)) if step is not None else None
+    # 不等间隔时按相邻差值压缩保存（差值大多相同）
+    ticks = None if step is not None else zlib.compress(np.diff(times.view(np.int64), prepend=0).tobytes())
+    with conn:
+        # 同一文件、同一列只保留最新一行
+        conn.execute("INSERT OR REPLACE INTO time_columns VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (*key, fmt, len(times), start, step, ticks))
+
+
+def parse_times(values, source=None, column="Time", fmt=None):
+    """
+    解析时间列，返回 datetime64[ns] 数组（与输入等长、按位置对应）。
+    source 为该列所在文件的路径：启用缓存时按文件路径 + 列名缓存、按指纹判断是否失效，分块读取的片段等不对应整列的数据不要传入。
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]")
+    # 按位置对应，不复制数据
+    values = pd.Series(values.to_numpy())
+
+    conn = _cache() if source else None
+    if conn is not None:
+        key = _key(source, column)
+        times = _load(conn, key, len(values))
+        if times is not None:
+            return times
+
+    fmt = fmt or infer_format(values.to_numpy())
+    times = _parse(values, fmt)
+    if conn is not None:
+        _store(conn, key, fmt, times)
+    return times
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Availability import AvailabilityReport, BucketCounts, grid_buckets, grid_counts, time_counts
+
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+FREQ = pd.Timedelta(minutes=5)
+
+
+def synthetic(slots, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.random(slots)
+    values[rng.random(slots) < 0.2] = np.nan
+    values[1000:1500] = np.nan
+    return {"Power_fusion": values, "Radiation_fusion": np.where(rng.random(slots) < 0.1, np.nan, values)}
+
+
+def assert_counts_equal(a, b):
+    assert np.array_equal(a.buckets, b.buckets)
+    assert np.array_equal(a.total, b.total)
+    assert set(a.valid) == set(b.valid)
+    for metric in a.valid:
+        assert np.array_equal(a.valid[metric], b.valid[metric])
+
+
+def test_month_boundary():
+    # 1 月 31 日 23:50 起 6 个点：1 月 2 个，2 月 4 个，其中 2 月有一个空值
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0])
+    counts = grid_counts("2021-01-31 23:50", FREQ, {"Power_fusion": values}, "month")
+    assert counts.buckets.tolist() == [np.datetime64("2021-01"), np.datetime64("2021-02")]
+    assert counts.total.tolist() == [2, 4]
+    assert counts.valid["Power_fusion"].tolist() == [2, 3]
+    assert counts.labels("month").tolist() == ["2021-01", "2021-02"]
+    assert counts.rates()["Power_fusion"].tolist() == [1.0, 0.75]
+
+
+def test_grid_buckets_start_inside_bucket():
+    buckets, starts = grid_buckets("2021-01-01 00:30", FREQ, 30, "hour")
+    assert buckets.tolist() == [np.datetime64("2021-01-01T00", "h"), np.datetime64("2021-01-01T01", "h"),
+                                np.datetime64("2021-01-01T02", "h")]
+    assert starts.tolist() == [0, 6, 18]
+
+
+@pytest.mark.parametrize("granularity", ["month", "day", "hour"])
+def test_grid_counts_match_time_counts(granularity):
+    columns = synthetic(288 * 70)
+    times = pd.Series(pd.date_range(GRID_START, periods=288 * 70, freq=FREQ).strftime("%Y-%m-%d %H:%M:%S"))
+    assert_counts_equal(grid_counts(GRID_START, FREQ, columns, granularity), time_counts(times, columns, granularity))
+
+
+def test_time_counts_skips_invalid_times():
+    times = pd.Series(["2021-01-01 00:00", "坏值", "2021-02-01 00:00", "2021-01-01 00:05"])
+    counts = time_counts(times, {"Power_fusion": np.array([1.0, 2.0, np.nan, np.nan])}, "month")
+    assert counts.total.tolist() == [2, 1]
+    assert counts.valid["Power_fusion"].tolist() == [1, 0]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 288, 8928])
+def test_chunked_counts_add_up(chunk_rows):
+    # 与分块统计相同：各块按首行的网格时间计数后逐块累加，结果与整表一致
+    columns = synthetic(288 * 40)
+    whole = grid_counts(GRID_START, FREQ, columns, "day")
+    counts = BucketCounts.empty(columns, "day")
+    for position in range(0, 288 * 40, chunk_rows):
+        chunk = {metric: values[position:position + chunk_rows] for metric, values in columns.items()}
+        counts = counts.add(grid_counts(GRID_START + position * FREQ, FREQ, chunk, "day"))
+    assert_counts_equal(counts, whole)
+
+
+def test_head_then_add_restores_counts():
+    columns = synthetic(288 * 90)
+    whole = grid_counts(GRID_START, FREQ, columns, "month")
+    row = int(whole.total[:2].sum())
+    tail = grid_counts(GRID_START + row * FREQ, FREQ, {metric: values[row:] for metric, values in columns.items()}, "month")
+    assert_counts_equal(whole.head(2).add(tail), whole)
+
+
+def test_report_matrices():
+    report = AvailabilityReport(["Power_fusion"], "month")
+    report.add("S0001", grid_counts("2021-01-31 23:50", FREQ, {"Power_fusion": np.array([1.0, np.nan, 1.0])}, "month"))
+    report.add("S0002", grid_counts("2021-02-01 00:00", FREQ, {"Power_fusion": np.array([1.0, 1.0])}, "month"))
+    buckets, matrices = report.matrices()
+    assert buckets.tolist() == [np.datetime64("2021-01"), np.datetime64("2021-02")]
+    np.testing.assert_array_equal(matrices["Power_fusion"], [[0.5, 1.0], [np.nan, 1.0]])
@@ -0,0 +1,65 @@
+import pytest
+from Column_Alias import match_header, resolve_headers, unresolved_record
+
+# 原 Nas_Data.py 中 rename_dict_power / rename_dict_radiation / rename_final_columns 的全部表头
+OLD_POWER_HEADERS = {
+    "time": "Time", "TIME": "Time", "时间.1": "Time",
+    "Power(mw)": "Power_Nas", "Power(MW)": "Power_Nas", "Power（MW）": "Power_Nas",
+    "Power（MW)": "Power_Nas", "Power(Mw)": "Power_Nas", "power（mw）": "Power_Nas",
+    "亮马光伏电站": "Power_Nas", "Power(WM)": "Power_Nas",
+    "焦作.亮马光伏电站亮马光伏有功总加值": "Power_Nas", "POWER(mv)": "Power_Nas",
+    "QX2": "Power_Nas", "POWER(MW)": "Power_Nas", "Power（mw)": "Power_Nas",
+    "power(mw)": "Power_Nas", "Power（mw）": "Power_Nas", "总有功": "Power_Nas",
+    "焦作.庞冯营光伏电站庞冯营有功总加值Power(MW)": "Power_Nas",
+    "rtPower(MW)": "Power_Nas", "Power_Nas": "Power_Nas",
+}
+OLD_RADIATION_HEADERS = {
+    "TIME": "Time", "TIME ": "Time", "Radiation(w/m2)": "Radiation_Nas",
+    "RADIATION(w/m2)": "Radiation_Nas", "RADIATION(w/m²)": "Radiation_Nas",
+    "Radiation(w/m²）": "Radiation_Nas", "Radiation（w/m²)": "Radiation_Nas",
+    "RADIATION(W/M2)": "Radiation_Nas", "Gerneral_Radiation": "Radiation_Nas",
+    "Radiation（w/m2）": "Radiation_Nas", "GERNERAL_RADIATION": "Radiation_Nas",
+    "Power(MW)": "Radiation_Nas", "XQ2": "Radiation_Nas",
+    "RADIATION": "Radiation_Nas", "Radiation": "Radiation_Nas", "Radiation_Nas": "Radiation_Nas",
+}
+
+# 预测、限电等其他口径的列，不能当作实测功率
+LOOKALIKES = [
+    "预测Power(MW)", "短期预测Power(MW)", "DQ_Power(MW)", "限电Power(MW)", "理论Power(MW)", "可用Power(MW)",
+    "预测有功总加值", "焦作.亮马光伏电站亮马光伏预测有功总加值", "有功限值", "无功总加值",
+]
+
+
+@pytest.mark.parametrize("header, target", OLD_POWER_HEADERS.items())
+def test_old_power_headers(header, target):
+    assert match_header(header, "Power") == target
+
+
+@pytest.mark.parametrize("header, target", OLD_RADIATION_HEADERS.items())
+def test_old_radiation_headers(header, target):
+    assert match_header(header, "Radiation") == target
+
+
+@pytest.mark.parametrize("header", LOOKALIKES)
+def test_lookalikes_not_matched(header):
+    assert match_header(header, "Power") is None
+
+
+def test_forecast_column_does_not_replace_power():
+    mapping, missing = resolve_headers(("Time", "预测Power(MW)", "Power(MW)"), "Power")
+    assert mapping == {"Time": "Time", "Power(MW)": "Power_Nas"}
+    assert missing == ()
+
+
+def test_multiple_matches_are_unresolved():
+    headers = ("Time", "Power(MW)", "总有功")
+    mapping, missing = resolve_headers(headers, "Power")
+    assert mapping == {"Time": "Time"}
+    assert missing == ("Power_Nas",)
+    assert unresolved_record("a.xlsx", "Power", headers, missing)["matches"] == "Power_Nas=Power(MW),总有功"
+
+
+def test_exact_target_name_wins():
+    mapping, missing = resolve_headers(("Time", "Power(MW)", "Power_Nas"), "Power")
+    assert mapping == {"Time": "Time", "Power_Nas": "Power_Nas"}
+    assert missing == ()
@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from Availability import grid_counts
+from Gap_Index import GapIndex, gap_index_path, read_gap_index, run_lengths, write_gap_index
+from Storage import get_storage
+
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+METRICS = ["Power_fusion", "Radiation_fusion"]
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(1)
+    slots = 288 * 60
+    df = pd.DataFrame({"Time": pd.date_range(GRID_START, periods=slots, freq="5min")})
+    for metric in METRICS:
+        values = rng.random(slots)
+        values[rng.random(slots) < 0.05] = np.nan
+        values[2000:2600] = np.nan
+        df[metric] = values
+    # 开头和结尾的缺口
+    df.loc[:3, "Power_fusion"] = np.nan
+    df.loc[slots - 5:, "Radiation_fusion"] = np.nan
+    return df
+
+
+def assert_same_gaps(a, b):
+    assert (a.start, a.freq, a.length, a.metrics) == (b.start, b.freq, b.length, b.metrics)
+    for metric in a.metrics:
+        assert np.array_equal(a.gaps[metric][0], b.gaps[metric][0])
+        assert np.array_equal(a.gaps[metric][1], b.gaps[metric][1])
+
+
+def test_run_lengths():
+    flags = np.array([[True, True, False, True], [False, False, False, False], [False, True, True, True]])
+    rows, starts, lengths = run_lengths(flags)
+    assert rows.tolist() == [0, 0, 2]
+    assert starts.tolist() == [0, 3, 1]
+    assert lengths.tolist() == [2, 1, 3]
+
+
+@pytest.mark.parametrize("granularity", ["month", "day", "hour"])
+def test_counts_match_grid_counts(data, granularity):
+    # 与 python Benchmark.py gaps 的断言相同：按缺口计数与在完整网格上计数一致
+    index = GapIndex.from_frame(data, GRID_START)
+    expected = grid_counts(GRID_START, "5min", {metric: data[metric].to_numpy() for metric in METRICS}, granularity)
+    result = index.counts(METRICS, granularity)
+    assert np.array_equal(result.buckets, expected.buckets)
+    assert np.array_equal(result.total, expected.total)
+    for metric in METRICS:
+        assert np.array_equal(result.valid[metric], expected.valid[metric])
+
+
+def test_valid_mask_round_trip(data):
+    index = GapIndex.from_frame(data, GRID_START)
+    for metric in METRICS:
+        assert np.array_equal(index.valid_mask(metric), data[metric].notna().to_numpy())
+        assert index.missing(metric) == data[metric].isna().sum()
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 500, 2000, 8928])
+def test_extend_matches_whole(data, chunk_rows):
+    whole = GapIndex.from_frame(data, GRID_START)
+    index = GapIndex.from_frame(data.iloc[:chunk_rows], GRID_START)
+    for position in range(chunk_rows, len(data), chunk_rows):
+        index = index.extend(GapIndex.from_frame(data.iloc[position:position + chunk_rows], GRID_START))
+    assert_same_gaps(index, whole)
+
+
+def test_save_load_round_trip(data, tmp_path):
+    index = GapIndex.from_frame(data, GRID_START)
+    path = tmp_path / "S0000.gaps.npz"
+    index.save(path, "fingerprint")
+    loaded, source = GapIndex.load(path)
+    assert source == "fingerprint"
+    assert_same_gaps(loaded, index)
+
+
+def test_read_gap_index_invalidated_by_data_change(data, tmp_path):
+    storage = get_storage("csv")
+    data_path = storage.write(data, str(tmp_path), "S0000")
+    index = GapIndex.from_frame(data, GRID_START)
+    assert write_gap_index(index, data_path) == gap_index_path(data_path)
+
+    assert_same_gaps(read_gap_index(data_path, METRICS), index)
+    assert read_gap_index(data_path, ["Power_DB"]) is None
+
+    with open(data_path, "a", encoding="utf-8") as f:
+        f.write("2021-03-02 00:00:00,1.0,1.0\n")
+    os.utime(data_path, ns=(0, os.stat(data_path).st_mtime_ns + 1))
+    assert read_gap_index(data_path, METRICS) is None
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import Calculate_Rate
+from Availability import grid_counts
+from Rate_Cache import RateCache, file_fingerprint
+from Storage import get_storage
+
+METRICS = ["Power_fusion", "Radiation_fusion"]
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+
+
+def counts(slots=288 * 70, seed=0, granularity="month"):
+    rng = np.random.default_rng(seed)
+    columns = {metric: np.where(rng.random(slots) < 0.1, np.nan, 1.0) for metric in METRICS}
+    return grid_counts(GRID_START, "5min", columns, granularity)
+
+
+def assert_counts_equal(a, b):
+    assert np.array_equal(a.buckets, b.buckets)
+    assert np.array_equal(a.total, b.total)
+    for metric in METRICS:
+        assert np.array_equal(a.valid[metric], b.valid[metric])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RateCache(str(tmp_path / "rate_cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize("granularity", ["month", "day", "hour"])
+def test_put_get(cache, granularity):
+    expected = counts(granularity=granularity)
+    cache.put("S0001", granularity, "fp1", expected)
+    assert_counts_equal(cache.get("S0001", granularity, "fp1", METRICS), expected)
+    # 指纹不同、粒度不同或缺少指标时不命中
+    assert cache.get("S0001", granularity, "fp2", METRICS) is None
+    assert cache.get("S0002", granularity, "fp1", METRICS) is None
+    assert cache.get("S0001", granularity, "fp1", METRICS + ["Power_DB"]) is None
+
+
+def test_put_replaces_previous_counts(cache):
+    cache.put("S0001", "month", "fp1", counts(seed=0))
+    expected = counts(slots=288 * 20, seed=1)
+    cache.put("S0001", "month", "fp2", expected)
+    assert_counts_equal(cache.get("S0001", "month", "fp2", METRICS), expected)
+
+
+def test_skipped(cache):
+    cache.put("S0001", "month", "fp1", None)
+    assert cache.skipped("S0001", "month", "fp1")
+    assert cache.get("S0001", "month", "fp1", METRICS) is None
+    # 文件变化后重新统计
+    assert not cache.skipped("S0001", "month", "fp2")
+    assert cache.resume("S0001", "month", METRICS) is None
+
+
+def test_resume_requires_blocks(cache):
+    expected = counts()
+    cache.put("S0001", "month", "fp1", expected)
+    assert cache.resume("S0001", "month", METRICS) is None
+
+    blocks = [[i * 100, 100, f"digest{i}"] for i in range(len(expected))]
+    cache.put("S0001", "month", "fp1", expected, blocks)
+    resumed, stored = cache.resume("S0001", "month", METRICS)
+    assert_counts_equal(resumed, expected)
+    assert stored == blocks
+
+
+def test_prune(cache):
+    for station_id in ["S0001", "S0002", "S0003"]:
+        cache.put(station_id, "month", "fp", counts(), [[0, 1, "d"]] * 3)
+    assert cache.prune(["S0002"], "month") == 2
+    assert cache.get("S0001", "month", "fp", METRICS) is None
+    assert cache.resume("S0003", "month", METRICS) is None
+    assert cache.get("S0002", "month", "fp", METRICS) is not None
+
+
+def test_file_fingerprint(tmp_path):
+    path = tmp_path / "S0001.csv"
+    path.write_text("Time\n")
+    fingerprint = file_fingerprint([str(path)], "month")
+    assert file_fingerprint([str(path)], "month") == fingerprint
+    assert file_fingerprint([str(path)], "day") != fingerprint
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert file_fingerprint([str(path)], "month") != fingerprint
+    assert file_fingerprint([str(tmp_path / "missing.csv")]) != file_fingerprint([])
+
+
+def test_row_blocks(tmp_path):
+    storage = get_storage("csv")
+    path = tmp_path / "S0001.csv"
+    path.write_bytes(b"a,b\n1,2\n3,4\n5,6\n7,8\n")
+    blocks = storage.row_blocks(str(path), [0, 1, 3], "salt")
+    assert [block[:2] for block in blocks] == [[0, 8], [8, 8], [16, 4]]
+    assert storage.matching_blocks(str(path), blocks, "salt") == 3
+    assert storage.matching_blocks(str(path), blocks, "other") == 0
+    assert storage.row_blocks(str(path), [0, 5], "salt") is None
+
+    path.write_bytes(b"a,b\n1,2\n3,9\n5,6\n7,8\n9,9\n")
+    assert storage.matching_blocks(str(path), blocks, "salt") == 1
+    tail = pd.concat(storage.read_from(str(path), blocks[1][0], ["a", "b"], chunk_rows=2))
+    assert tail["a"].tolist() == [3, 5, 7, 9]
+    assert list(storage.read_from(str(path), os.path.getsize(path), ["a", "b"])) == []
+
+
+def station_frame(slots, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"Time": pd.date_range(GRID_START, periods=slots, freq="5min").strftime("%Y-%m-%d %H:%M:%S")})
+    for metric in METRICS:
+        df[metric] = np.where(rng.random(slots) < 0.1, np.nan, rng.random(slots).round(3))
+    return df
+
+
+def report_matrices(file_names, folder, granularity, cache_file):
+    return Calculate_Rate.cached_rate_report(file_names, folder, granularity, cache_file).matrices()
+
+
+def assert_reports_equal(a, b):
+    assert np.array_equal(a[0], b[0])
+    for metric in METRICS:
+        np.testing.assert_array_equal(a[1][metric], b[1][metric])
+
+
+@pytest.mark.parametrize("granularity", ["month", "day"])
+@pytest.mark.parametrize("chunk_rows", ["0", "1000"])
+def test_cached_report_recounts_changed_buckets(tmp_path, monkeypatch, capsys, granularity, chunk_rows):
+    monkeypatch.setenv("STATION_CHUNK_ROWS", chunk_rows)
+    monkeypatch.setattr(Calculate_Rate, "storage", get_storage("csv"))
+    folder = str(tmp_path)
+    cache_file = str(tmp_path / "cache" / "rate_cache.sqlite")
+    frames = {station_id: station_frame(288 * 50, seed) for seed, station_id in enumerate(["S0001", "S0002", "S0003"])}
+    for station_id, df in frames.items():
+        df.to_csv(os.path.join(folder, f"{station_id}.csv"), index=False)
+    file_names = [f"{station_id}.csv" for station_id in frames]
+    report_matrices(file_names, folder, granularity, cache_file)
+
+    # S0001 末尾追加 10 天，S0002 改动第 40 天的一个值，S0003 改动第一行（整个文件重新计数）
+    appended = pd.concat([frames["S0001"], station_frame(288 * 60, 3).iloc[288 * 50:]])
+    appended.to_csv(os.path.join(folder, "S0001.csv"), index=False)
+    edited = frames["S0002"]
+    edited.loc[288 * 40, "Power_fusion"] = np.nan if pd.notna(edited.loc[288 * 40, "Power_fusion"]) else 0.5
+    edited.to_csv(os.path.join(folder, "S0002.csv"), index=False)
+    first = frames["S0003"]
+    first.loc[0, "Radiation_fusion"] = 0.123
+    first.to_csv(os.path.join(folder, "S0003.csv"), index=False)
+    capsys.readouterr()
+
+    result = report_matrices(file_names, folder, granularity, cache_file)
+    assert "缓存命中 0 个场站，增量统计 2 个场站，重新统计 1 个场站" in capsys.readouterr().out
+    assert_reports_equal(result, report_matrices(file_names, folder, granularity, None))
+    # 写回的缓存与重新统计一致
+    assert_reports_equal(report_matrices(file_names, folder, granularity, cache_file), result)
+    assert "缓存命中 3 个场站" in capsys.readouterr().out
@@ -0,0 +1,107 @@
+import openpyxl
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from Report_Writer import FULL_NAN_RULES, PERCENT_FORMAT, RED_GREEN_RULES
+from Threshold_Color import OPENPYXL_SERIES, cell_rate, color_workbook, match_color
+
+
+def fill_color(cell):
+    return cell.fill.fgColor.rgb if cell.fill.fill_type == "solid" else None
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    # 带列宽、行高、冻结窗格、合并单元格、筛选、条件格式和表头样式的非空率工作簿
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Power_fusion"
+    sheet.append(["场站", "2021-01", "2021-02", "2021-03"])
+    sheet.append(["S0001", "95.3%", "50%", None])
+    sheet.append(["S0002", 0.999, 0.3, 0.75])
+    sheet.append(["合计", "80%", None, None])
+    sheet["C3"].number_format = PERCENT_FORMAT
+    sheet["D3"].number_format = PERCENT_FORMAT
+    sheet["B3"].number_format = PERCENT_FORMAT
+    for cell in sheet[1]:
+        cell.font = Font(bold=True)
+    sheet.column_dimensions["A"].width = 18
+    sheet.row_dimensions[1].height = 30
+    sheet.freeze_panes = "B2"
+    sheet.merge_cells("B4:D4")
+    sheet.auto_filter.ref = "A1:D3"
+    sheet.conditional_formatting.add(
+        "B2:D3", CellIsRule(operator="lessThan", formula=["0.1"], fill=PatternFill(bgColor="FFFF00", fill_type="solid")))
+    path = tmp_path / "rate.xlsx"
+    workbook.save(path)
+    return path
+
+
+def test_openpyxl_version_is_pinned():
+    assert openpyxl.__version__.startswith(OPENPYXL_SERIES)
+
+
+def test_layout_round_trip(source_file, tmp_path):
+    output = tmp_path / "colored.xlsx"
+    assert color_workbook(source_file, output, RED_GREEN_RULES) == ["Power_fusion"]
+
+    sheet = load_workbook(output)["Power_fusion"]
+    assert sheet.column_dimensions["A"].width == 18
+    assert sheet.row_dimensions[1].height == 30
+    assert sheet.freeze_panes == "B2"
+    assert [str(ref) for ref in sheet.merged_cells.ranges] == ["B4:D4"]
+    assert sheet.auto_filter.ref == "A1:D3"
+    rules = [(str(cf.sqref), rule.operator, rule.formula) for cf in sheet.conditional_formatting for rule in cf.rules]
+    assert rules == [("B2:D3", "lessThan", ["0.1"])]
+    assert all(cell.font.b for cell in sheet[1])
+
+
+def test_red_green_colors(source_file, tmp_path):
+    output = tmp_path / "colored.xlsx"
+    color_workbook(source_file, output, RED_GREEN_RULES)
+
+    sheet = load_workbook(output)["Power_fusion"]
+    # 百分号文本转为百分比格式的数值
+    assert sheet["B2"].value == pytest.approx(0.953)
+    assert sheet["B2"].number_format == PERCENT_FORMAT
+    assert fill_color(sheet["B2"]) == "00CCFFCC"
+    assert fill_color(sheet["C2"]) == "00FFCCCC"
+    # 空值填 0% 并标红
+    assert sheet["D2"].value == 0
+    assert fill_color(sheet["D2"]) == "00FFCCCC"
+    assert fill_color(sheet["B3"]) == "00CCFFCC"
+    assert fill_color(sheet["C3"]) == "00FFCCCC"
+    assert fill_color(sheet["D3"]) is None
+    assert sheet["D3"].number_format == PERCENT_FORMAT
+    # 表头行、表头列和合并区域中被合并的单元格不着色
+    assert fill_color(sheet["B1"]) is None
+    assert fill_color(sheet["A2"]) is None
+    assert sheet["C4"].value is None and fill_color(sheet["C4"]) is None
+
+
+def test_full_nan_only_touches_empty_cells(source_file, tmp_path):
+    output = tmp_path / "colored.xlsx"
+    color_workbook(source_file, output, FULL_NAN_RULES)
+
+    sheet = load_workbook(output)["Power_fusion"]
+    assert sheet["B2"].value == "95.3%"
+    assert fill_color(sheet["B2"]) is None
+    assert sheet["D2"].value == 0
+    assert fill_color(sheet["D2"]) == "00FFCCCC"
+
+
+@pytest.mark.parametrize("value, number_format, expected", [
+    ("95.3%", "General", 0.953),
+    (" 80% ", "General", 0.8),
+    (0.999, PERCENT_FORMAT, 0.999),
+    (95, "General", 0.95),
+])
+def test_cell_rate(value, number_format, expected):
+    assert cell_rate(value, number_format) == pytest.approx(expected)
+
+
+def test_match_color_first_rule_wins():
+    assert match_color(0.59, RED_GREEN_RULES) == "FFCCCC"
+    assert match_color(0.9, RED_GREEN_RULES) == "CCFFCC"
+    assert match_color(0.75, RED_GREEN_RULES) is None
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Time_Parse import infer_format, parse_times, regular_step
+
+GRID_START = pd.Timestamp("2021-01-01 00:00")
+
+
+def grid(periods, freq="5min", start=GRID_START):
+    return pd.date_range(start, periods=periods, freq=freq).to_numpy()
+
+
+@pytest.mark.parametrize("fmt", ["%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M:%S.%f"])
+def test_regular_column(fmt):
+    # 与 python Benchmark.py times 的断言相同：按 CSV 中的写法生成文本，解析结果与原时间一致
+    expected = grid(288 * 40)
+    values = pd.Series(pd.DatetimeIndex(expected).strftime(fmt), dtype=object)
+    assert infer_format(values.to_numpy()) == fmt
+    assert np.array_equal(parse_times(values), expected)
+
+
+def test_missing_row():
+    expected = grid(288 * 10)
+    values = pd.Series(pd.DatetimeIndex(expected).strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    gapped = values.drop(index=len(values) // 2).reset_index(drop=True)
+    assert np.array_equal(parse_times(gapped), np.delete(expected, len(values) // 2))
+
+
+@pytest.mark.parametrize("values, expected", [
+    # 非零秒
+    (["2021-01-01 00:00:30", "2021-01-01 00:05:30", "2021-01-01 00:10:30"], grid(3, start="2021-01-01 00:00:30")),
+    # 结尾带空格
+    (["2021-01-01 00:00:00 ", "2021-01-01 00:05:00 ", "2021-01-01 00:10:00 "], grid(3)),
+    # 同一列中补零和不补零的写法混用
+    (["2021-01-01 00:00:00", "2021-1-1 0:05:00", "2021-01-01 00:10:00"], grid(3)),
+    # 固定时区偏移（无夏令时）换算为 UTC
+    (["2021-01-01 08:00:00+08:00", "2021-01-01 08:05:00+08:00", "2021-01-01 08:10:00+08:00"], grid(3)),
+    # 毫秒
+    (["2021-01-01 00:00:00.500", "2021-01-01 00:05:00.000"], np.array(["2021-01-01T00:00:00.5", "2021-01-01T00:05"],
+                                                                       dtype="datetime64[ns]")),
+])
+def test_spellings(values, expected):
+    assert np.array_equal(parse_times(values), expected)
+
+
+def test_invalid_values_are_nat():
+    result = parse_times(["2021-01-01 00:00:00", None, "坏值", "2021-01-01 00:15:00"])
+    assert np.isnat(result).tolist() == [False, True, True, False]
+    assert result[3] == np.datetime64("2021-01-01T00:15")
+
+
+def test_datetime_input_and_position():
+    times = grid(5)
+    assert np.array_equal(parse_times(pd.Series(times)), times)
+    # 非默认索引的 Series 按位置对应
+    values = pd.Series(pd.DatetimeIndex(times).strftime("%Y-%m-%d %H:%M"), index=[10, 3, 7, 1, 0])
+    assert np.array_equal(parse_times(values), times)
+
+
+def test_regular_step():
+    assert regular_step(grid(10)) == pd.Timedelta(minutes=5).value
+    assert regular_step(np.delete(grid(10), 3)) is None
+    assert regular_step(grid(1)) is None
+
+
+def test_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("TIME_PARSE_CACHE", str(tmp_path / "time_cache.sqlite"))
+    source = tmp_path / "S0000.csv"
+    expected = grid(288 * 3)
+    values = pd.Series(pd.DatetimeIndex(expected).strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    pd.DataFrame({"Time": values}).to_csv(source, index=False)
+
+    assert np.array_equal(parse_times(values, str(source)), expected)
+    # 文件未变化时直接取缓存，不再解析
+    monkeypatch.setattr("Time_Parse._parse", lambda values, fmt: pytest.fail("未命中缓存"))
+    assert np.array_equal(parse_times(values, str(source)), expected)
+    monkeypatch.undo()
+
+    # 文件改动后（行数相同）缓存失效
+    monkeypatch.setenv("TIME_PARSE_CACHE", str(tmp_path / "time_cache.sqlite"))
+    shifted = grid(288 * 3, start="2021-01-01 00:05")
+    values = pd.Series(pd.DatetimeIndex(shifted).strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    pd.DataFrame({"Time": values}).to_csv(source, index=False)
+    assert np.array_equal(parse_times(values, str(source)), shifted)